@@ -2,154 +2,357 @@
 Shared dependencies and model loading
 """
 
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
-import chromadb
-import torch
 import google.generativeai as genai
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
+from app.services.query_cache import LRUCache, AnswerCache
+from app.services.llm_client import GeminiClient
+from app.services.fake_llm import FakeGeminiModel
+from app.services.document_store import create_document_store
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.vector_store import create_vector_store
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict
+import threading
+import time
 import os
 
+class LazyComponent:
+    """A model or client that loads on first use and records readiness and load time"""
+
+    def __init__(self, name: str, loader: Callable):
+        self.name = name
+        self.loader = loader
+        self.value = None
+        self.status = "pending"
+        self.load_ms = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the loaded value, loading it now if needed (retries after a failed load)"""
+        if self.status == "ready":
+            return self.value
+        with self._lock:
+            if self.status != "ready":
+                self.status = "loading"
+                started = time.perf_counter()
+                try:
+                    self.value = self.loader()
+                except Exception as e:
+                    self.status = "failed"
+                    self.error = str(e)
+                    print(f"❌ Failed to load {self.name}: {e}")
+                    raise
+                finally:
+                    self.load_ms = round((time.perf_counter() - started) * 1000, 2)
+                self.status = "ready"
+                self.error = None
+                print(f"✅ Loaded {self.name} in {self.load_ms:.0f} ms")
+        return self.value
+
+    def set(self, value):
+        """Install an already-built value"""
+        with self._lock:
+            self.value = value
+            self.status = "ready" if value is not None else "pending"
+            self.error = None
+
+    def describe(self) -> Dict:
+        return {"status": self.status, "load_ms": self.load_ms, "error": self.error}
+
+def _configure_threads():
+    """Apply INFERENCE_THREADS to PyTorch's intra-op pool (0 keeps the library default)"""
+    if settings.INFERENCE_THREADS > 0:
+        import torch
+        torch.set_num_threads(settings.INFERENCE_THREADS)
+
+def _sidecar_client():
+    from app.services import inference_sidecar
+
+    print(f"Using inference sidecar at {settings.INFERENCE_SIDECAR_ADDRESS}")
+    client = inference_sidecar.connect()
+    client.call("ping")
+    return client
+
+def _load_embedding_model():
+    if settings.INFERENCE_MODE == "sidecar":
+        from app.services.inference_sidecar import RemoteEmbeddingModel
+        return RemoteEmbeddingModel(_sidecar_client())
+    return load_local_embedding_model()
+
+def _load_sentiment_analyzer():
+    if settings.INFERENCE_MODE == "sidecar":
+        from app.services.inference_sidecar import RemoteSentimentAnalyzer
+        return RemoteSentimentAnalyzer(_sidecar_client())
+    return load_local_sentiment_analyzer()
+
+def load_local_embedding_model():
+    from app.services.inference_backends import load_embedding_model
+
+    _configure_threads()
+    print(f"Loading embedding model: {settings.EMBEDDING_MODEL} ({settings.INFERENCE_BACKEND})")
+    return load_embedding_model(
+        settings.EMBEDDING_MODEL,
+        settings.INFERENCE_BACKEND,
+        str(Path(settings.CACHE_DIR) / "onnx")
+    )
+
+def load_local_sentiment_analyzer():
+    from app.services.inference_backends import load_sentiment_pipeline
+    import torch
+
+    _configure_threads()
+    print(f"Loading sentiment analyzer: {settings.SENTIMENT_MODEL} ({settings.INFERENCE_BACKEND})")
+    return load_sentiment_pipeline(
+        settings.SENTIMENT_MODEL,
+        settings.INFERENCE_BACKEND,
+        str(Path(settings.CACHE_DIR) / "onnx"),
+        device=0 if torch.cuda.is_available() else -1
+    )
+
+def _select_gemini_model() -> str:
+    """Pick the best available model via genai.list_models() (one network round trip)"""
+    # Preferred models in order (best for free tier)
+    preferred_models = [
+        'gemini-1.5-flash',      # Best for free tier - fast & generous limits
+        'gemini-1.5-flash-002',  # Alternate flash version
+        'gemini-1.5-pro',        # Pro version (lower limits but still good)
+        'gemini-pro',            # Legacy but stable
+    ]
+
+    print("Checking available models...")
+    available_models = []
+    for m in genai.list_models():
+        if 'generateContent' in m.supported_generation_methods:
+            model_name = m.name.replace('models/', '')
+            available_models.append(model_name)
+            print(f"  ✅ Found: {model_name}")
+
+    if not available_models:
+        print("❌ No models available with this API key")
+        raise Exception("No Gemini models available. Check API key permissions.")
+
+    # Select the first preferred model that's available
+    for preferred in preferred_models:
+        for available in available_models:
+            if preferred in available:
+                return available
+
+    # Fallback to first available if no preferred match
+    return available_models[0]
+
+def _load_gemini_model():
+    if settings.LLM_BACKEND == "fake":
+        print("Using local fake Gemini model (LLM_BACKEND=fake)")
+        return FakeGeminiModel(latency_ms=settings.FAKE_LLM_LATENCY_MS)
+
+    # Configure Gemini with explicit API key
+    print("Configuring Gemini API...")
+    api_key = settings.GEMINI_API_KEY or os.getenv('GEMINI_API_KEY')
+
+    if not api_key:
+        raise Exception("GEMINI_API_KEY not found in .env file")
+
+    genai.configure(api_key=api_key)
+
+    try:
+        model_to_use = _select_gemini_model() if settings.GEMINI_DISCOVER_MODELS else settings.GEMINI_MODEL
+    except Exception as e:
+        print(f"❌ Error with Gemini API: {str(e)}")
+
+        # If quota error, provide helpful message
+        if "quota" in str(e).lower() or "429" in str(e):
+            print("\n⚠️  QUOTA ISSUE DETECTED:")
+            print("   - Your API key may have hit daily/minute limits")
+            print("   - Try waiting 1-5 minutes and restart")
+            print("   - Generate a NEW API key at: https://aistudio.google.com/apikey")
+            print("   - Check usage at: https://ai.google.dev/gemini-api/docs/rate-limits")
+            print("   - Make sure you're using 'gemini-1.5-flash' for best free tier limits\n")
+
+        raise Exception(f"Could not initialize Gemini: {str(e)}")
+
+    # No connectivity probe: the first real request surfaces key or quota problems
+    print(f"🎯 Using model: {model_to_use}")
+    return genai.GenerativeModel(model_to_use)
+
 class ModelDependencies:
-    """Container for all loaded models"""
+    """Container for all loaded models; heavy models load lazily and can be warmed up in parallel"""
+
+    COMPONENTS = ("embedding_model", "sentiment_analyzer", "gemini_model", "vector_store", "lexical_index")
+
     def __init__(self):
-        self.embedding_model = None
-        self.gemini_model = None
-        self.sentiment_analyzer = None
         self.chroma_client = None
-        self.collection = None
-        self.document_store = {}
+        self._components = {
+            "embedding_model": LazyComponent("embedding_model", _load_embedding_model),
+            "sentiment_analyzer": LazyComponent("sentiment_analyzer", _load_sentiment_analyzer),
+            "gemini_model": LazyComponent("gemini_model", _load_gemini_model),
+            "vector_store": LazyComponent("vector_store", self._load_vector_store),
+            "lexical_index": LazyComponent("lexical_index", self._load_lexical_index),
+        }
+        self._llm_client = None
+        self._llm_client_lock = threading.Lock()
+
+        self.embedding_cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.embedding_cache = EmbeddingCache(
+                str(Path(settings.CACHE_DIR) / "embeddings.sqlite3")
+            )
+        self.query_embedding_cache = LRUCache(settings.QUERY_EMBEDDING_CACHE_SIZE)
+        self.embedding_batcher = None
+        if settings.EMBEDDING_BATCHING:
+            self.embedding_batcher = EmbeddingBatcher(
+                lambda: self.embedding_model,
+                settings.EMBEDDING_BATCHER_MAX_BATCH,
+                settings.EMBEDDING_BATCHER_WAIT_MS,
+                settings.EMBEDDING_BATCHER_MAX_INGEST_BATCH
+            )
+        self.answer_cache = AnswerCache(
+            settings.ANSWER_CACHE_SIZE, settings.ANSWER_CACHE_TTL_SECONDS
+        )
+        self.document_store = create_document_store(
+            settings.DOCUMENT_STORE,
+            str(Path(settings.DATA_DIR) / "documents.sqlite3"),
+            settings.QA_HISTORY_LIMIT
+        )
+
+    def _load_collection(self):
+        import chromadb
+
+        if settings.CHROMA_HOST:
+            # Chroma server shared by every API worker
+            print(f"Connecting to ChromaDB at {settings.CHROMA_HOST}:{settings.CHROMA_PORT}...")
+            self.chroma_client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+        else:
+            # Initialize ChromaDB with new syntax
+            print("Initializing ChromaDB...")
+            self.chroma_client = chromadb.PersistentClient(
+                path=settings.CHROMA_DIR
+            )
+        return self.chroma_client.get_or_create_collection(
+            name="financial_reports",
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def _load_vector_store(self):
+        if settings.VECTOR_STORE == "numpy":
+            print(f"Opening NumPy vector store ({settings.VECTOR_DTYPE})...")
+        return create_vector_store(
+            settings.VECTOR_STORE,
+            str(Path(settings.DATA_DIR) / "vectors"),
+            settings.VECTOR_DTYPE,
+            collection_factory=self._load_collection
+        )
+
+    def _load_lexical_index(self):
+        from app.services.lexical_index import LexicalIndex
+
+        index = LexicalIndex(str(Path(settings.CHROMA_DIR) / "lexical_index.sqlite3"))
+        vector_store = self.vector_store
+        if index.count() == 0 and vector_store.count() > 0:
+            # Chunks stored before the index existed: build it once from the vector store
+            print(f"Building lexical index for {vector_store.count()} existing chunks...")
+            offset = 0
+            while True:
+                page = vector_store.get(limit=1000, offset=offset)
+                if not page["ids"]:
+                    break
+                by_doc = {}
+                for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                    by_doc.setdefault(metadata["doc_id"], ([], []))
+                    by_doc[metadata["doc_id"]][0].append(chunk_id)
+                    by_doc[metadata["doc_id"]][1].append(text)
+                for doc_id, (chunk_ids, texts) in by_doc.items():
+                    index.add(doc_id, chunk_ids, texts)
+                offset += len(page["ids"])
+        return index
+
+    @property
+    def embedding_model(self):
+        return self._components["embedding_model"].get()
+
+    @embedding_model.setter
+    def embedding_model(self, value):
+        self._components["embedding_model"].set(value)
+
+    @property
+    def sentiment_analyzer(self):
+        return self._components["sentiment_analyzer"].get()
+
+    @sentiment_analyzer.setter
+    def sentiment_analyzer(self, value):
+        self._components["sentiment_analyzer"].set(value)
+
+    @property
+    def gemini_model(self):
+        return self._components["gemini_model"].get()
+
+    @gemini_model.setter
+    def gemini_model(self, value):
+        self._components["gemini_model"].set(value)
+        self._llm_client = None
+
+    @property
+    def vector_store(self):
+        return self._components["vector_store"].get()
+
+    @vector_store.setter
+    def vector_store(self, value):
+        self._components["vector_store"].set(value)
+
+    @property
+    def lexical_index(self):
+        return self._components["lexical_index"].get()
+
+    @property
+    def llm_client(self) -> GeminiClient:
+        """Rate-limited client around the Gemini model (built on first use)"""
+        if self._llm_client is None:
+            with self._llm_client_lock:
+                if self._llm_client is None:
+                    self._llm_client = GeminiClient(
+                        self.gemini_model,
+                        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+                        max_retries=settings.LLM_MAX_RETRIES,
+                        timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+                        max_pending=settings.LLM_MAX_PENDING
+                    )
+        return self._llm_client
+
+    def warm_up(self, wait_for_all: bool = False):
+        """Load every component in parallel threads; optionally block until all finish"""
+        def load(component: LazyComponent):
+            try:
+                component.get()
+            except Exception:
+                pass  # recorded on the component and reported by /health
+
+        executor = ThreadPoolExecutor(max_workers=len(self._components), thread_name_prefix="warmup")
+        futures = [executor.submit(load, c) for c in self._components.values()]
+        executor.shutdown(wait=False)
+        if wait_for_all:
+            wait(futures)
+
+    def status(self) -> Dict[str, Dict]:
+        """Per-component readiness and load time, without triggering any loads"""
+        return {name: c.describe() for name, c in self._components.items()}
+
+    def is_ready(self) -> bool:
+        return all(c.status == "ready" for c in self._components.values())
 
 # Global model instance
 _models = None
+_models_lock = threading.Lock()
 
 def get_models() -> ModelDependencies:
-    """Get or initialize models (singleton pattern)"""
+    """Get or create the shared model container (singleton pattern); models load on first use"""
     global _models
-    
+
     if _models is None:
-        print("Loading models for the first time...")
-        _models = ModelDependencies()
-        
-        # Load embedding model
-        print(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
-        _models.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
-        
-        # Configure Gemini with explicit API key
-        print("Configuring Gemini API...")
-        api_key = settings.GEMINI_API_KEY or os.getenv('GEMINI_API_KEY')
-        
-        if not api_key:
-            raise Exception("GEMINI_API_KEY not found in .env file")
-        
-        print(f"API Key present: {len(api_key)} characters")
-        genai.configure(api_key=api_key)
-        
-        # List available models and prioritize free-tier friendly models
-        print("Checking available models...")
-        try:
-            # Preferred models in order (best for free tier)
-            preferred_models = [
-                'gemini-1.5-flash',      # Best for free tier - fast & generous limits
-                'gemini-1.5-flash-002',  # Alternate flash version
-                'gemini-1.5-pro',        # Pro version (lower limits but still good)
-                'gemini-pro',            # Legacy but stable
-            ]
-            
-            available_models = []
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    model_name = m.name.replace('models/', '')
-                    available_models.append(model_name)
-                    print(f"  ✅ Found: {model_name}")
-            
-            if not available_models:
-                print("❌ No models available with this API key")
-                raise Exception("No Gemini models available. Check API key permissions.")
-            
-            # Select the first preferred model that's available
-            model_to_use = None
-            for preferred in preferred_models:
-                for available in available_models:
-                    if preferred in available:
-                        model_to_use = available
-                        break
-                if model_to_use:
-                    break
-            
-            # Fallback to first available if no preferred match
-            if not model_to_use:
-                model_to_use = available_models[0]
-            
-            print(f"🎯 Using model: {model_to_use}")
-            _models.gemini_model = genai.GenerativeModel(model_to_use)
-            
-            # Optional test - don't fail if test doesn't work
-            print("Testing model connectivity...")
-            try:
-                test_response = _models.gemini_model.generate_content(
-                    "Test: respond with OK",
-                    generation_config=genai.types.GenerationConfig(
-                        max_output_tokens=20,
-                        temperature=0.1,
-                    )
-                )
-                
-                # Try to get response text
-                response_text = "Model loaded"
-                try:
-                    response_text = test_response.text
-                except:
-                    try:
-                        if test_response.candidates and len(test_response.candidates) > 0:
-                            candidate = test_response.candidates[0]
-                            if hasattr(candidate, 'content') and candidate.content.parts:
-                                response_text = candidate.content.parts[0].text
-                    except:
-                        pass
-                
-                print(f"✅ Model test successful: {response_text}")
-            except Exception as test_error:
-                # Test failed but model is loaded - continue anyway
-                print(f"⚠️  Model test had issues (non-critical): {test_error}")
-                print(f"✅ Model initialized - will test during actual use")
-            
-        except Exception as e:
-            print(f"❌ Error with Gemini API: {str(e)}")
-            
-            # If quota error, provide helpful message
-            if "quota" in str(e).lower() or "429" in str(e):
-                print("\n⚠️  QUOTA ISSUE DETECTED:")
-                print("   - Your API key may have hit daily/minute limits")
-                print("   - Try waiting 1-5 minutes and restart")
-                print("   - Generate a NEW API key at: https://aistudio.google.com/apikey")
-                print("   - Check usage at: https://ai.google.dev/gemini-api/docs/rate-limits")
-                print("   - Make sure you're using 'gemini-1.5-flash' for best free tier limits\n")
-            
-            raise Exception(f"Could not initialize Gemini: {str(e)}")
-        
-        # Load sentiment analyzer
-        print(f"Loading sentiment analyzer: {settings.SENTIMENT_MODEL}")
-        _models.sentiment_analyzer = pipeline(
-            "sentiment-analysis",
-            model=settings.SENTIMENT_MODEL,
-            device=0 if torch.cuda.is_available() else -1
-        )
-        
-        # Initialize ChromaDB with new syntax
-        print("Initializing ChromaDB...")
-        _models.chroma_client = chromadb.PersistentClient(
-            path=settings.CHROMA_DIR
-        )
-        
-        try:
-            _models.collection = _models.chroma_client.create_collection(
-                name="financial_reports",
-                metadata={"hnsw:space": "cosine"}
-            )
-        except:
-            _models.collection = _models.chroma_client.get_collection(
-                name="financial_reports"
-            )
-    
-    return _models
\ No newline at end of file
+        with _models_lock:
+            if _models is None:
+                _models = ModelDependencies()
+
+    return _models
@@ -2,93 +2,193 @@
 API route handlers
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
-from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Header
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from typing import List, Optional, Tuple
+import asyncio
+import json
+import time
 from datetime import datetime
 from pathlib import Path
 
 from app.models import (
     QueryRequest, QueryResponse, ComparisonRequest, ComparisonResponse,
-    ExportRequest, DocumentInfo, UploadResponse, MetricsResponse
+    ExportRequest, DocumentInfo, MetricsResponse,
+    UploadJobResponse, JobStatusResponse, BulkUploadResponse,
+    BatchQueryRequest, BatchQueryResult, BatchQueryResponse
 )
 from app.api.dependencies import get_models
 from app.services.pdf_service import PDFService
 from app.services.embedding_service import EmbeddingService
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, AnswerScorer, LOW_CONFIDENCE_PREFIX
 from app.services.sentiment_service import SentimentService
 from app.services.export_service import ExportService
+from app.services.ingestion_service import IngestionService, iter_pdf_sources
+from app.services.metrics_service import MetricsService, METRIC_FIELDS
+from app.services.embedding_cache import content_hash
+from app.services.llm_client import LLMOverloadedError
 from app.config import settings
+from app.utils.helpers import new_document_id
+from app.utils import telemetry
+from app.utils.telemetry import instrument
 
 router = APIRouter()
 
-# Initialize services
-pdf_service = PDFService()
-embedding_service = EmbeddingService()
-llm_service = LLMService()
+# Initialize services; instrumented methods are timed per stage for /metrics and request traces
+pdf_service = instrument(
+    PDFService(),
+    iter_pages="pdf_extract", extract_many="pdf_extract", chunk_text="chunk", chunk_pages="chunk",
+    scan_pages="metric_scan"
+)
+embedding_service = instrument(
+    EmbeddingService(),
+    generate_embeddings="embed_batch", embed_query="embed_query", embed_queries="embed_query",
+    store_embeddings="vector_add", store_embeddings_many="vector_add", commit_embeddings="vector_add",
+    update_embeddings="vector_add", retrieve_chunks_batch="vector_query", _fuse_lexical="lexical_search"
+)
+llm_service = instrument(LLMService(), build_prompt="prompt_build")
 sentiment_service = SentimentService()
-export_service = ExportService()
+export_service = instrument(ExportService(), create_report="export_render")
+metrics_service = MetricsService()
+ingestion_service = IngestionService(pdf_service, embedding_service, sentiment_service, metrics_service)
 
-@router.post("/upload", response_model=UploadResponse)
+@router.post("/upload", response_model=UploadJobResponse, status_code=202)
 async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and process PDF file"""
+    """Upload a PDF and queue it for background processing"""
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
     models = get_models()
-    doc_id = f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    doc_id = new_document_id()
     file_path = Path(settings.UPLOAD_DIR) / f"{doc_id}_{file.filename}"
     
+    content = await file.read()
+    file_hash = content_hash(content)
+    
+    # Identical bytes: point at the existing document instead of re-ingesting
+    existing = await asyncio.to_thread(models.document_store.find_by_hash, file_hash)
+    if existing is not None:
+        job = ingestion_service.record_duplicate(existing, file.filename)
+        return UploadJobResponse(
+            job_id=job.id,
+            document_id=existing['id'],
+            status=job.status,
+            message="Identical document already processed"
+        )
+    
+    active = ingestion_service.find_active(file_hash)
+    if active is not None:
+        return UploadJobResponse(
+            job_id=active.id,
+            document_id=active.doc_id,
+            status=active.status,
+            message="Identical document is already being processed"
+        )
+    
     # Save file
     with open(file_path, "wb") as buffer:
-        content = await file.read()
         buffer.write(content)
     
-    try:
-        # Extract text
-        text = pdf_service.extract_text(str(file_path))
-        if not text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-        
-        # Chunk text
-        chunks = pdf_service.chunk_text(text)
-        
-        # Generate embeddings
-        embeddings = embedding_service.generate_embeddings(chunks, models)
-        
-        # Store in vector database
-        embedding_service.store_embeddings(
-            doc_id, chunks, embeddings, file.filename, models
-        )
-        
-        # Analyze sentiment
-        sentiment = sentiment_service.analyze_batch(chunks[:30], models)
-        
-        # Extract summary
-        summary = pdf_service.extract_summary(chunks, text)
-        
-        # Store document info
-        models.document_store[doc_id] = {
-            "id": doc_id,
-            "filename": file.filename,
-            "upload_date": datetime.now().isoformat(),
-            "chunks": len(chunks),
-            "sentiment": sentiment,
-            "summary": summary,
-            "full_text": text,
-            "qa_history": []
+    job = ingestion_service.submit(
+        doc_id, file.filename, str(file_path), models, content_hash=file_hash
+    )
+    
+    return UploadJobResponse(
+        job_id=job.id,
+        document_id=doc_id,
+        status=job.status,
+        message="PDF queued for processing"
+    )
+
+@router.post("/upload/bulk", response_model=BulkUploadResponse, status_code=202)
+async def upload_bulk(files: List[UploadFile] = File(...)):
+    """Upload many PDFs (or zip archives of PDFs) and ingest them together in the background"""
+    models = get_models()
+    uploads = [(file.filename, file.file) for file in files]
+    
+    # Reading, hashing and saving files is blocking disk work
+    bulk = await asyncio.to_thread(
+        ingestion_service.submit_bulk, iter_pdf_sources(uploads), models
+    )
+    return BulkUploadResponse(**bulk.to_dict())
+
+@router.get("/upload/bulk/{batch_id}", response_model=BulkUploadResponse)
+async def get_bulk_status(batch_id: str):
+    """Per-file results and aggregate throughput of a bulk upload"""
+    bulk = ingestion_service.get_batch(batch_id)
+    if bulk is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return BulkUploadResponse(**bulk.to_dict())
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """Report per-stage progress and timings for an ingestion job"""
+    job = ingestion_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(**job.to_dict())
+
+def _format_sources(ids: List[str], metadatas: List[dict], models) -> List[dict]:
+    """Source citations for retrieved chunks"""
+    docs = models.document_store.get_many(meta.get('doc_id', 'unknown') for meta in metadatas)
+    # Chunk numbers follow each document's recorded order; older chunks carry theirs in metadata
+    positions = models.document_store.chunk_positions(ids)
+    sources = []
+    for chunk_id, meta in zip(ids, metadatas):
+        doc_id = meta.get('doc_id', 'unknown')
+        doc_info = docs.get(doc_id, {})
+        source = {
+            "document": doc_info.get('filename', 'Unknown'),
+            "chunk": positions.get(chunk_id, meta.get('chunk_id', 0)),
+            "doc_id": doc_id
         }
-        
-        return UploadResponse(
-            document_id=doc_id,
-            message="PDF processed successfully",
-            chunks=len(chunks),
-            sentiment=sentiment,
-            summary=summary
-        )
+        # Chunks stored before page-aware chunking have no page numbers
+        if meta.get('page') is not None:
+            source["page"] = meta['page']
+            source["page_end"] = meta.get('page_end', meta['page'])
+        sources.append(source)
+    return sources
+
+def _record_qa(sources: List[dict], question: str, answer: str, models):
+    """Append the exchange to the Q&A history of every cited document"""
+    timestamp = datetime.now().isoformat()
+    for doc_id in set(s['doc_id'] for s in sources):
+        models.document_store.add_qa(doc_id, question, answer, timestamp)
+
+def _cache_answer(
+    cache_key, answer: str, confidence: float, prompt_metadata: dict,
+    metadatas: List[dict], document_ids, models
+):
+    """Cache an answer under every document it depends on"""
+    used_docs = {meta.get('doc_id') for meta in metadatas}
+    used_docs.update(document_ids or [])
+    models.answer_cache.put(cache_key, (answer, confidence, prompt_metadata), used_docs)
+
+async def _answer_question(
+    question: str,
+    document_ids: Optional[List[str]],
+    chunk_ids: List[str],
+    chunks: List[str],
+    metadatas: List[dict],
+    models
+) -> Tuple[str, float, bool, dict]:
+    """Answer from retrieved chunks, reusing a cached answer when the same chunks were retrieved"""
+    cache_key = models.answer_cache.make_key(question, document_ids, chunk_ids)
+    cached = models.answer_cache.get(cache_key)
+    if cached is not None:
+        answer, confidence, prompt_metadata = cached
+        return answer, confidence, True, prompt_metadata
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    answer, confidence, prompt_metadata = await llm_service.generate_answer(
+        question, chunks, models, metadatas=metadatas
+    )
+    if confidence > 0:
+        _cache_answer(cache_key, answer, confidence, prompt_metadata, metadatas, document_ids, models)
+    return answer, confidence, False, prompt_metadata
+
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/query", response_model=QueryResponse)
 async def query_document(request: QueryRequest):
@@ -96,14 +196,14 @@ async def query_document(request: QueryRequest):
     models = get_models()
     
     try:
-        # Generate query embedding
-        query_embedding = embedding_service.generate_embeddings(
-            [request.question], models
-        )[0]
+        # Generate query embedding (in a thread, so concurrent queries share encoder batches)
+        query_embedding = await asyncio.to_thread(embedding_service.embed_query, request.question, models)
         
-        # Retrieve relevant chunks
-        results = embedding_service.retrieve_chunks(
-            query_embedding, request.top_k, request.document_ids, models
+        # Retrieve relevant chunks (vector store and BM25 index I/O, also off the event loop)
+        results = await asyncio.to_thread(
+            embedding_service.retrieve_chunks,
+            query_embedding, request.top_k, request.document_ids, models,
+            query=request.question
         )
         
         if not results['documents'][0]:
@@ -114,87 +214,359 @@ async def query_document(request: QueryRequest):
             )
         
         # Generate answer
-        answer, confidence = llm_service.generate_answer(
-            request.question, results['documents'][0], models
+        answer, confidence, cached, prompt_metadata = await _answer_question(
+            request.question, request.document_ids, results['ids'][0],
+            results['documents'][0], results['metadatas'][0], models
         )
         
-        # Format sources
-        sources = []
-        for meta in results['metadatas'][0]:
-            doc_id = meta.get('doc_id', 'unknown')
-            doc_info = models.document_store.get(doc_id, {})
-            sources.append({
-                "document": doc_info.get('filename', 'Unknown'),
-                "chunk": meta.get('chunk_id', 0),
-                "doc_id": doc_id
-            })
-        
-        # Store Q&A history
-        for doc_id in set(s['doc_id'] for s in sources):
-            if doc_id in models.document_store:
-                models.document_store[doc_id]['qa_history'].append({
-                    "question": request.question,
-                    "answer": answer,
-                    "timestamp": datetime.now().isoformat()
-                })
+        sources = await asyncio.to_thread(_format_sources, results['ids'][0], results['metadatas'][0], models)
+        await asyncio.to_thread(_record_qa, sources, request.question, answer, models)
         
         return QueryResponse(
             answer=answer,
             sources=sources,
-            confidence=confidence
+            confidence=confidence,
+            metadata={**prompt_metadata, "cached": cached}
         )
     
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error querying document: {str(e)}")
+
+@router.post("/query/stream")
+async def query_document_stream(request: QueryRequest):
+    """Query documents using RAG, streaming sources, answer tokens and confidence as Server-Sent Events"""
+    models = get_models()
+    
+    try:
+        query_embedding = await asyncio.to_thread(embedding_service.embed_query, request.question, models)
+        results = await asyncio.to_thread(
+            embedding_service.retrieve_chunks,
+            query_embedding, request.top_k, request.document_ids, models,
+            query=request.question
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error querying document: {str(e)}")
+    
+    async def events():
+        if not results['documents'][0]:
+            yield _sse("sources", {"sources": []})
+            yield _sse("token", {"text": "No relevant information found. Please upload a document first."})
+            yield _sse("done", {"confidence": 0.0, "low_confidence": False})
+            return
+        
+        sources = await asyncio.to_thread(_format_sources, results['ids'][0], results['metadatas'][0], models)
+        yield _sse("sources", {"sources": sources})
+        
+        cache_key = models.answer_cache.make_key(
+            request.question, request.document_ids, results['ids'][0]
+        )
+        cached = models.answer_cache.get(cache_key)
+        if cached is not None:
+            answer, confidence, prompt_metadata = cached
+            yield _sse("token", {"text": answer})
+            low_confidence = answer.startswith(LOW_CONFIDENCE_PREFIX)
+            yield _sse("done", {
+                "confidence": confidence, "low_confidence": low_confidence,
+                "cached": True, "metadata": prompt_metadata
+            })
+            await asyncio.to_thread(_record_qa, sources, request.question, answer, models)
+            return
+        
+        prompt, prompt_metadata = llm_service.build_prompt(
+            request.question, results['documents'][0], results['metadatas'][0]
+        )
+        scorer = AnswerScorer()
+        parts = []
+        try:
+            async for text in llm_service.stream_answer(
+                request.question, results['documents'][0], models, prompt=prompt
+            ):
+                scorer.feed(text)
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except LLMOverloadedError as e:
+            yield _sse("error", {"detail": str(e), "retry_after": 5})
+            return
+        except Exception as e:
+            # Headers are already sent, so the HTTP error middleware never sees this one
+            telemetry.ERRORS.inc(stage="query_stream")
+            yield _sse("error", {"detail": f"Error generating answer: {str(e)}"})
+            return
+        
+        confidence, low_confidence = scorer.result()
+        answer = "".join(parts).strip()
+        if low_confidence:
+            answer = f"{LOW_CONFIDENCE_PREFIX} {answer}"
+        
+        _cache_answer(
+            cache_key, answer, confidence, prompt_metadata,
+            results['metadatas'][0], request.document_ids, models
+        )
+        await asyncio.to_thread(_record_qa, sources, request.question, answer, models)
+        
+        yield _sse("done", {
+            "confidence": confidence, "low_confidence": low_confidence, "metadata": prompt_metadata
+        })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/query/batch", response_model=BatchQueryResponse)
+async def query_documents_batch(request: BatchQueryRequest):
+    """Answer many questions with one embedding pass, one vector query and concurrent LLM calls"""
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="At least one question is required")
+    if len(request.questions) > settings.BATCH_QUERY_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_QUERY_MAX_QUESTIONS} questions per batch"
+        )
+    
+    models = get_models()
+    started = time.perf_counter()
+    
+    try:
+        query_embeddings = await asyncio.to_thread(embedding_service.embed_queries, request.questions, models)
+        embedded = time.perf_counter()
+        
+        results = await asyncio.to_thread(
+            embedding_service.retrieve_chunks_batch,
+            query_embeddings, request.top_k, request.document_ids, models,
+            queries=request.questions
+        )
+        retrieved = time.perf_counter()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error querying documents: {str(e)}")
+    
+    # Shared stages are amortized evenly across the batch
+    embed_ms = (embedded - started) * 1000 / len(request.questions)
+    retrieve_ms = (retrieved - embedded) * 1000 / len(request.questions)
+    limit = asyncio.Semaphore(max(1, min(request.max_concurrency, settings.BATCH_QUERY_CONCURRENCY)))
+    
+    async def answer(i: int, question: str) -> BatchQueryResult:
+        llm_started = time.perf_counter()
+        if not results['documents'][i]:
+            answer_text, confidence, cached = "No relevant information found. Please upload a document first.", 0.0, False
+            prompt_metadata = {}
+            sources = []
+        else:
+            async with limit:
+                try:
+                    answer_text, confidence, cached, prompt_metadata = await _answer_question(
+                        question, request.document_ids, results['ids'][i],
+                        results['documents'][i], results['metadatas'][i], models
+                    )
+                except LLMOverloadedError as e:
+                    answer_text, confidence, cached = f"Error generating answer: {str(e)}", 0.0, False
+                    prompt_metadata = {}
+            sources = await asyncio.to_thread(_format_sources, results['ids'][i], results['metadatas'][i], models)
+            await asyncio.to_thread(_record_qa, sources, question, answer_text, models)
+        
+        return BatchQueryResult(
+            question=question,
+            answer=answer_text,
+            sources=sources,
+            confidence=confidence,
+            cached=cached,
+            metadata=prompt_metadata,
+            timings={
+                "embed_ms": round(embed_ms, 2),
+                "retrieve_ms": round(retrieve_ms, 2),
+                "llm_ms": round((time.perf_counter() - llm_started) * 1000, 2)
+            }
+        )
+    
+    answers = await asyncio.gather(*[
+        answer(i, question) for i, question in enumerate(request.questions)
+    ])
+    finished = time.perf_counter()
+    
+    return BatchQueryResponse(
+        results=answers,
+        timings={
+            "embed_ms": round((embedded - started) * 1000, 2),
+            "retrieve_ms": round((retrieved - embedded) * 1000, 2),
+            "llm_ms": round((finished - retrieved) * 1000, 2),
+            "total_ms": round((finished - started) * 1000, 2)
+        }
+    )
+
+async def _with_metrics(doc: dict, models) -> dict:
+    """Document with its metric record, computing and saving it for documents ingested before records existed"""
+    if doc.get("metrics") is None:
+        # Text loading and the scan (which may wait on the extraction pool) stay off the event loop
+        text = await asyncio.to_thread(models.document_store.load_text, doc["id"])
+        matches, keyword_counts = await asyncio.to_thread(pdf_service.scan_pages, [{"page": None, "text": text}])
+        record = metrics_service.build_record(matches, keyword_counts)
+        # Only the metrics column: the rest of doc may be stale if an update finished meanwhile
+        await asyncio.to_thread(models.document_store.put_metrics, doc["id"], record)
+        doc = {**doc, "metrics": record}
+    return doc
+
+@router.post("/compare", response_model=ComparisonResponse)
+async def compare_documents(request: ComparisonRequest):
+    """Compare metrics across documents from the records stored at ingest"""
+    fields = list(dict.fromkeys(request.metrics)) or METRIC_FIELDS
+    unknown = [name for name in fields if name not in METRIC_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown metrics: {', '.join(unknown)}. Available: {', '.join(METRIC_FIELDS)}"
+        )
+    
+    doc_ids = list(dict.fromkeys(request.document_ids))
+    if not doc_ids:
+        raise HTTPException(status_code=400, detail="No document_ids provided")
+    if len(doc_ids) > settings.COMPARE_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many documents (max {settings.COMPARE_MAX_DOCUMENTS})"
+        )
+    
+    models = get_models()
+    docs = await asyncio.to_thread(models.document_store.get_many, doc_ids)
+    missing = [doc_id for doc_id in doc_ids if doc_id not in docs]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Documents not found: {', '.join(missing)}")
+    
+    with_metrics = await asyncio.gather(*[_with_metrics(docs[doc_id], models) for doc_id in doc_ids])
+    comparison, statistics, insights = metrics_service.compare(with_metrics, fields)
+    return ComparisonResponse(comparison=comparison, insights=insights, statistics=statistics)
+
+@router.get("/metrics/{doc_id}", response_model=MetricsResponse)
+async def get_metrics(doc_id: str):
+    """Normalized financial metrics for one document"""
+    models = get_models()
+    
+    doc = await asyncio.to_thread(models.document_store.get, doc_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    record = (await _with_metrics(doc, models))["metrics"]
+    return MetricsResponse(
+        revenue=metrics_service.describe(record, "revenue"),
+        profit_margin=metrics_service.describe(record, "profit_margin"),
+        growth_rate=metrics_service.describe(record, "growth_rate"),
+        debt_to_equity=metrics_service.describe(record, "debt_to_equity"),
+        risk_score=record["risk_score"],
+        key_metrics={
+            "net_income": metrics_service.describe(record, "net_income"),
+            "eps": metrics_service.describe(record, "eps"),
+            "keyword_mentions": record.get("keyword_mentions", {})
+        }
+    )
 
 @router.get("/documents", response_model=List[DocumentInfo])
 async def list_documents():
     """List all uploaded documents"""
     models = get_models()
+    docs = await asyncio.to_thread(models.document_store.list)
     return [
         DocumentInfo(
-            id=doc_id,
+            id=doc['id'],
             filename=doc['filename'],
             upload_date=doc['upload_date'],
             chunks=doc['chunks'],
             sentiment=doc['sentiment'],
-            summary=doc['summary']
+            summary=doc['summary'],
+            version=doc.get('version') or 1
         )
-        for doc_id, doc in models.document_store.items()
+        for doc in docs
     ]
 
+@router.put("/document/{document_id}", response_model=UploadJobResponse, status_code=202)
+async def update_document(document_id: str, file: UploadFile = File(...)):
+    """Upload a new version of a document; only chunks whose text changed are embedded and written"""
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    
+    models = get_models()
+    doc = await asyncio.to_thread(models.document_store.get, document_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    content = await file.read()
+    file_hash = content_hash(content)
+    if file_hash == doc.get('content_hash'):
+        job = ingestion_service.record_duplicate(doc, file.filename, message="Document is unchanged")
+        return UploadJobResponse(
+            job_id=job.id,
+            document_id=document_id,
+            status=job.status,
+            message="Document is unchanged"
+        )
+    
+    if ingestion_service.find_active_update(document_id) is not None:
+        raise HTTPException(status_code=409, detail="Document is already being updated")
+    
+    version = (doc.get('version') or 1) + 1
+    file_path = Path(settings.UPLOAD_DIR) / f"{document_id}_v{version}_{file.filename}"
+    with open(file_path, "wb") as buffer:
+        buffer.write(content)
+    
+    job = ingestion_service.submit_update(
+        doc, file.filename, str(file_path), models, content_hash=file_hash
+    )
+    
+    return UploadJobResponse(
+        job_id=job.id,
+        document_id=document_id,
+        status=job.status,
+        message=f"Version {version} queued for processing"
+    )
+
+def _delete_document(document_id: str, models):
+    """Remove a document's vectors, cached answers and reports, then its record"""
+    # Delete from vector store
+    embedding_service.delete_embeddings(document_id, models)
+    models.answer_cache.invalidate_document(document_id)
+    export_service.invalidate(document_id)
+    
+    # Delete from document store
+    models.document_store.delete(document_id)
+
 @router.delete("/document/{document_id}")
 async def delete_document(document_id: str):
     """Delete a document"""
     models = get_models()
     
-    if document_id not in models.document_store:
+    if await asyncio.to_thread(models.document_store.get, document_id) is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Delete from vector store
-    models.collection.delete(where={"doc_id": document_id})
-    
-    # Delete from document store
-    del models.document_store[document_id]
+    if ingestion_service.find_active_update(document_id) is not None:
+        raise HTTPException(status_code=409, detail="Document is being updated")
     
+    await asyncio.to_thread(_delete_document, document_id, models)
     return {"message": "Document deleted successfully"}
 
 @router.post("/export")
-async def export_report(request: ExportRequest):
-    """Export analysis as PDF"""
+async def export_report(request: ExportRequest, if_none_match: Optional[str] = Header(None)):
+    """Export analysis as PDF (cached per document version and include_* flags)"""
     models = get_models()
     
-    if request.document_id not in models.document_store:
+    doc = await asyncio.to_thread(models.document_store.get, request.document_id)
+    if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    doc = models.document_store[request.document_id]
+    etag = f'"{export_service.cache_key(request.document_id, doc, request)}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
     
-    pdf_path = export_service.create_report(
-        request.document_id, doc, request, models
+    # Rendering is blocking reportlab work; keep it off the event loop
+    pdf_path, etag = await asyncio.to_thread(
+        export_service.get_or_create_report, request.document_id, doc, request, models
     )
+    headers["ETag"] = etag
     
     return FileResponse(
         pdf_path,
         media_type='application/pdf',
-        filename=f"{request.document_id}_analysis.pdf"
-    )
\ No newline at end of file
+        filename=f"{request.document_id}_analysis.pdf",
+        headers=headers
+    )
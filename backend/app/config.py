@@ -4,6 +4,7 @@ Configuration settings loaded from environment variables
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
+from typing import Optional
 
 class Settings(BaseSettings):
     # Server
@@ -18,16 +19,108 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
     SENTIMENT_MODEL: str = "distilbert-base-uncased-finetuned-sst-2-english"
     GEMINI_MODEL: str = "gemini-1.5-flash"
+    GEMINI_DISCOVER_MODELS: bool = False
+    
+    # Inference backend for the embedding and sentiment models ("torch", "onnx" or "int8")
+    INFERENCE_BACKEND: str = "torch"
+    INFERENCE_THREADS: int = 0
+    
+    # Where those models run: "local" (in each API process) or "sidecar" (one inference process
+    # per host shared by all workers; run.py --workers N starts it)
+    INFERENCE_MODE: str = "local"
+    INFERENCE_SIDECAR_ADDRESS: str = "127.0.0.1:8765"
+    INFERENCE_SIDECAR_AUTHKEY: str = ""
+    
+    # Model loading: "eager" (parallel, before serving), "background" (parallel, while serving) or "lazy" (on first use)
+    MODEL_LOADING: str = "background"
+    
+    # LLM client ("gemini" or "fake" for the local stand-in)
+    LLM_BACKEND: str = "gemini"
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_REQUESTS_PER_MINUTE: int = 15
+    LLM_MAX_RETRIES: int = 3
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_PENDING: int = 64
+    FAKE_LLM_LATENCY_MS: int = 50
     
     # Processing
-    CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 100
+    # Chunk size and overlap in estimated tokens (about 4 characters each)
+    CHUNK_TOKENS: int = 250
+    CHUNK_OVERLAP_TOKENS: int = 25
+    # Deprecated character-based settings; converted to tokens at startup when the token settings are not set
+    CHUNK_SIZE: Optional[int] = None
+    CHUNK_OVERLAP: Optional[int] = None
     MAX_CHUNKS_PER_QUERY: int = 5
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    EMBEDDING_BATCH_SIZE: int = 64
+    
+    # Merge encode calls from concurrent requests: wait up to WAIT_MS for a batch of up to MAX_BATCH texts,
+    # or MAX_INGEST_BATCH when only ingestion is waiting (keep it >= BULK_EMBEDDING_BATCH_SIZE)
+    EMBEDDING_BATCHING: bool = True
+    EMBEDDING_BATCHER_MAX_BATCH: int = 64
+    EMBEDDING_BATCHER_MAX_INGEST_BATCH: int = 256
+    EMBEDDING_BATCHER_WAIT_MS: float = 2.0
+    BATCH_QUERY_MAX_QUESTIONS: int = 100
+    BATCH_QUERY_CONCURRENCY: int = 8
+    COMPARE_MAX_DOCUMENTS: int = 100
+    
+    # Retrieval ("hybrid" fuses dense and BM25 results with reciprocal rank fusion, "dense" uses vectors only)
+    RETRIEVAL_MODE: str = "hybrid"
+    HYBRID_CANDIDATES: int = 20
+    RRF_K: int = 60
+    
+    # Sentiment: micro-batch size, tokens per window, scoring time budget per document (0 = no limit)
+    SENTIMENT_BATCH_SIZE: int = 32
+    SENTIMENT_MAX_TOKENS: int = 512
+    SENTIMENT_TIME_BUDGET_SECONDS: float = 60.0
+    
+    # PDF extraction (0 workers = one per CPU core)
+    PDF_EXTRACT_WORKERS: int = 0
+    PDF_PARALLEL_MIN_PAGES: int = 40
+    METRIC_PARALLEL_MIN_CHARS: int = 8_000_000
+    
+    # Background ingestion
+    INGEST_WORKERS: int = 2
+    INGEST_STREAMING: bool = True
+    INGEST_PREFETCH_DEPTH: int = 2
+    JOB_HISTORY_LIMIT: int = 200
+    # "memory" or "sqlite" (job status visible to every worker process)
+    JOB_STORE: str = "memory"
+    
+    # Bulk import: documents ingested together, chunks per shared embedding batch, files per batch
+    BULK_GROUP_SIZE: int = 16
+    BULK_EMBEDDING_BATCH_SIZE: int = 256
+    BULK_MAX_FILES: int = 5000
+    
+    # Document metadata store ("sqlite" or "memory")
+    DOCUMENT_STORE: str = "sqlite"
+    QA_HISTORY_LIMIT: int = 100
+    
+    # Caching
+    EMBEDDING_CACHE_ENABLED: bool = True
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    ANSWER_CACHE_SIZE: int = 512
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    
+    # Vector store: "chroma" or "numpy" (memory-mapped per-document arrays in DATA_DIR/vectors).
+    # numpy stores "int8" (4x smaller than float32 and fastest to search) or "float16" vectors
+    VECTOR_STORE: str = "chroma"
+    VECTOR_DTYPE: str = "int8"
+    
+    # Vector database: embedded in CHROMA_DIR unless CHROMA_HOST points at a Chroma server
+    CHROMA_HOST: str = ""
+    CHROMA_PORT: int = 8001
+    
+    # Telemetry: return per-span timings in a Server-Timing header on every response
+    # (otherwise only when the request sends X-Debug-Trace)
+    TRACE_HEADERS: bool = False
     
     # Directories
     UPLOAD_DIR: str = "uploads"
     EXPORT_DIR: str = "exports"
     CHROMA_DIR: str = "chroma_db"
+    CACHE_DIR: str = "cache"
+    DATA_DIR: str = "data"
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -37,11 +130,22 @@ class Settings(BaseSettings):
 # Global settings instance
 settings = Settings()
 
+# Deprecated chunk settings (characters) map onto the token-based ones, about 4 characters per token
+for old_name, new_name in (("CHUNK_SIZE", "CHUNK_TOKENS"), ("CHUNK_OVERLAP", "CHUNK_OVERLAP_TOKENS")):
+    old_value = getattr(settings, old_name)
+    if old_value is None:
+        continue
+    print(f"⚠️  WARNING: {old_name} is deprecated, use {new_name} (estimated tokens)")
+    if new_name not in settings.model_fields_set:
+        setattr(settings, new_name, max(old_value // 4, 0))
+
 # Validate API key
-if not settings.GEMINI_API_KEY:
+if not settings.GEMINI_API_KEY and settings.LLM_BACKEND != "fake":
     print("⚠️  WARNING: GEMINI_API_KEY not set in .env file")
 
 # Create directories
 Path(settings.UPLOAD_DIR).mkdir(exist_ok=True)
 Path(settings.EXPORT_DIR).mkdir(exist_ok=True)
-Path(settings.CHROMA_DIR).mkdir(exist_ok=True)
\ No newline at end of file
+Path(settings.CHROMA_DIR).mkdir(exist_ok=True)
+Path(settings.CACHE_DIR).mkdir(exist_ok=True)
+Path(settings.DATA_DIR).mkdir(exist_ok=True)
\ No newline at end of file
@@ -2,11 +2,15 @@
 FastAPI application initialization and startup
 """
 
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from app.config import settings
-from app.api.routes import router
+from app.api.routes import router, export_service, ingestion_service
 from app.api.dependencies import get_models, ModelDependencies
+from app.services.pdf_service import shutdown_process_pool
+from app.utils import telemetry
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -27,22 +31,83 @@ app.add_middleware(
 # Include API routes
 app.include_router(router)
 
+# Trace every request: spans recorded while handling it are reported in Server-Timing
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace, token = telemetry.start_trace()
+    try:
+        response = await call_next(request)
+    except Exception:
+        telemetry.ERRORS.inc(stage="http")
+        raise
+    finally:
+        telemetry.end_trace(token)
+    
+    route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+    telemetry.HTTP_SECONDS.observe(
+        trace.elapsed(), method=request.method, route=route, status=response.status_code
+    )
+    if response.status_code >= 500:
+        telemetry.ERRORS.inc(stage="http")
+    if settings.TRACE_HEADERS or request.headers.get("x-debug-trace"):
+        response.headers["Server-Timing"] = trace.server_timing()
+        response.headers["X-Trace-Id"] = trace.id
+    return response
+
+def _cache_counts(attribute: str) -> dict:
+    """Hit or miss counts of every cache, read when /metrics is scraped"""
+    models = get_models()
+    caches = {
+        "embedding": models.embedding_cache,
+        "query_embedding": models.query_embedding_cache,
+        "answer": models.answer_cache,
+        "export": export_service,
+    }
+    return {(name,): getattr(cache, attribute) for name, cache in caches.items() if cache is not None}
+
+def _memory_store_entries() -> dict:
+    models = get_models()
+    entries = {
+        ("query_embedding_cache",): len(models.query_embedding_cache),
+        ("answer_cache",): len(models.answer_cache),
+        ("ingestion_jobs",): len(ingestion_service.list_jobs()),
+    }
+    if settings.DOCUMENT_STORE == "memory":
+        entries[("documents",)] = models.document_store.count()
+    return entries
+
+telemetry.CACHE_HITS.set_function(lambda: _cache_counts("hits"))
+telemetry.CACHE_MISSES.set_function(lambda: _cache_counts("misses"))
+telemetry.DOCUMENTS.set_function(lambda: get_models().document_store.count())
+telemetry.MEMORY_STORE_ENTRIES.set_function(_memory_store_entries)
+
 # Startup event - load models
 @app.on_event("startup")
 async def startup_event():
-    """Load AI models on startup"""
+    """Start loading AI models according to MODEL_LOADING"""
     print("🚀 Starting Financial Report Analyzer Backend...")
     print(f"📊 Server: {settings.HOST}:{settings.PORT}")
     print(f"🤖 Powered by: Google Gemini")
-    print(f"🔧 Loading AI models...")
+    print(f"🔧 Model loading mode: {settings.MODEL_LOADING}")
     
-    try:
-        models = get_models()
+    models = get_models()
+    
+    if settings.MODEL_LOADING == "eager":
+        await asyncio.to_thread(models.warm_up, True)
+        failed = {name: c["error"] for name, c in models.status().items() if c["status"] == "failed"}
+        if failed:
+            print(f"❌ Error loading models: {failed}")
+            raise Exception(f"Could not load models: {failed}")
         print("✅ All models loaded successfully!")
-        print(f"✅ Gemini model: {settings.GEMINI_MODEL}")
-    except Exception as e:
-        print(f"❌ Error loading models: {e}")
-        raise
+    elif settings.MODEL_LOADING == "background":
+        # Load in parallel threads while the server is already answering /health
+        models.warm_up()
+
+# Shutdown event - release worker processes
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background worker pools"""
+    shutdown_process_pool()
 
 @app.get("/")
 async def root():
@@ -55,18 +120,28 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, LLM tokens, cache hits, errors and store sizes"""
+    return Response(telemetry.REGISTRY.render(), media_type=telemetry.CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint; reports per-component readiness without loading anything"""
     models = get_models()
+    components = models.status()
+    
+    if any(c["status"] == "failed" for c in components.values()):
+        status = "degraded"
+    elif models.is_ready():
+        status = "healthy"
+    else:
+        status = "starting"
+    
     return {
-        "status": "healthy",
+        "status": status,
         "llm": "Gemini",
-        "models_loaded": all([
-            models.embedding_model is not None,
-            models.gemini_model is not None,
-            models.sentiment_analyzer is not None,
-            models.collection is not None
-        ]),
-        "documents_loaded": len(models.document_store)
-    }
\ No newline at end of file
+        "models_loaded": models.is_ready(),
+        "components": components,
+        "documents_loaded": models.document_store.count()
+    }
@@ -14,6 +14,26 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]]
     confidence: float
+    metadata: Dict[str, Any] = {}
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    top_k: int = 5
+    document_ids: Optional[List[str]] = None
+    max_concurrency: int = 8
+
+class BatchQueryResult(BaseModel):
+    question: str
+    answer: str
+    sources: List[Dict[str, Any]]
+    confidence: float
+    cached: bool = False
+    timings: Dict[str, float]
+    metadata: Dict[str, Any] = {}
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult]
+    timings: Dict[str, float]
 
 class ComparisonRequest(BaseModel):
     document_ids: List[str]
@@ -22,6 +42,7 @@ class ComparisonRequest(BaseModel):
 class ComparisonResponse(BaseModel):
     comparison: Dict[str, Dict[str, Any]]
     insights: List[str]
+    statistics: Dict[str, Dict[str, Any]] = {}
 
 class MetricsResponse(BaseModel):
     revenue: Dict[str, Any]
@@ -45,10 +66,55 @@ class DocumentInfo(BaseModel):
     chunks: int
     sentiment: Dict
     summary: Dict
+    version: int = 1
 
 class UploadResponse(BaseModel):
     document_id: str
     message: str
     chunks: int
     sentiment: Dict
-    summary: Dict
\ No newline at end of file
+    summary: Dict
+    version: int = 1
+    changes: Optional[Dict] = None
+
+class UploadJobResponse(BaseModel):
+    job_id: str
+    document_id: str
+    status: str
+    message: str
+
+class BulkFileResult(BaseModel):
+    filename: str
+    status: str
+    document_id: Optional[str] = None
+    job_id: Optional[str] = None
+    chunks: Optional[int] = None
+    pages: Optional[int] = None
+    total_ms: Optional[float] = None
+    error: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    batch_id: str
+    status: str
+    created_at: str
+    files: List[BulkFileResult]
+    total_ms: Optional[float] = None
+    throughput: Dict = {}
+
+class JobStage(BaseModel):
+    name: str
+    status: str
+    progress: float = 0.0
+    started_at: Optional[str] = None
+    duration_ms: Optional[float] = None
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    document_id: str
+    filename: str
+    status: str
+    created_at: str
+    stages: List[JobStage]
+    total_ms: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[UploadResponse] = None
@@ -0,0 +1,202 @@
+"""
+Chunker - Page-aware, token-budgeted text splitting with page numbers and character offsets
+"""
+
+import math
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from app.services.context_builder import TOKEN_PIECES
+
+# Preferred split points, coarsest first: paragraphs, lines, sentence ends, any whitespace
+SEPARATORS = [
+    re.compile(r"\n[ \t]*\n\s*"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=[.!?;:])\s+"),
+    re.compile(r"\s+"),
+]
+LINE_LEVEL = 1
+
+# A line with two or more numeric cells reads as a table row ("Revenue  $1,234  $1,100  12%")
+NUMERIC_CELL = re.compile(r"[$(€£-]?\d[\d,.]*%?\)?")
+MAX_TABLE_LINE = 200
+
+class Chunk(NamedTuple):
+    """A chunk's text and where it came from; start indexes the text of page and end the text of page_end,
+    so the offsets of a chunk only change when its own pages do"""
+    text: str
+    page: int
+    page_end: int
+    start: int
+    end: int
+
+    def metadata(self) -> Dict:
+        return {"page": self.page, "page_end": self.page_end, "start": self.start, "end": self.end}
+
+class _Page:
+    """Page text with a running token count, so any span is measured without slicing"""
+
+    def __init__(self, number: int, text: str):
+        self.number = number
+        self.text = text
+        self.starts = []
+        self.cumulative = [0]
+        total = 0
+        for match in TOKEN_PIECES.finditer(text):
+            self.starts.append(match.start())
+            total += 1 + (match.end() - match.start()) // 8
+            self.cumulative.append(total)
+
+    def tokens(self, start: int, end: int) -> int:
+        """Same estimate as context_builder.estimate_tokens, for text[start:end]"""
+        pieces = self.cumulative[bisect_left(self.starts, end)] - self.cumulative[bisect_left(self.starts, start)]
+        return max(pieces, math.ceil((end - start) / 4))
+
+def _is_table_row(text: str, start: int, end: int) -> bool:
+    if end - start > MAX_TABLE_LINE:
+        return False
+    return len(NUMERIC_CELL.findall(text, start, end)) >= 2
+
+def _trim(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+class StructuredChunker:
+    """Split pages into chunks of at most chunk_tokens, breaking at paragraphs, then lines, sentences and words.
+    Table rows are never split and short tables stay whole; chunks do not cross page boundaries except when
+    whole short pages are merged."""
+
+    def __init__(self, chunk_tokens: int, overlap_tokens: int = 0):
+        self.chunk_tokens = max(chunk_tokens, 8)
+        self.overlap_tokens = min(max(overlap_tokens, 0), self.chunk_tokens // 2)
+
+    def iter_chunks(self, pages: Iterable[Dict]) -> Iterator[Chunk]:
+        """Chunks in document order from {"page": n, "text": ...} dicts, holding back only a run of short pages"""
+        group: List[_Page] = []
+        group_tokens = 0
+
+        for page in pages:
+            current = _Page(page["page"], page["text"])
+            if not page["text"].strip():
+                continue
+
+            tokens = current.tokens(0, len(current.text))
+            if group and group_tokens + tokens > self.chunk_tokens:
+                yield from self._group_chunk(group)
+                group, group_tokens = [], 0
+            if tokens <= self.chunk_tokens:
+                # Short pages (covers, section titles) share a chunk with their neighbours
+                group.append(current)
+                group_tokens += tokens
+                continue
+
+            for start, end in self._split(current, 0, len(current.text), 0):
+                start, end = _trim(current.text, start, end)
+                if start < end:
+                    yield Chunk(current.text[start:end], current.number, current.number, start, end)
+
+        if group:
+            yield from self._group_chunk(group)
+
+    def split_pages(self, pages: Iterable[Dict]) -> List[Chunk]:
+        return list(self.iter_chunks(pages))
+
+    def _group_chunk(self, group: List[_Page]) -> Iterator[Chunk]:
+        first, last = group[0], group[-1]
+        start, _ = _trim(first.text, 0, len(first.text))
+        _, end = _trim(last.text, 0, len(last.text))
+        if len(group) == 1:
+            text = first.text[start:end]
+        else:
+            text = "\n".join([first.text[start:], *(page.text for page in group[1:-1]), last.text[:end]])
+        yield Chunk(text, first.number, last.number, start, end)
+
+    def _pieces(self, page: _Page, start: int, end: int, level: int) -> List[Tuple[int, int]]:
+        """Spans between separators of this level; each separator stays with the piece before it"""
+        pieces = []
+        position = start
+        for match in SEPARATORS[level].finditer(page.text, start, end):
+            if match.end() > position and match.start() > position:
+                pieces.append((position, match.end()))
+                position = match.end()
+        if position < end:
+            pieces.append((position, end))
+        return pieces
+
+    def _group_table_rows(self, page: _Page, pieces: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Merge runs of table rows into one piece when the whole table fits in a chunk"""
+        grouped = []
+        run = []
+        for piece in pieces + [None]:
+            if piece is not None and _is_table_row(page.text, *piece):
+                run.append(piece)
+                continue
+            if len(run) > 1 and page.tokens(run[0][0], run[-1][1]) <= self.chunk_tokens:
+                grouped.append((run[0][0], run[-1][1]))
+            else:
+                grouped.extend(run)
+            run = []
+            if piece is not None:
+                grouped.append(piece)
+        return grouped
+
+    def _hard_split(self, page: _Page, start: int, end: int) -> List[Tuple[int, int]]:
+        """Cut text with no usable separator (one enormous token run) every chunk_tokens * 4 characters"""
+        step = self.chunk_tokens * 4
+        return [(position, min(position + step, end)) for position in range(start, end, step)]
+
+    def _split(self, page: _Page, start: int, end: int, level: int) -> List[Tuple[int, int]]:
+        total = page.tokens(start, end)
+        if total <= self.chunk_tokens:
+            return [(start, end)]
+        if level == len(SEPARATORS):
+            return self._hard_split(page, start, end)
+
+        pieces = self._pieces(page, start, end, level)
+        if len(pieces) <= 1:
+            return self._split(page, start, end, level + 1)
+        if level == LINE_LEVEL:
+            pieces = self._group_table_rows(page, pieces)
+
+        # Even chunk sizes instead of full chunks followed by a small remainder
+        target = math.ceil(total / math.ceil(total / self.chunk_tokens))
+        spans = []
+        current: List[Tuple[int, int]] = []
+
+        for piece in pieces:
+            if page.tokens(*piece) > self.chunk_tokens:
+                if current:
+                    spans.append((current[0][0], current[-1][1]))
+                    current = []
+                spans.extend(self._split(page, piece[0], piece[1], level + 1))
+                continue
+
+            if current and (
+                page.tokens(current[0][0], piece[1]) > self.chunk_tokens
+                or page.tokens(current[0][0], current[-1][1]) >= target
+            ):
+                spans.append((current[0][0], current[-1][1]))
+                current = self._overlap(page, current, piece)
+            current.append(piece)
+
+        if current:
+            spans.append((current[0][0], current[-1][1]))
+        return spans
+
+    def _overlap(self, page: _Page, previous: List[Tuple[int, int]], following: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Trailing pieces of the finished chunk to repeat at the start of the next one"""
+        if not self.overlap_tokens:
+            return []
+        end = previous[-1][1]
+        kept = []
+        for piece in reversed(previous[1:]):
+            if page.tokens(piece[0], end) > self.overlap_tokens:
+                break
+            if page.tokens(piece[0], following[1]) > self.chunk_tokens:
+                break
+            kept.insert(0, piece)
+        return kept
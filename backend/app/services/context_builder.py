@@ -0,0 +1,133 @@
+"""
+Context builder - Deduplicate, merge and budget retrieved chunks for the RAG prompt
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Word pieces plus standalone punctuation, roughly how SentencePiece-style tokenizers split text
+TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate: one per word or symbol, plus extra for long words, never below chars / 4"""
+    pieces = TOKEN_PIECES.findall(text)
+    estimate = sum(1 + len(piece) // 8 for piece in pieces)
+    return max(estimate, math.ceil(len(text) / 4))
+
+def overlap_length(previous: str, following: str, max_overlap: int, min_overlap: int = 20) -> int:
+    """Length of the longest suffix of previous that is also a prefix of following"""
+    limit = min(max_overlap, len(previous), len(following))
+    for size in range(limit, min_overlap - 1, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+def chunk_position(meta: Dict) -> Optional[Tuple]:
+    """Where a chunk sits in its document: (chunk number,) for chunks stored with positional ids,
+    (page, start) for chunks stored with page offsets, None when unknown"""
+    if meta.get("chunk_id") is not None:
+        return (meta["chunk_id"],)
+    if meta.get("page") is not None and meta.get("start") is not None:
+        return (meta["page"], meta["start"])
+    return None
+
+class Passage:
+    """A run of adjacent chunks from one document, merged without their overlapping text"""
+
+    def __init__(self, doc_id: str, position: Optional[Tuple], text: str, rank: int, meta: Optional[Dict] = None):
+        meta = meta or {}
+        self.doc_id = doc_id
+        self.last = position
+        self.text = text
+        self.rank = rank
+        self.page_end = meta.get("page_end", meta.get("page"))
+        self.end = meta.get("end")
+        self.chunks = 1
+
+    def overlap(self, doc_id: str, position: Tuple, text: str, meta: Dict, max_overlap: int) -> Optional[int]:
+        """Characters of text already at the end of this passage, or None when text does not continue it"""
+        if self.doc_id != doc_id or self.last is None or len(self.last) != len(position):
+            return None
+        start = meta.get("start")
+        if len(position) == 1:
+            # Chunk numbers (with document offsets, if any) from before page offsets were stored
+            if self.last[0] != position[0] - 1:
+                return None
+            if self.end is not None and start is not None:
+                return min(max(self.end - start, 0), len(text))
+            return overlap_length(self.text, text, max_overlap)
+        # Page offsets: a chunk continues the passage when it starts inside it, on the page where it ends
+        if self.page_end != meta["page"] or self.end is None or start > self.end:
+            return None
+        return min(self.end - start, len(text))
+
+def pack_context(
+    chunks: List[str],
+    metadatas: Optional[List[Dict]],
+    token_budget: int,
+    max_overlap: int
+) -> Dict:
+    """Merge adjacent chunks, drop duplicated overlap and keep the best-ranked passages within the budget"""
+    metadatas = metadatas or [{} for _ in chunks]
+    retrieved_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+
+    # Retrieval order is the rank; identical chunks (e.g. from fused result lists) count once
+    seen = set()
+    entries = []
+    for rank, (chunk, meta) in enumerate(zip(chunks, metadatas)):
+        position = chunk_position(meta)
+        key = (meta.get("doc_id"), position) if position is not None else chunk
+        if key in seen:
+            continue
+        seen.add(key)
+        entries.append((meta.get("doc_id"), position, chunk, rank, meta))
+
+    # Walk each document in reading order, merging neighbours into passages
+    passages = []
+    located = sorted(
+        (e for e in entries if e[1] is not None),
+        key=lambda e: (str(e[0]), len(e[1]), e[1])
+    )
+    for doc_id, position, text, rank, meta in located:
+        previous = passages[-1] if passages else None
+        overlap = previous.overlap(doc_id, position, text, meta, max_overlap) if previous else None
+        if overlap is not None:
+            previous.text = previous.text + (text[overlap:] if overlap else "\n" + text)
+            previous.last = position
+            previous.rank = min(previous.rank, rank)
+            previous.page_end = meta.get("page_end", meta.get("page"))
+            previous.end = meta.get("end")
+            previous.chunks += 1
+        else:
+            passages.append(Passage(doc_id, position, text, rank, meta))
+    passages.extend(Passage(doc_id, None, text, rank) for doc_id, position, text, rank, _ in entries if position is None)
+
+    # Best-ranked passages first, skipping any that would overrun the budget
+    passages.sort(key=lambda p: p.rank)
+    separator_tokens = estimate_tokens(CONTEXT_SEPARATOR)
+    selected = []
+    used_tokens = 0
+    for passage in passages:
+        tokens = estimate_tokens(passage.text) + (separator_tokens if selected else 0)
+        if used_tokens + tokens <= token_budget:
+            selected.append(passage)
+            used_tokens += tokens
+        elif not selected:
+            # Even the best passage is too long: keep its beginning
+            passage.text = passage.text[:max(token_budget, 1) * 4]
+            while estimate_tokens(passage.text) > token_budget and len(passage.text) > 1:
+                passage.text = passage.text[:int(len(passage.text) * 0.9)]
+            selected.append(passage)
+            used_tokens = estimate_tokens(passage.text)
+
+    return {
+        "context": CONTEXT_SEPARATOR.join(p.text for p in selected),
+        "context_tokens": used_tokens,
+        "retrieved_chunks": len(chunks),
+        "context_chunks": sum(p.chunks for p in selected),
+        "passages": len(selected),
+        "tokens_saved": max(0, retrieved_tokens - used_tokens),
+    }
@@ -0,0 +1,421 @@
+"""
+Document store - Persistent document metadata, chunk ids and Q&A history
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Document fields persisted by the stores; JSON fields are serialized in SQLite
+DOCUMENT_FIELDS = {
+    "filename": "TEXT NOT NULL",
+    "upload_date": "TEXT NOT NULL",
+    "chunks": "INTEGER NOT NULL DEFAULT 0",
+    "pages": "INTEGER",
+    "sentiment": "TEXT",
+    "summary": "TEXT",
+    "content_hash": "TEXT",
+    "text_path": "TEXT",
+    "version": "INTEGER NOT NULL DEFAULT 1",
+    "metrics": "TEXT",
+}
+JSON_FIELDS = {"sentiment", "summary", "metrics"}
+
+class DocumentStore:
+    """Interface for document metadata storage; full text lives on disk and loads on demand"""
+
+    def __init__(self, qa_history_limit: int = 100):
+        self.qa_history_limit = qa_history_limit
+
+    def put(
+        self, doc: Dict, chunk_ids: Optional[List[str]] = None,
+        chunk_sentiment: Optional[List[Tuple[Optional[float], int]]] = None
+    ) -> None:
+        """Write a document's record; given chunk ids, they replace its recorded ones in the same transaction"""
+        raise NotImplementedError
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_many(self, doc_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Documents for the ids that exist"""
+        docs = {}
+        for doc_id in set(doc_ids):
+            doc = self.get(doc_id)
+            if doc is not None:
+                docs[doc_id] = doc
+        return docs
+
+    def delete(self, doc_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def list(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def put_metrics(self, doc_id: str, metrics: Dict) -> None:
+        """Fill in the metric record of a document that has none, leaving every other field as stored"""
+        raise NotImplementedError
+
+    def put_chunk_ids(
+        self, doc_id: str, chunk_ids: List[str], chunk_sentiment: Optional[List[Tuple[Optional[float], int]]] = None
+    ) -> None:
+        """Record the ids of a document's chunks in document order, with each chunk's sentiment (score, weight)"""
+        raise NotImplementedError
+
+    def get_chunk_ids(self, doc_id: str) -> List[str]:
+        """A document's chunk ids in order (empty for documents stored before ids were recorded)"""
+        raise NotImplementedError
+
+    def chunk_positions(self, chunk_ids: Iterable[str]) -> Dict[str, int]:
+        """Position of each recorded chunk id in its document's order; unrecorded ids are left out"""
+        raise NotImplementedError
+
+    def get_chunk_sentiment(self, doc_id: str) -> Dict[str, Tuple[float, int]]:
+        """(score, weight) of each scored chunk of a document, by chunk id"""
+        raise NotImplementedError
+
+    def add_qa(self, doc_id: str, question: str, answer: str, timestamp: str) -> None:
+        raise NotImplementedError
+
+    def get_qa(self, doc_id: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self.get(doc_id) is not None
+
+    def load_text(self, doc_id: str) -> str:
+        """Read a document's full text from disk"""
+        doc = self.get(doc_id)
+        if doc is None or not doc.get("text_path"):
+            return ""
+        try:
+            return Path(doc["text_path"]).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return ""
+
+    def _remove_text(self, doc: Optional[Dict]):
+        """Delete the on-disk text for a removed document"""
+        if doc and doc.get("text_path"):
+            Path(doc["text_path"]).unlink(missing_ok=True)
+
+class MemoryDocumentStore(DocumentStore):
+    """Process-local store, for tests and single-worker development"""
+
+    def __init__(self, qa_history_limit: int = 100):
+        super().__init__(qa_history_limit)
+        self._docs = {}
+        self._chunk_ids = {}
+        self._chunk_sentiment = {}
+        self._qa = {}
+        self._lock = threading.Lock()
+
+    def put(
+        self, doc: Dict, chunk_ids: Optional[List[str]] = None,
+        chunk_sentiment: Optional[List[Tuple[Optional[float], int]]] = None
+    ) -> None:
+        record = {"id": doc["id"], **{k: doc.get(k) for k in DOCUMENT_FIELDS}}
+        record["version"] = record["version"] or 1
+        with self._lock:
+            self._docs[doc["id"]] = record
+            if chunk_ids is not None:
+                self._set_chunk_ids(doc["id"], chunk_ids, chunk_sentiment)
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            return dict(doc) if doc else None
+
+    def delete(self, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+            self._chunk_ids.pop(doc_id, None)
+            self._chunk_sentiment.pop(doc_id, None)
+            self._qa.pop(doc_id, None)
+        self._remove_text(doc)
+        return doc
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return sorted((dict(d) for d in self._docs.values()), key=lambda d: d["upload_date"])
+
+    def count(self) -> int:
+        return len(self._docs)
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict]:
+        with self._lock:
+            for doc in self._docs.values():
+                if doc.get("content_hash") == content_hash:
+                    return dict(doc)
+        return None
+
+    def put_metrics(self, doc_id: str, metrics: Dict) -> None:
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is not None and doc.get("metrics") is None:
+                doc["metrics"] = metrics
+
+    def put_chunk_ids(
+        self, doc_id: str, chunk_ids: List[str], chunk_sentiment: Optional[List[Tuple[Optional[float], int]]] = None
+    ) -> None:
+        with self._lock:
+            self._set_chunk_ids(doc_id, chunk_ids, chunk_sentiment)
+
+    def _set_chunk_ids(self, doc_id: str, chunk_ids: List[str], chunk_sentiment):
+        self._chunk_ids[doc_id] = list(chunk_ids)
+        self._chunk_sentiment[doc_id] = {
+            chunk_id: (score, weight)
+            for chunk_id, (score, weight) in zip(chunk_ids, chunk_sentiment or [])
+            if score is not None and weight
+        }
+
+    def get_chunk_ids(self, doc_id: str) -> List[str]:
+        with self._lock:
+            return list(self._chunk_ids.get(doc_id, []))
+
+    def chunk_positions(self, chunk_ids: Iterable[str]) -> Dict[str, int]:
+        wanted = set(chunk_ids)
+        with self._lock:
+            return {
+                chunk_id: position
+                for ids in self._chunk_ids.values()
+                for position, chunk_id in enumerate(ids)
+                if chunk_id in wanted
+            }
+
+    def get_chunk_sentiment(self, doc_id: str) -> Dict[str, Tuple[float, int]]:
+        with self._lock:
+            return dict(self._chunk_sentiment.get(doc_id, {}))
+
+    def add_qa(self, doc_id: str, question: str, answer: str, timestamp: str) -> None:
+        with self._lock:
+            if doc_id not in self._docs:
+                return
+            history = self._qa.setdefault(doc_id, [])
+            history.append({"question": question, "answer": answer, "timestamp": timestamp})
+            del history[:-self.qa_history_limit]
+
+    def get_qa(self, doc_id: str) -> List[Dict]:
+        with self._lock:
+            return list(self._qa.get(doc_id, []))
+
+class SQLiteDocumentStore(DocumentStore):
+    """SQLite-backed store shared safely by threads and worker processes (WAL mode)"""
+
+    def __init__(self, path: str, qa_history_limit: int = 100):
+        super().__init__(qa_history_limit)
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._connection()
+        with conn:
+            columns = ",\n".join(f"{name} {ddl}" for name, ddl in DOCUMENT_FIELDS.items())
+            conn.execute(f"CREATE TABLE IF NOT EXISTS documents (doc_id TEXT PRIMARY KEY, {columns})")
+
+            # Add columns introduced after the table was first created
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}
+            for name, ddl in DOCUMENT_FIELDS.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE documents ADD COLUMN {name} {ddl.replace(' NOT NULL', '')}")
+
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_upload_date ON documents (upload_date)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS qa_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    doc_id TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_qa_history_doc_id ON qa_history (doc_id, id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_chunks (
+                    doc_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    score REAL,
+                    weight INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (doc_id, position)
+                )
+            """)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(document_chunks)")}
+            if "score" not in existing:
+                conn.execute("ALTER TABLE document_chunks ADD COLUMN score REAL")
+                conn.execute("ALTER TABLE document_chunks ADD COLUMN weight INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_document_chunks_chunk_id ON document_chunks (chunk_id)")
+
+    def _row_to_doc(self, row: sqlite3.Row) -> Dict:
+        doc = {"id": row["doc_id"]}
+        for name in DOCUMENT_FIELDS:
+            value = row[name]
+            doc[name] = json.loads(value) if name in JSON_FIELDS and value is not None else value
+        return doc
+
+    def put(
+        self, doc: Dict, chunk_ids: Optional[List[str]] = None,
+        chunk_sentiment: Optional[List[Tuple[Optional[float], int]]] = None
+    ) -> None:
+        values = [
+            json.dumps(doc.get(name)) if name in JSON_FIELDS else doc.get(name)
+            for name in DOCUMENT_FIELDS
+        ]
+        values[list(DOCUMENT_FIELDS).index("version")] = doc.get("version") or 1
+        names = ", ".join(DOCUMENT_FIELDS)
+        placeholders = ", ".join("?" * (len(DOCUMENT_FIELDS) + 1))
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO documents (doc_id, {names}) VALUES ({placeholders})",
+                [doc["id"], *values]
+            )
+            if chunk_ids is not None:
+                self._write_chunk_ids(conn, doc["id"], chunk_ids, chunk_sentiment)
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT * FROM documents WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        return self._row_to_doc(row) if row else None
+
+    def get_many(self, doc_ids: Iterable[str]) -> Dict[str, Dict]:
+        doc_ids = list(set(doc_ids))
+        if not doc_ids:
+            return {}
+        placeholders = ",".join("?" * len(doc_ids))
+        rows = self._connection().execute(
+            f"SELECT * FROM documents WHERE doc_id IN ({placeholders})", doc_ids
+        )
+        return {row["doc_id"]: self._row_to_doc(row) for row in rows}
+
+    def delete(self, doc_id: str) -> Optional[Dict]:
+        doc = self.get(doc_id)
+        if doc is None:
+            return None
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM document_chunks WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM qa_history WHERE doc_id = ?", (doc_id,))
+        self._remove_text(doc)
+        return doc
+
+    def list(self) -> List[Dict]:
+        rows = self._connection().execute("SELECT * FROM documents ORDER BY upload_date")
+        return [self._row_to_doc(row) for row in rows]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT * FROM documents WHERE content_hash = ? ORDER BY upload_date LIMIT 1",
+            (content_hash,)
+        ).fetchone()
+        return self._row_to_doc(row) if row else None
+
+    def put_metrics(self, doc_id: str, metrics: Dict) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                # Missing records are SQL NULL (column added later) or JSON null (stored without one)
+                "UPDATE documents SET metrics = ? WHERE doc_id = ? AND (metrics IS NULL OR metrics = 'null')",
+                (json.dumps(metrics), doc_id)
+            )
+
+    def put_chunk_ids(
+        self, doc_id: str, chunk_ids: List[str], chunk_sentiment: Optional[List[Tuple[Optional[float], int]]] = None
+    ) -> None:
+        conn = self._connection()
+        with conn:
+            self._write_chunk_ids(conn, doc_id, chunk_ids, chunk_sentiment)
+
+    def _write_chunk_ids(self, conn: sqlite3.Connection, doc_id: str, chunk_ids: List[str], chunk_sentiment):
+        chunk_sentiment = list(chunk_sentiment or [])
+        chunk_sentiment += [(None, 0)] * (len(chunk_ids) - len(chunk_sentiment))
+        conn.execute("DELETE FROM document_chunks WHERE doc_id = ?", (doc_id,))
+        conn.executemany(
+            "INSERT INTO document_chunks (doc_id, position, chunk_id, score, weight) VALUES (?, ?, ?, ?, ?)",
+            (
+                (doc_id, position, chunk_id, score, weight)
+                for position, (chunk_id, (score, weight)) in enumerate(zip(chunk_ids, chunk_sentiment))
+            )
+        )
+
+    def get_chunk_ids(self, doc_id: str) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT chunk_id FROM document_chunks WHERE doc_id = ? ORDER BY position", (doc_id,)
+        )
+        return [row["chunk_id"] for row in rows]
+
+    def chunk_positions(self, chunk_ids: Iterable[str]) -> Dict[str, int]:
+        chunk_ids = list(set(chunk_ids))
+        if not chunk_ids:
+            return {}
+        placeholders = ",".join("?" * len(chunk_ids))
+        rows = self._connection().execute(
+            f"SELECT chunk_id, position FROM document_chunks WHERE chunk_id IN ({placeholders})", chunk_ids
+        )
+        return {row["chunk_id"]: row["position"] for row in rows}
+
+    def get_chunk_sentiment(self, doc_id: str) -> Dict[str, Tuple[float, int]]:
+        rows = self._connection().execute(
+            "SELECT chunk_id, score, weight FROM document_chunks WHERE doc_id = ? AND score IS NOT NULL AND weight > 0",
+            (doc_id,)
+        )
+        return {row["chunk_id"]: (row["score"], row["weight"]) for row in rows}
+
+    def add_qa(self, doc_id: str, question: str, answer: str, timestamp: str) -> None:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                """INSERT INTO qa_history (doc_id, question, answer, timestamp)
+                   SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM documents WHERE doc_id = ?)""",
+                (doc_id, question, answer, timestamp, doc_id)
+            )
+            if cursor.rowcount:
+                # Keep only the most recent entries per document
+                conn.execute(
+                    """DELETE FROM qa_history WHERE doc_id = ? AND id NOT IN (
+                           SELECT id FROM qa_history WHERE doc_id = ? ORDER BY id DESC LIMIT ?
+                       )""",
+                    (doc_id, doc_id, self.qa_history_limit)
+                )
+
+    def get_qa(self, doc_id: str) -> List[Dict]:
+        rows = self._connection().execute(
+            "SELECT question, answer, timestamp FROM qa_history WHERE doc_id = ? ORDER BY id",
+            (doc_id,)
+        )
+        return [dict(row) for row in rows]
+
+def create_document_store(backend: str, path: str, qa_history_limit: int = 100) -> DocumentStore:
+    """Build the configured document store ("sqlite" or "memory")"""
+    if backend == "memory":
+        return MemoryDocumentStore(qa_history_limit)
+    if backend == "sqlite":
+        return SQLiteDocumentStore(path, qa_history_limit)
+    raise ValueError(f"Unknown DOCUMENT_STORE backend: {backend}")
@@ -0,0 +1,116 @@
+"""
+Embedding batcher - Merge encode calls from concurrent callers into shared model batches
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, List, Tuple
+
+import numpy as np
+
+from app.utils import telemetry
+
+# Lower runs first: interactive queries never wait behind more than one ingest batch
+PRIORITIES = {"query": 0, "ingest": 1}
+
+class EmbeddingBatcher:
+    """Single scheduler thread in front of the embedding model; callers block on a future for their vectors"""
+
+    def __init__(
+        self,
+        get_model: Callable,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_ingest_batch_size: int = 256
+    ):
+        self.get_model = get_model
+        self.max_batch_size = max(1, max_batch_size)
+        # Ingest-only batches (no query waiting) may run larger, e.g. bulk ingestion's shared batches
+        self.max_ingest_batch_size = max(self.max_batch_size, max_ingest_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queues: List[Deque[Tuple[List[str], Future]]] = [deque() for _ in PRIORITIES]
+        self._condition = threading.Condition()
+        self._thread = None
+        self.batches = 0
+        self.texts = 0
+
+    def encode(self, texts: List[str], priority: str = "query") -> np.ndarray:
+        """Embeddings for texts, computed together with whatever else is queued (blocking)"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        # Large calls are split so queries can be scheduled between the pieces
+        size = self.max_ingest_batch_size if priority == "ingest" else self.max_batch_size
+        futures = [
+            self.submit(texts[start:start + size], priority)
+            for start in range(0, len(texts), size)
+        ]
+        parts = [future.result() for future in futures]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def submit(self, texts: List[str], priority: str = "query") -> Future:
+        """Queue texts for the next batch of their priority class"""
+        future = Future()
+        with self._condition:
+            self._ensure_thread()
+            self._queues[PRIORITIES[priority]].append((list(texts), future))
+            self._condition.notify()
+        return future
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def _pending(self) -> int:
+        return sum(len(texts) for queue in self._queues for texts, _ in queue)
+
+    def _take_batch(self) -> List[Tuple[List[str], Future]]:
+        """Requests for one model call, highest priority first, up to max_batch_size texts
+        (max_ingest_batch_size when no query is queued)"""
+        limit = self.max_batch_size if self._queues[PRIORITIES["query"]] else self.max_ingest_batch_size
+        batch, size = [], 0
+        for queue in self._queues:
+            while queue and (not batch or size + len(queue[0][0]) <= limit):
+                texts, future = queue.popleft()
+                batch.append((texts, future))
+                size += len(texts)
+            if size >= limit:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while not any(self._queues):
+                    self._condition.wait()
+                # Give concurrent callers a moment to join unless the batch is already full
+                deadline = time.monotonic() + self.max_wait
+                while self._pending() < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._take_batch()
+            self._run(batch)
+
+    def _run(self, batch: List[Tuple[List[str], Future]]):
+        live = [(texts, future) for texts, future in batch if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+        texts = [text for request, _ in live for text in request]
+        try:
+            embeddings = np.asarray(self.get_model().encode(texts))
+        except Exception as e:
+            for _, future in live:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.texts += len(texts)
+        telemetry.EMBEDDING_BATCH_TEXTS.observe(len(texts))
+        offset = 0
+        for request, future in live:
+            future.set_result(embeddings[offset:offset + len(request)])
+            offset += len(request)
@@ -0,0 +1,88 @@
+"""
+Embedding cache - Persistent chunk-hash to embedding store
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+def content_hash(data) -> str:
+    """SHA-256 hex digest of text or bytes"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+class EmbeddingCache:
+    """SQLite-backed cache of float32 embeddings keyed by (model name, chunk hash)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, chunk_hash)
+            ) WITHOUT ROWID
+        """)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside the ingest writer"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Look up cached vectors, returning only the hashes that were found"""
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        conn = self._connection()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                [model, *batch]
+            )
+            for chunk_hash, blob in rows:
+                found[chunk_hash] = np.frombuffer(blob, dtype=np.float32)
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, hashes: List[str], vectors) -> None:
+        """Store vectors for the given chunk hashes"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, chunk_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (model, chunk_hash, int(vector.shape[0]), vector.tobytes())
+                    for chunk_hash, vector in zip(hashes, vectors)
+                ]
+            )
+
+    def count(self, model: str = None) -> int:
+        """Number of cached vectors, optionally for one model"""
+        conn = self._connection()
+        if model is None:
+            return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
@@ -2,53 +2,318 @@
 Embedding service - Generate and store embeddings
 """
 
-from typing import List, Optional
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
 from app.api.dependencies import ModelDependencies
+from app.services.chunker import Chunk
+from app.services.embedding_cache import content_hash
+from app.services.lexical_index import reciprocal_rank_fusion
+from app.services.vector_store import VECTOR_WRITE_BATCH
+from app.config import settings
+
+def _rows(embeddings) -> np.ndarray:
+    """Stack per-batch embedding arrays (or rows) into one float32 matrix"""
+    if isinstance(embeddings, np.ndarray):
+        return embeddings
+    if embeddings and isinstance(embeddings[0], np.ndarray) and embeddings[0].ndim == 2:
+        return np.concatenate(embeddings)
+    return np.asarray(embeddings, dtype=np.float32)
+
+def chunk_ids(doc_id: str, texts: List[str], occurrences: Optional[Counter] = None) -> List[str]:
+    """Content-addressed chunk ids, so unchanged text keeps its id across versions of a document.
+    Pass the same occurrences counter for every batch of one document to number repeated chunks"""
+    occurrences = Counter() if occurrences is None else occurrences
+    ids = []
+    for text in texts:
+        chunk_hash = content_hash(text)[:16]
+        repeat = occurrences[chunk_hash]
+        occurrences[chunk_hash] += 1
+        ids.append(f"{doc_id}_{chunk_hash}_{repeat}" if repeat else f"{doc_id}_{chunk_hash}")
+    return ids
+
+def legacy_chunk_ids(doc_id: str, count: int) -> List[str]:
+    """Positional ids of a document stored before chunk ids were content-addressed"""
+    return [f"{doc_id}_chunk_{i}" for i in range(count)]
+
+def chunk_metadata(doc_id: str, filename: str, chunk: Chunk) -> Dict:
+    """Vector store metadata of a chunk; positional fields are left out so unchanged chunks keep it across versions"""
+    return {"source": filename, "doc_id": doc_id, **chunk.metadata()}
+
+def embedding_cache_key() -> str:
+    """Cache namespace for stored vectors; quantized models produce slightly different vectors"""
+    if settings.INFERENCE_BACKEND == "int8":
+        return f"{settings.EMBEDDING_MODEL}:int8"
+    return settings.EMBEDDING_MODEL
+
+class EmbeddingUpdate(NamedTuple):
+    """What update_embeddings wrote, enough to put the previous version back after it was committed"""
+    doc_id: str
+    added_ids: List[str]
+    # Removed chunks as stored before the update: ids, documents, metadatas and embeddings
+    removed: Dict
+    # Metadata of the kept chunks that moved, as it was before the update
+    moved: Dict[str, Dict]
 
 class EmbeddingService:
     """Handle embedding operations"""
     
-    def generate_embeddings(self, texts: List[str], models: ModelDependencies) -> List[List[float]]:
-        """Generate embeddings for texts"""
-        embeddings = models.embedding_model.encode(texts).tolist()
+    def _encode(self, texts: List[str], models: ModelDependencies, priority: str):
+        """Run the embedding model, through the shared batcher when enabled"""
+        if models.embedding_batcher is not None:
+            return models.embedding_batcher.encode(texts, priority)
+        return models.embedding_model.encode(texts)
+    
+    def generate_embeddings(
+        self,
+        texts: List[str],
+        models: ModelDependencies,
+        use_cache: bool = True
+    ) -> np.ndarray:
+        """Generate embeddings for texts (one float32 row each), re-encoding only chunks missing from the cache"""
+        cache = models.embedding_cache if use_cache else None
+        if cache is None or not texts:
+            return np.asarray(self._encode(texts, models, "ingest"), dtype=np.float32)
+        
+        model_name = embedding_cache_key()
+        hashes = [content_hash(text) for text in texts]
+        vectors = cache.get_many(model_name, hashes)
+        
+        # Encode each distinct missing chunk once, even if it repeats within the batch
+        missing = {}
+        for text, chunk_hash in zip(texts, hashes):
+            if chunk_hash not in vectors and chunk_hash not in missing:
+                missing[chunk_hash] = text
+        
+        if missing:
+            encoded = self._encode(list(missing.values()), models, "ingest")
+            cache.put_many(model_name, list(missing.keys()), encoded)
+            vectors.update(zip(missing.keys(), encoded))
+        
+        return np.stack([vectors[chunk_hash] for chunk_hash in hashes]).astype(np.float32, copy=False)
+    
+    def embed_query(self, question: str, models: ModelDependencies) -> np.ndarray:
+        """Embed a question, reusing the in-process LRU for repeated questions"""
+        embedding = models.query_embedding_cache.get(question)
+        if embedding is None:
+            embedding = np.asarray(self._encode([question], models, "query")[0], dtype=np.float32)
+            models.query_embedding_cache.put(question, embedding)
+        return embedding
+    
+    def embed_queries(self, questions: List[str], models: ModelDependencies) -> List[np.ndarray]:
+        """Embed many questions with a single encode call for the ones not already in the LRU"""
+        embeddings = [models.query_embedding_cache.get(q) for q in questions]
+        missing = list(dict.fromkeys(q for q, e in zip(questions, embeddings) if e is None))
+        
+        if missing:
+            encoded = dict(zip(missing, np.asarray(self._encode(missing, models, "query"), dtype=np.float32)))
+            for question, embedding in encoded.items():
+                models.query_embedding_cache.put(question, embedding)
+            embeddings = [e if e is not None else encoded[q] for q, e in zip(questions, embeddings)]
+        
         return embeddings
     
     def store_embeddings(
         self, 
         doc_id: str, 
-        chunks: List[str], 
-        embeddings: List[List[float]], 
+        chunks: List[Chunk], 
+        embeddings, 
         filename: str,
+        models: ModelDependencies,
+        occurrences: Optional[Counter] = None
+    ) -> List[str]:
+        """Store embeddings in vector database (visible once commit_embeddings runs); returns the chunk ids"""
+        texts = [chunk.text for chunk in chunks]
+        ids = chunk_ids(doc_id, texts, occurrences)
+        models.vector_store.add(
+            documents=texts,
+            embeddings=_rows(embeddings),
+            ids=ids,
+            metadatas=[chunk_metadata(doc_id, filename, chunk) for chunk in chunks]
+        )
+        models.lexical_index.add(doc_id, ids, texts)
+        return ids
+    
+    def store_embeddings_many(
+        self,
+        documents: List[Tuple[str, str, List[Chunk]]],
+        embeddings,
         models: ModelDependencies
-    ):
-        """Store embeddings in vector database"""
-        models.collection.add(
-            documents=chunks,
-            embeddings=embeddings,
-            ids=[f"{doc_id}_chunk_{i}" for i in range(len(chunks))],
-            metadatas=[{
-                "source": filename,
-                "chunk_id": i,
-                "doc_id": doc_id
-            } for i in range(len(chunks))]
+    ) -> List[List[str]]:
+        """Store the chunks of several (doc_id, filename, chunks) documents in as few vector database writes as possible;
+        returns each document's chunk ids"""
+        ids, texts, metadatas = [], [], []
+        doc_chunk_ids = []
+        for doc_id, filename, chunks in documents:
+            doc_chunk_ids.append(chunk_ids(doc_id, [chunk.text for chunk in chunks]))
+            ids.extend(doc_chunk_ids[-1])
+            for chunk in chunks:
+                texts.append(chunk.text)
+                metadatas.append(chunk_metadata(doc_id, filename, chunk))
+        
+        embeddings = _rows(embeddings)
+        for start in range(0, len(ids), VECTOR_WRITE_BATCH):
+            end = start + VECTOR_WRITE_BATCH
+            models.vector_store.add(
+                documents=texts[start:end],
+                embeddings=embeddings[start:end],
+                ids=ids[start:end],
+                metadatas=metadatas[start:end]
+            )
+        for (doc_id, _, chunks), doc_ids in zip(documents, doc_chunk_ids):
+            models.lexical_index.add(doc_id, doc_ids, [chunk.text for chunk in chunks])
+        return doc_chunk_ids
+    
+    def update_embeddings(
+        self,
+        doc_id: str,
+        chunks: List[Chunk],
+        ids: List[str],
+        added: List[int],
+        embeddings,
+        removed_ids: List[str],
+        filename: str,
+        models: ModelDependencies
+    ) -> EmbeddingUpdate:
+        """Write a new version of a document by id: add the chunks at positions added, delete removed_ids and
+        refresh the metadata of kept chunks that moved. On failure the previous version is restored; the
+        returned update can restore it later, until the new version's record is published"""
+        metadatas = [chunk_metadata(doc_id, filename, chunk) for chunk in chunks]
+        added_ids = [ids[i] for i in added]
+        added_positions = set(added)
+        kept = [i for i in range(len(chunks)) if i not in added_positions]
+        embeddings = _rows(embeddings)
+
+        # Kept chunks are not re-embedded; only their pages and offsets can change, when pages are added or removed
+        stored = models.vector_store.get(ids=[ids[i] for i in kept]) if kept else {"ids": [], "metadatas": []}
+        current = dict(zip(stored["ids"], stored["metadatas"]))
+        moved = [i for i in kept if current.get(ids[i]) != metadatas[i]]
+        update = EmbeddingUpdate(
+            doc_id, added_ids,
+            models.vector_store.get(ids=removed_ids, include_embeddings=True) if removed_ids else {"ids": []},
+            {ids[i]: current[ids[i]] for i in moved if ids[i] in current}
         )
+        try:
+            for start in range(0, len(added), VECTOR_WRITE_BATCH):
+                rows = added[start:start + VECTOR_WRITE_BATCH]
+                models.vector_store.add(
+                    documents=[chunks[i].text for i in rows],
+                    embeddings=embeddings[start:start + VECTOR_WRITE_BATCH],
+                    ids=[ids[i] for i in rows],
+                    metadatas=[metadatas[i] for i in rows]
+                )
+            for start in range(0, len(moved), VECTOR_WRITE_BATCH):
+                rows = moved[start:start + VECTOR_WRITE_BATCH]
+                models.vector_store.update_metadatas(doc_id, [ids[i] for i in rows], [metadatas[i] for i in rows])
+            models.lexical_index.add(doc_id, added_ids, [chunks[i].text for i in added])
+            models.lexical_index.delete_chunks(removed_ids)
+
+            # Deletes go last: everything before them can be undone
+            for start in range(0, len(removed_ids), VECTOR_WRITE_BATCH):
+                models.vector_store.delete(doc_id, removed_ids[start:start + VECTOR_WRITE_BATCH])
+            models.vector_store.commit(doc_id)
+        except Exception:
+            self.revert_update(update, models)
+            raise
+        return update
+    
+    def revert_update(self, update: EmbeddingUpdate, models: ModelDependencies):
+        """Put back the version an update replaced: drop staged writes, then undo the ones already applied"""
+        doc_id = update.doc_id
+        removed = update.removed
+        models.vector_store.rollback(doc_id)
+        models.vector_store.update_metadatas(doc_id, list(update.moved), list(update.moved.values()))
+        models.vector_store.delete(doc_id, update.added_ids)
+        # Removed chunks are gone once the update committed (or, with Chroma, once a delete ran)
+        present = set(models.vector_store.get(ids=removed["ids"])["ids"]) if removed["ids"] else set()
+        missing = [i for i, chunk_id in enumerate(removed["ids"]) if chunk_id not in present]
+        for start in range(0, len(missing), VECTOR_WRITE_BATCH):
+            rows = missing[start:start + VECTOR_WRITE_BATCH]
+            models.vector_store.add(
+                ids=[removed["ids"][i] for i in rows],
+                embeddings=np.asarray([removed["embeddings"][i] for i in rows], dtype=np.float32),
+                documents=[removed["documents"][i] for i in rows],
+                metadatas=[removed["metadatas"][i] for i in rows]
+            )
+        models.vector_store.commit(doc_id)
+        models.lexical_index.delete_chunks(update.added_ids)
+        models.lexical_index.add(doc_id, removed["ids"], removed["documents"])
+    
+    def commit_embeddings(self, doc_id: str, models: ModelDependencies):
+        """Publish a document's stored chunks to queries (a no-op for Chroma, which indexes on add)"""
+        models.vector_store.commit(doc_id)
     
     def retrieve_chunks(
         self,
-        query_embedding: List[float],
+        query_embedding,
         top_k: int,
         document_ids: Optional[List[str]],
-        models: ModelDependencies
+        models: ModelDependencies,
+        query: Optional[str] = None
     ):
-        """Retrieve relevant chunks from vector database"""
-        where_filter = None
-        if document_ids:
-            where_filter = {"doc_id": {"$in": document_ids}}
-        
-        results = models.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where_filter
+        """Retrieve relevant chunks (hybrid dense + BM25 when the query text is given)"""
+        return self.retrieve_chunks_batch(
+            [query_embedding], top_k, document_ids, models,
+            queries=[query] if query is not None else None
+        )
+    
+    def retrieve_chunks_batch(
+        self,
+        query_embeddings,
+        top_k: int,
+        document_ids: Optional[List[str]],
+        models: ModelDependencies,
+        queries: Optional[List[str]] = None
+    ):
+        """Retrieve chunks for several query embeddings in one vector database call"""
+        hybrid = queries is not None and settings.RETRIEVAL_MODE == "hybrid"
+        results = models.vector_store.query(
+            np.asarray(query_embeddings, dtype=np.float32),
+            max(top_k, settings.HYBRID_CANDIDATES) if hybrid else top_k,
+            document_ids
         )
         
-        return results
\ No newline at end of file
+        if not hybrid:
+            return results
+        return self._fuse_lexical(results, queries, top_k, document_ids, models)
+    
+    def _fuse_lexical(self, dense, queries: List[str], top_k: int, document_ids: Optional[List[str]], models: ModelDependencies):
+        """Merge dense candidates with BM25 candidates per query using reciprocal rank fusion"""
+        candidates = max(top_k, settings.HYBRID_CANDIDATES)
+        lexical = [
+            [chunk_id for chunk_id, _ in models.lexical_index.search(query, candidates, document_ids)]
+            for query in queries
+        ]
+        
+        chunks = {}
+        for ids, documents, metadatas in zip(dense['ids'], dense['documents'], dense['metadatas']):
+            chunks.update(zip(ids, zip(documents, metadatas)))
+        
+        # Lexical hits outside the dense candidates need their text and metadata
+        missing = list({chunk_id for ranking in lexical for chunk_id in ranking if chunk_id not in chunks})
+        if missing:
+            found = models.vector_store.get(ids=missing)
+            chunks.update(zip(found['ids'], zip(found['documents'], found['metadatas'])))
+        
+        fused = {"ids": [], "documents": [], "metadatas": [], "scores": []}
+        for dense_ids, lexical_ids in zip(dense['ids'], lexical):
+            ranking = [
+                (chunk_id, score)
+                for chunk_id, score in reciprocal_rank_fusion([dense_ids, lexical_ids], settings.RRF_K)
+                if chunk_id in chunks
+            ][:top_k]
+            fused["ids"].append([chunk_id for chunk_id, _ in ranking])
+            fused["documents"].append([chunks[chunk_id][0] for chunk_id, _ in ranking])
+            fused["metadatas"].append([chunks[chunk_id][1] for chunk_id, _ in ranking])
+            fused["scores"].append([round(score, 6) for _, score in ranking])
+        return fused
+    
+    def delete_embeddings(self, doc_id: str, models: ModelDependencies):
+        """Remove all stored chunks for a document, by id when its chunk ids were recorded"""
+        ids = models.document_store.get_chunk_ids(doc_id)
+        if ids:
+            models.vector_store.delete_document(doc_id, ids)
+            models.lexical_index.delete_chunks(ids)
+        else:
+            models.vector_store.delete_document(doc_id)
+            models.lexical_index.delete_document(doc_id)
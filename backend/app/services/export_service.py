@@ -2,6 +2,10 @@
 Export service - Generate PDF reports
 """
 
+import hashlib
+import json
+import os
+import threading
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -9,48 +13,126 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, Tuple
 from app.config import settings
 from app.api.dependencies import ModelDependencies
 
+# Styles are immutable once built, so every report shares them
+STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#4C1D95'),
+    spaceAfter=30
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=STYLES['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#7C3AED'),
+    spaceAfter=12
+)
+
+SENTIMENT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7C3AED')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+SUMMARY_TABLE_STYLE = TableStyle(
+    [('ALIGN', (0, 0), (-1, -1), 'LEFT')],
+    parent=SENTIMENT_TABLE_STYLE
+)
+
+# Fields of the stored summary/sentiment that end up in the report
+SUMMARY_KEYS = ("revenue", "profit", "profitMargin", "eps", "key_risks")
+SENTIMENT_KEYS = ("overall", "score", "breakdown")
+
 class ExportService:
     """Handle PDF export operations"""
-    
-    def create_report(self, doc_id: str, doc: dict, request, models: ModelDependencies) -> str:
+
+    def __init__(self):
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(self, doc_id: str, doc: dict, request) -> str:
+        """Content address of a report: document version, include_* flags and the data rendered"""
+        summary = doc.get('summary') or {}
+        sentiment = doc.get('sentiment') or {}
+        payload = {
+            "doc_id": doc_id,
+            "version": doc.get('version') or 1,
+            "content_hash": doc.get('content_hash'),
+            "filename": doc.get('filename'),
+            "include_summary": request.include_summary,
+            "include_qa": request.include_qa,
+            "include_sentiment": request.include_sentiment,
+            "summary": {k: summary.get(k) for k in SUMMARY_KEYS} if request.include_summary else None,
+            "sentiment": {k: sentiment.get(k) for k in SENTIMENT_KEYS} if request.include_sentiment else None,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()[:32]
+
+    def report_path(self, doc_id: str, doc: dict, key: str) -> Path:
+        return Path(settings.EXPORT_DIR) / f"{doc_id}_v{doc.get('version') or 1}_{key}.pdf"
+
+    def get_or_create_report(self, doc_id: str, doc: dict, request, models: ModelDependencies) -> Tuple[str, str]:
+        """Path and ETag of the report, rendering it only if no identical report exists (blocking)"""
+        key = self.cache_key(doc_id, doc, request)
+        output_path = self.report_path(doc_id, doc, key)
+
+        with self._lock_for(key):
+            if output_path.exists():
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.create_report(doc_id, doc, request, models, output_path)
+                self._remove_stale(doc_id, doc.get('version') or 1)
+                print(f"🧾 Rendered report {output_path.name}")
+
+        return str(output_path), f'"{key}"'
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        """Concurrent exports of the same report render it once"""
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _remove_stale(self, doc_id: str, version: int):
+        """Drop reports rendered for older versions of the document"""
+        for path in Path(settings.EXPORT_DIR).glob(f"{doc_id}_v*_*.pdf"):
+            if not path.name.startswith(f"{doc_id}_v{version}_"):
+                path.unlink(missing_ok=True)
+
+    def invalidate(self, doc_id: str):
+        """Remove every cached report of a document"""
+        for path in Path(settings.EXPORT_DIR).glob(f"{doc_id}_v*_*.pdf"):
+            path.unlink(missing_ok=True)
+
+    def create_report(self, doc_id: str, doc: dict, request, models: ModelDependencies, output_path: Path) -> str:
         """Generate PDF report"""
-        
-        output_path = Path(settings.EXPORT_DIR) / f"{doc_id}_report.pdf"
-        pdf_doc = SimpleDocTemplate(str(output_path), pagesize=letter)
+
+        # Render next to the target and rename, so readers never see a partial file
+        tmp_path = output_path.with_suffix(f".{threading.get_ident()}.tmp")
+        pdf_doc = SimpleDocTemplate(str(tmp_path), pagesize=letter)
         story = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#4C1D95'),
-            spaceAfter=30
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#7C3AED'),
-            spaceAfter=12
-        )
-        
+
         # Title
-        story.append(Paragraph("Financial Report Analysis", title_style))
-        story.append(Paragraph(f"Document: {doc['filename']}", styles['Normal']))
-        story.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']))
+        story.append(Paragraph("Financial Report Analysis", TITLE_STYLE))
+        story.append(Paragraph(f"Document: {doc['filename']}", STYLES['Normal']))
+        story.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", STYLES['Normal']))
         story.append(Spacer(1, 0.3*inch))
-        
+
         # Summary
         if request.include_summary and doc.get('summary'):
-            story.append(Paragraph("Executive Summary", heading_style))
+            story.append(Paragraph("Executive Summary", HEADING_STYLE))
             summary = doc['summary']
-            
+
             summary_data = [
                 ['Metric', 'Value'],
                 ['Revenue', summary.get('revenue', 'N/A')],
@@ -58,49 +140,42 @@ class ExportService:
                 ['Profit Margin', summary.get('profitMargin', 'N/A')],
                 ['EPS', summary.get('eps', 'N/A')]
             ]
-            
+
             t = Table(summary_data, colWidths=[2.5*inch, 3*inch])
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7C3AED')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            t.setStyle(SUMMARY_TABLE_STYLE)
             story.append(t)
             story.append(Spacer(1, 0.2*inch))
-            
+
             # Risks
-            story.append(Paragraph("Key Risks", heading_style))
+            story.append(Paragraph("Key Risks", HEADING_STYLE))
             for i, risk in enumerate(summary.get('key_risks', [])[:5], 1):
-                story.append(Paragraph(f"{i}. {risk}", styles['Normal']))
+                story.append(Paragraph(f"{i}. {risk}", STYLES['Normal']))
             story.append(Spacer(1, 0.2*inch))
-        
+
         # Sentiment
         if request.include_sentiment and doc.get('sentiment'):
-            story.append(Paragraph("Sentiment Analysis", heading_style))
+            story.append(Paragraph("Sentiment Analysis", HEADING_STYLE))
             sentiment = doc['sentiment']
-            
+
             sentiment_data = [
                 ['Category', 'Percentage'],
                 ['Positive', f"{sentiment['breakdown']['positive']}%"],
                 ['Neutral', f"{sentiment['breakdown']['neutral']}%"],
                 ['Negative', f"{sentiment['breakdown']['negative']}%"]
             ]
-            
+
             t = Table(sentiment_data, colWidths=[2.5*inch, 2*inch])
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7C3AED')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            t.setStyle(SENTIMENT_TABLE_STYLE)
             story.append(t)
             story.append(Spacer(1, 0.1*inch))
             story.append(Paragraph(
-                f"Overall: <b>{sentiment['overall'].upper()}</b> (Score: {sentiment['score']:.2f})", 
-                styles['Normal']
+                f"Overall: <b>{sentiment['overall'].upper()}</b> (Score: {sentiment['score']:.2f})",
+                STYLES['Normal']
             ))
-        
-        pdf_doc.build(story)
-        return str(output_path)
\ No newline at end of file
+
+        try:
+            pdf_doc.build(story)
+            os.replace(tmp_path, output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return str(output_path)
@@ -0,0 +1,72 @@
+"""
+Fake Gemini model - Local stand-in for tests and benchmarks
+"""
+
+import asyncio
+import random
+import re
+import time
+
+class FakeAPIError(Exception):
+    """Error carrying an HTTP status code like the Gemini SDK's exceptions"""
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+class FakeResponse:
+    """Minimal response object exposing .text like a Gemini response"""
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeGeminiModel:
+    """Answers from the prompt context with configurable latency and failure injection"""
+
+    def __init__(self, latency_ms: float = 50, failure_rate: float = 0.0, seed: int = None):
+        self.model_name = "fake-gemini"
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _answer(self, prompt: str) -> str:
+        """Echo the first context sentence that mentions a number, like a grounded answer would"""
+        context = prompt.split("CONTEXT FROM FINANCIAL REPORT:")[-1]
+        for sentence in re.split(r'(?<=[.!?])\s+', context):
+            if re.search(r'\d', sentence) and len(sentence) > 20:
+                return sentence.strip()[:300]
+        return "I cannot find this information in the uploaded document."
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise FakeAPIError(429, "Resource has been exhausted (e.g. check quota).")
+
+    def _pieces(self, prompt: str):
+        """Split an answer into word-sized stream chunks"""
+        return [FakeResponse(piece) for piece in re.findall(r'\S+\s*', self._answer(prompt))]
+
+    def generate_content(self, prompt: str, generation_config=None, stream: bool = False, **kwargs):
+        self._maybe_fail()
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self.latency_ms / 1000)
+        return FakeResponse(self._answer(prompt))
+
+    def _stream(self, prompt: str):
+        pieces = self._pieces(prompt)
+        for piece in pieces:
+            time.sleep(self.latency_ms / 1000 / max(len(pieces), 1))
+            yield piece
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False, **kwargs):
+        self._maybe_fail()
+        if stream:
+            return self._stream_async(prompt)
+        await asyncio.sleep(self.latency_ms / 1000)
+        return FakeResponse(self._answer(prompt))
+
+    async def _stream_async(self, prompt: str):
+        pieces = self._pieces(prompt)
+        for piece in pieces:
+            await asyncio.sleep(self.latency_ms / 1000 / max(len(pieces), 1))
+            yield piece
@@ -0,0 +1,82 @@
+"""
+Inference backends - PyTorch, ONNX Runtime or int8-quantized embedding and sentiment models
+"""
+
+import re
+from pathlib import Path
+
+INFERENCE_BACKENDS = ("torch", "onnx", "int8")
+
+def _check_backend(backend: str):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND: {backend} (expected one of {', '.join(INFERENCE_BACKENDS)})")
+
+def _require_onnx():
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "INFERENCE_BACKEND=onnx needs ONNX Runtime: pip install 'optimum[onnxruntime]'"
+        ) from e
+
+def _export_dir(cache_dir: str, model_name: str, kind: str) -> Path:
+    """Where the exported ONNX graph for a model is cached"""
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '--', model_name)
+    return Path(cache_dir) / kind / slug
+
+def _quantize(module):
+    """Dynamic int8 quantization of the Linear layers (weights int8, activations quantized per batch)"""
+    import torch
+
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_embedding_model(model_name: str, backend: str = "torch", cache_dir: str = "cache/onnx"):
+    """SentenceTransformer for the requested backend; ONNX graphs are exported once and reused"""
+    from sentence_transformers import SentenceTransformer
+
+    _check_backend(backend)
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+
+    if backend == "int8":
+        return _quantize(SentenceTransformer(model_name, device="cpu"))
+
+    _require_onnx()
+    export_dir = _export_dir(cache_dir, model_name, "embedding")
+    if (export_dir / "onnx").exists():
+        return SentenceTransformer(str(export_dir), backend="onnx", device="cpu")
+
+    print(f"Exporting {model_name} to ONNX (one-time, cached in {export_dir})...")
+    model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+    model.save(str(export_dir))
+    return model
+
+def load_sentiment_pipeline(model_name: str, backend: str = "torch", cache_dir: str = "cache/onnx", device: int = -1):
+    """Sentiment-analysis pipeline for the requested backend"""
+    from transformers import pipeline
+
+    _check_backend(backend)
+    if backend == "torch":
+        return pipeline("sentiment-analysis", model=model_name, device=device)
+
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    if backend == "int8":
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = _quantize(AutoModelForSequenceClassification.from_pretrained(model_name).eval())
+        return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, device=-1)
+
+    _require_onnx()
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    export_dir = _export_dir(cache_dir, model_name, "sentiment")
+    if (export_dir / "model.onnx").exists():
+        model = ORTModelForSequenceClassification.from_pretrained(str(export_dir))
+        tokenizer = AutoTokenizer.from_pretrained(str(export_dir))
+    else:
+        print(f"Exporting {model_name} to ONNX (one-time, cached in {export_dir})...")
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model.save_pretrained(str(export_dir))
+        tokenizer.save_pretrained(str(export_dir))
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
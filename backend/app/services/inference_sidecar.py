@@ -0,0 +1,161 @@
+"""
+Inference sidecar - One process per host holds the embedding and sentiment models; API workers call it over a local socket
+Run with: python -m app.services.inference_sidecar (run.py --workers N starts it automatically)
+"""
+
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, List, Tuple, Union
+
+from app.config import settings
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """'host:port' for TCP, anything containing '/' for a Unix socket path"""
+    if "/" in address:
+        return address
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def _authkey() -> bytes:
+    if not settings.INFERENCE_SIDECAR_AUTHKEY:
+        raise Exception("INFERENCE_SIDECAR_AUTHKEY must be set to use the inference sidecar")
+    return settings.INFERENCE_SIDECAR_AUTHKEY.encode()
+
+class InferenceSidecarError(Exception):
+    """Raised when the sidecar reports a failure or cannot be reached"""
+
+class InferenceClient:
+    """Thread-safe client: one connection per calling thread, reconnecting once if the sidecar restarted"""
+
+    def __init__(self, address: str, authkey: bytes, connect_timeout: float = 60.0):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _connection(self) -> Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            deadline = time.monotonic() + self.connect_timeout
+            while True:
+                try:
+                    conn = Client(self.address, authkey=self.authkey)
+                    break
+                except (ConnectionError, FileNotFoundError) as e:
+                    # The sidecar may still be loading models
+                    if time.monotonic() >= deadline:
+                        raise InferenceSidecarError(f"Inference sidecar at {self.address} is unreachable: {e}")
+                    time.sleep(0.2)
+            self._local.conn = conn
+        return conn
+
+    def call(self, op: str, **kwargs) -> Any:
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.send((op, kwargs))
+                status, result = conn.recv()
+                break
+            except (EOFError, ConnectionError, BrokenPipeError):
+                self._local.conn = None
+                if attempt:
+                    raise InferenceSidecarError(f"Lost connection to inference sidecar at {self.address}")
+        if status != "ok":
+            raise InferenceSidecarError(result)
+        return result
+
+class RemoteEmbeddingModel:
+    """Stands in for a SentenceTransformer: encode() runs in the sidecar"""
+
+    def __init__(self, client: InferenceClient):
+        self.client = client
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        return self.client.call("encode", texts=list(texts), batch_size=batch_size)
+
+class RemoteSentimentAnalyzer:
+    """Stands in for the sentiment pipeline: chunk scoring runs in the sidecar"""
+
+    def __init__(self, client: InferenceClient):
+        self.client = client
+
+    def score_chunks(self, chunks: List[str], batch_size: int, max_tokens: int):
+        """Positive-class score and token weight per chunk, windowed like local scoring"""
+        return self.client.call("score_chunks", chunks=chunks, batch_size=batch_size, max_tokens=max_tokens)
+
+    def __call__(self, texts, batch_size: int = 32, truncation: bool = True, **kwargs):
+        return self.client.call("classify", texts=list(texts), batch_size=batch_size)
+
+def connect() -> InferenceClient:
+    """Client for the sidecar configured in settings"""
+    return InferenceClient(settings.INFERENCE_SIDECAR_ADDRESS, _authkey())
+
+class InferenceServer:
+    """Loads the models once and answers requests from any number of API worker processes"""
+
+    def __init__(self):
+        from app.api.dependencies import load_local_embedding_model, load_local_sentiment_analyzer
+
+        self.embedding_model = load_local_embedding_model()
+        self.sentiment_analyzer = load_local_sentiment_analyzer()
+        # One inference at a time per model; each call already uses every intra-op thread
+        self._embedding_lock = threading.Lock()
+        self._sentiment_lock = threading.Lock()
+
+    def handle(self, op: str, kwargs: dict) -> Any:
+        if op == "ping":
+            return {"pid": os.getpid()}
+        if op == "encode":
+            with self._embedding_lock:
+                return self.embedding_model.encode(kwargs["texts"], batch_size=kwargs.get("batch_size", 32))
+        if op == "score_chunks":
+            from app.services.sentiment_service import SentimentAccumulator
+
+            scorer = SentimentAccumulator(
+                self.sentiment_analyzer, batch_size=kwargs["batch_size"], max_tokens=kwargs["max_tokens"]
+            )
+            with self._sentiment_lock:
+                return scorer.score(kwargs["chunks"])
+        if op == "classify":
+            with self._sentiment_lock:
+                return self.sentiment_analyzer(kwargs["texts"], batch_size=kwargs["batch_size"], truncation=True)
+        raise ValueError(f"Unknown operation: {op}")
+
+    def _serve_connection(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    op, kwargs = conn.recv()
+                except (EOFError, ConnectionError):
+                    return
+                try:
+                    reply = ("ok", self.handle(op, kwargs))
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except (BrokenPipeError, ConnectionError):
+                    return
+
+    def serve_forever(self, address: str, authkey: bytes):
+        parsed = parse_address(address)
+        if isinstance(parsed, str) and os.path.exists(parsed):
+            os.unlink(parsed)
+        with Listener(parsed, authkey=authkey) as listener:
+            print(f"🧠 Inference sidecar ready on {address} (pid {os.getpid()})")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # A client with the wrong authkey must not take the server down
+                    print(f"⚠️  Rejected inference connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+def main():
+    InferenceServer().serve_forever(settings.INFERENCE_SIDECAR_ADDRESS, _authkey())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,784 @@
+"""
+Ingestion service - Run document processing as background jobs
+"""
+
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.api.dependencies import ModelDependencies
+from app.services.embedding_cache import content_hash
+from app.services.embedding_service import EmbeddingUpdate, chunk_ids, legacy_chunk_ids
+from app.services.job_store import create_job_store
+from app.utils.helpers import batched, new_document_id, prefetch
+from app.utils import telemetry
+
+INGEST_STAGES = ["extract", "chunk", "embed", "store", "sentiment", "summary"]
+
+# Leading chunks scanned for risks/opportunities
+SAMPLE_CHUNKS = 30
+
+# Minimum seconds between progress-only status publications to the job store
+PUBLISH_INTERVAL = 0.5
+
+class IngestionJob:
+    """Progress record for a single document ingestion"""
+
+    def __init__(
+        self,
+        doc_id: str,
+        filename: str,
+        file_path: str,
+        content_hash: str = None,
+        previous: Optional[Dict] = None
+    ):
+        self.id = f"job_{uuid.uuid4().hex[:12]}"
+        self.doc_id = doc_id
+        self.filename = filename
+        self.file_path = file_path
+        self.content_hash = content_hash
+        # Current record of the document when this job ingests a new version of it
+        self.previous = previous
+        self.chunk_ids: List[str] = []
+        # (score, weight) per chunk, kept next to the chunk ids rather than in the public sentiment summary
+        self.chunk_sentiment: List[Tuple[Optional[float], int]] = []
+        self.changes = None
+        self.status = "queued"
+        self.created_at = datetime.now().isoformat()
+        self.error = None
+        self.result = None
+        self.total_ms = None
+        self.stages = OrderedDict(
+            (name, {
+                "name": name,
+                "status": "pending",
+                "progress": 0.0,
+                "started_at": None,
+                "duration_ms": None
+            })
+            for name in INGEST_STAGES
+        )
+        self.vectors_written = False
+        # Vector and lexical writes of an update, and its text file: undone unless the new record is published
+        self.embedding_update: Optional[EmbeddingUpdate] = None
+        self.text_path: Optional[Path] = None
+        self._stage_start = {}
+        self.on_change: Optional[Callable[["IngestionJob"], None]] = None
+        self._published = 0.0
+
+    def _changed(self, progress_only: bool = False):
+        """Tell the service the status changed; progress updates are throttled"""
+        if self.on_change is None:
+            return
+        now = time.monotonic()
+        if progress_only and now - self._published < PUBLISH_INTERVAL:
+            return
+        self._published = now
+        self.on_change(self)
+
+    def start_stage(self, name: str):
+        """Mark a pipeline stage as running"""
+        self._stage_start[name] = time.perf_counter()
+        stage = self.stages[name]
+        stage["status"] = "running"
+        stage["started_at"] = datetime.now().isoformat()
+        self._changed()
+
+    def set_progress(self, name: str, progress: float):
+        """Update the completed fraction of a running stage"""
+        self.stages[name]["progress"] = round(min(max(progress, 0.0), 1.0), 3)
+        self._changed(progress_only=True)
+
+    def finish_stage(self, name: str, status: str = "completed"):
+        """Mark a pipeline stage as finished and record its duration"""
+        stage = self.stages[name]
+        stage["status"] = status
+        if status == "completed":
+            stage["progress"] = 1.0
+        started = self._stage_start.get(name)
+        if started is not None:
+            seconds = time.perf_counter() - started
+            stage["duration_ms"] = round(seconds * 1000, 2)
+            telemetry.INGEST_STAGE_SECONDS.observe(seconds, stage=name, status=status)
+        self._changed()
+
+    def to_dict(self) -> Dict:
+        """Snapshot of the job for the status endpoint"""
+        return {
+            "job_id": self.id,
+            "document_id": self.doc_id,
+            "filename": self.filename,
+            "status": self.status,
+            "created_at": self.created_at,
+            "stages": [dict(stage) for stage in self.stages.values()],
+            "total_ms": self.total_ms,
+            "error": self.error,
+            "result": self.result
+        }
+
+def iter_pdf_sources(files: Iterable[Tuple[str, BinaryIO]]) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    """(filename, content, error) for each PDF in a list of uploaded PDFs and zip archives, read one at a time"""
+    for filename, fileobj in files:
+        name = Path(filename or "").name
+        lowered = name.lower()
+        if lowered.endswith(".pdf"):
+            yield name, fileobj.read(), None
+        elif lowered.endswith(".zip"):
+            try:
+                with zipfile.ZipFile(fileobj) as archive:
+                    for member in archive.infolist():
+                        member_name = Path(member.filename).name
+                        if member.is_dir() or member.filename.startswith("__MACOSX/"):
+                            continue
+                        if not member_name.lower().endswith(".pdf"):
+                            yield f"{name}/{member.filename}", None, "Only PDF files are allowed"
+                            continue
+                        yield member_name, archive.read(member), None
+            except zipfile.BadZipFile:
+                yield name, None, "Not a valid zip archive"
+        else:
+            yield name, None, "Only PDF and zip files are allowed"
+
+class BulkIngestion:
+    """Progress and throughput of a multi-file ingestion"""
+
+    def __init__(self):
+        self.id = f"bulk_{uuid.uuid4().hex[:12]}"
+        self.status = "queued"
+        self.created_at = datetime.now().isoformat()
+        self.jobs: List[IngestionJob] = []
+        self.entries: List = []  # jobs plus result dicts for duplicate and rejected files, in upload order
+        self.bytes = 0
+        self.pages = {}
+        self.total_ms = None
+
+    def to_dict(self) -> Dict:
+        """Per-file results plus aggregate throughput"""
+        files = []
+        for job in self.entries:
+            if isinstance(job, dict):
+                files.append(job)
+                continue
+            result = job.result or {}
+            files.append({
+                "filename": job.filename,
+                "document_id": job.doc_id,
+                "job_id": job.id,
+                "status": job.status,
+                "chunks": result.get("chunks"),
+                "pages": self.pages.get(job.id),
+                "total_ms": job.total_ms,
+                "error": job.error
+            })
+
+        completed = [job for job in self.jobs if job.status == "completed"]
+        throughput = {
+            "files": len(files),
+            "documents": len(completed),
+            "failed": sum(1 for job in self.jobs if job.status == "failed"),
+            "pages": sum(self.pages.get(job.id, 0) for job in completed),
+            "chunks": sum((job.result or {}).get("chunks", 0) for job in completed),
+            "megabytes": round(self.bytes / 1e6, 2)
+        }
+        if self.total_ms:
+            seconds = self.total_ms / 1000
+            for name in ("documents", "pages", "chunks", "megabytes"):
+                throughput[f"{name}_per_second"] = round(throughput[name] / seconds, 2)
+
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "files": files,
+            "total_ms": self.total_ms,
+            "throughput": throughput
+        }
+
+class IngestionService:
+    """Run the extract -> chunk -> embed -> store -> sentiment -> summary pipeline off the event loop"""
+
+    def __init__(self, pdf_service, embedding_service, sentiment_service, metrics_service):
+        self.pdf_service = pdf_service
+        self.embedding_service = embedding_service
+        self.sentiment_service = sentiment_service
+        self.metrics_service = metrics_service
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.INGEST_WORKERS,
+            thread_name_prefix="ingest"
+        )
+        self._jobs = OrderedDict()
+        self._batches = OrderedDict()
+        self._lock = threading.Lock()
+        # Status published here is visible to the other worker processes
+        self.job_store = create_job_store(
+            settings.JOB_STORE,
+            str(Path(settings.DATA_DIR) / "jobs.sqlite3"),
+            settings.JOB_HISTORY_LIMIT
+        )
+
+    def submit(
+        self,
+        doc_id: str,
+        filename: str,
+        file_path: str,
+        models: ModelDependencies,
+        content_hash: str = None
+    ) -> IngestionJob:
+        """Register a job and queue it on the worker pool"""
+        return self._enqueue(IngestionJob(doc_id, filename, file_path, content_hash), models)
+
+    def submit_update(
+        self,
+        doc: Dict,
+        filename: str,
+        file_path: str,
+        models: ModelDependencies,
+        content_hash: str = None
+    ) -> IngestionJob:
+        """Queue a new version of an existing document; only chunks whose text changed are embedded and written"""
+        return self._enqueue(IngestionJob(doc["id"], filename, file_path, content_hash, previous=doc), models)
+
+    def _enqueue(self, job: IngestionJob, models: ModelDependencies) -> IngestionJob:
+        job.on_change = self._publish
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        self._publish(job)
+        self._executor.submit(self._run, job, models)
+        return job
+
+    def find_active_update(self, doc_id: str) -> Optional[IngestionJob]:
+        """In-flight job of this process writing a new version of the document"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.doc_id == doc_id and job.previous is not None and job.status in ("queued", "running"):
+                    return job
+        return None
+
+    def find_active(self, content_hash: str) -> Optional[IngestionJob]:
+        """In-flight job already processing a file with this content hash, in any worker process"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.content_hash == content_hash and job.status in ("queued", "running"):
+                    return job
+        return self.job_store.find_active(content_hash)
+
+    def record_duplicate(
+        self, doc: Dict, filename: str, message: str = "Identical document already processed"
+    ) -> IngestionJob:
+        """Register an already-completed job that points at an existing identical document"""
+        job = IngestionJob(doc["id"], filename, None, doc.get("content_hash"))
+        for stage in job.stages.values():
+            stage["status"] = "skipped"
+        job.result = {
+            "document_id": doc["id"],
+            "message": message,
+            "version": doc.get("version") or 1,
+            "chunks": doc["chunks"],
+            "sentiment": doc["sentiment"],
+            "summary": doc["summary"]
+        }
+        job.status = "completed"
+        job.total_ms = 0.0
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        self._publish(job)
+        return job
+
+    def submit_bulk(
+        self,
+        sources: Iterable[Tuple[str, Optional[bytes], Optional[str]]],
+        models: ModelDependencies,
+        background: bool = True
+    ) -> BulkIngestion:
+        """Save and deduplicate many PDFs, then ingest them together (queued, or inline when background=False)"""
+        bulk = BulkIngestion()
+        seen = {}
+
+        for filename, content, error in sources:
+            if error is not None:
+                bulk.entries.append({"filename": filename, "status": "rejected", "error": error})
+                continue
+            if len(bulk.entries) >= settings.BULK_MAX_FILES:
+                bulk.entries.append({"filename": filename, "status": "rejected", "error": "Too many files in one batch"})
+                continue
+
+            file_hash = content_hash(content)
+            existing = seen.get(file_hash) or models.document_store.find_by_hash(file_hash) or self.find_active(file_hash)
+            if existing is not None:
+                doc_id = existing["id"] if isinstance(existing, dict) else existing.doc_id
+                bulk.entries.append({"filename": filename, "document_id": doc_id, "status": "duplicate"})
+                continue
+
+            doc_id = new_document_id()
+            file_path = Path(settings.UPLOAD_DIR) / f"{doc_id}_{filename}"
+            file_path.write_bytes(content)
+            bulk.bytes += len(content)
+
+            job = IngestionJob(doc_id, filename, str(file_path), file_hash)
+            job.on_change = self._publish
+            seen[file_hash] = job
+            bulk.jobs.append(job)
+            bulk.entries.append(job)
+
+        with self._lock:
+            for job in bulk.jobs:
+                self._jobs[job.id] = job
+            self._batches[bulk.id] = bulk
+            self._evict_finished()
+        for job in bulk.jobs:
+            self._publish(job)
+        self._publish_batch(bulk)
+
+        if background:
+            self._executor.submit(self.run_bulk, bulk, models)
+        else:
+            self.run_bulk(bulk, models)
+        return bulk
+
+    def get_batch(self, batch_id: str) -> Optional[BulkIngestion]:
+        """Look up a bulk ingestion by id"""
+        with self._lock:
+            bulk = self._batches.get(batch_id)
+        return bulk or self.job_store.get_batch(batch_id)
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by id"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job or self.job_store.get_job(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        """Jobs tracked by this process, oldest first"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _evict_finished(self):
+        """Drop the oldest finished jobs once the history limit is exceeded"""
+        overflow = len(self._jobs) - settings.JOB_HISTORY_LIMIT
+        if overflow <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.status in ("completed", "failed")][:overflow]:
+            del self._jobs[job_id]
+        overflow = len(self._batches) - settings.JOB_HISTORY_LIMIT
+        for batch_id in [b.id for b in self._batches.values() if b.status == "completed"][:max(overflow, 0)]:
+            del self._batches[batch_id]
+
+    def _publish(self, job: IngestionJob):
+        """Write the job's status to the shared job store"""
+        try:
+            self.job_store.save_job(job.id, job.content_hash, job.status, job.to_dict())
+        except Exception as e:
+            # Status reporting must never fail an ingestion
+            print(f"⚠️  Could not publish status of {job.id}: {e}")
+
+    def _publish_batch(self, bulk: BulkIngestion):
+        try:
+            self.job_store.save_batch(bulk.id, bulk.to_dict())
+        except Exception as e:
+            print(f"⚠️  Could not publish status of {bulk.id}: {e}")
+
+    def _run(self, job: IngestionJob, models: ModelDependencies):
+        """Execute every pipeline stage for a job, recording progress and timings"""
+        started = time.perf_counter()
+        job.status = "running"
+
+        try:
+            if job.previous is not None:
+                record = self._ingest_update(job, models)
+            elif settings.INGEST_STREAMING:
+                record = self._ingest_streaming(job, models)
+            else:
+                record = self._ingest_buffered(job, models)
+
+            self._complete(job, record, models)
+
+        except Exception as e:
+            self._fail(job, e, models)
+
+        finally:
+            job.total_ms = round((time.perf_counter() - started) * 1000, 2)
+            self._publish(job)
+
+    def _complete(self, job: IngestionJob, record: Dict, models: ModelDependencies):
+        """Publish the document record and mark the job completed"""
+        if job.previous is not None and job.doc_id not in models.document_store:
+            # Deleted (by another worker) while this version was written: don't bring it back
+            job.vectors_written = True
+            raise Exception("Document was deleted during the update")
+        record["content_hash"] = job.content_hash
+        models.document_store.put(record, job.chunk_ids, job.chunk_sentiment)
+        job.embedding_update = job.text_path = None
+        previous_text = (job.previous or {}).get("text_path")
+        if previous_text and previous_text != record["text_path"]:
+            Path(previous_text).unlink(missing_ok=True)
+        models.answer_cache.invalidate_document(job.doc_id)
+
+        job.result = {
+            "document_id": job.doc_id,
+            "message": "PDF updated successfully" if job.previous is not None else "PDF processed successfully",
+            "version": record.get("version") or 1,
+            "chunks": record["chunks"],
+            "sentiment": record["sentiment"],
+            "summary": record["summary"],
+            "changes": job.changes
+        }
+        job.status = "completed"
+
+    def _fail(self, job: IngestionJob, error: Exception, models: ModelDependencies):
+        """Mark running stages and the job failed, removing any vectors already written (or, for an update,
+        putting the previous version back)"""
+        failed = [name for name, stage in job.stages.items() if stage["status"] == "running"]
+        print(f"❌ Ingestion job {job.id} failed at {', '.join(failed) or 'startup'}: {str(error)}")
+        telemetry.ERRORS.inc(stage="ingest")
+        for name in failed:
+            job.finish_stage(name, status="failed")
+        if job.vectors_written:
+            # Don't leave orphaned vectors for a document that never became visible
+            try:
+                self.embedding_service.delete_embeddings(job.doc_id, models)
+            except Exception as cleanup_error:
+                print(f"⚠️  Could not clean up vectors for {job.doc_id}: {cleanup_error}")
+        elif job.embedding_update is not None:
+            try:
+                self.embedding_service.revert_update(job.embedding_update, models)
+            except Exception as cleanup_error:
+                print(f"⚠️  Could not restore the previous version of {job.doc_id}: {cleanup_error}")
+        if job.text_path is not None:
+            job.text_path.unlink(missing_ok=True)
+        job.error = f"Error processing PDF: {str(error)}"
+        job.status = "failed"
+
+    def run_bulk(self, bulk: BulkIngestion, models: ModelDependencies):
+        """Ingest a batch in groups: parallel extraction, shared embedding batches and bulk vector writes"""
+        started = time.perf_counter()
+        bulk.status = "running"
+        self._publish_batch(bulk)
+        for group in batched(bulk.jobs, settings.BULK_GROUP_SIZE):
+            self._ingest_group(group, bulk, models)
+            for job in group:
+                self._publish(job)
+            self._publish_batch(bulk)
+        bulk.total_ms = round((time.perf_counter() - started) * 1000, 2)
+        bulk.status = "completed"
+        self._publish_batch(bulk)
+        print(f"📦 Bulk ingestion {bulk.id}: {bulk.to_dict()['throughput']}")
+
+    def _ingest_group(self, jobs: List[IngestionJob], bulk: BulkIngestion, models: ModelDependencies):
+        started = time.perf_counter()
+        for job in jobs:
+            job.status = "running"
+            job.start_stage("extract")
+
+        documents = []  # (job, pages, text, chunks)
+        extracted = self.pdf_service.extract_many([job.file_path for job in jobs])
+        for job, (pages, error) in zip(jobs, extracted):
+            try:
+                if error is not None:
+                    raise error
+                text = self.pdf_service.join_pages(pages)
+                if not text.strip():
+                    raise Exception("Could not extract text from PDF")
+                job.finish_stage("extract")
+                job.start_stage("chunk")
+                chunks = self.pdf_service.chunk_pages(pages)
+                job.finish_stage("chunk")
+                bulk.pages[job.id] = len(pages)
+                documents.append((job, pages, text, chunks))
+            except Exception as e:
+                self._fail(job, e, models)
+
+        # One embedding stream across every document in the group
+        try:
+            for job, _, _, _ in documents:
+                job.start_stage("embed")
+            all_chunks = [chunk.text for _, _, _, chunks in documents for chunk in chunks]
+            embeddings = []
+            embedded = 0
+            for batch in batched(all_chunks, settings.BULK_EMBEDDING_BATCH_SIZE):
+                embeddings.append(self.embedding_service.generate_embeddings(batch, models))
+                embedded += len(batch)
+                for job, _, _, _ in documents:
+                    job.set_progress("embed", embedded / len(all_chunks))
+            for job, _, _, _ in documents:
+                job.finish_stage("embed")
+                job.start_stage("store")
+                job.vectors_written = True
+            stored_ids = self.embedding_service.store_embeddings_many(
+                [(job.doc_id, job.filename, chunks) for job, _, _, chunks in documents],
+                embeddings, models
+            )
+            for (job, _, _, _), ids in zip(documents, stored_ids):
+                job.chunk_ids = ids
+                self.embedding_service.commit_embeddings(job.doc_id, models)
+                job.finish_stage("store")
+        except Exception as e:
+            for job, _, _, _ in documents:
+                self._fail(job, e, models)
+            documents = []
+
+        for job, pages, text, chunks in documents:
+            try:
+                texts = [chunk.text for chunk in chunks]
+                job.start_stage("sentiment")
+                sentiment, job.chunk_sentiment = self.sentiment_service.analyze_batch(texts, models)
+                job.finish_stage("sentiment")
+
+                job.start_stage("summary")
+                metric_matches, keyword_counts = self.pdf_service.scan_pages(pages)
+                metrics = self.pdf_service.metrics_from_matches(metric_matches)
+                summary = self.pdf_service.extract_summary(texts, text, metrics=metrics)
+                job.finish_stage("summary")
+
+                text_path = self._text_path(job.doc_id)
+                text_path.write_text(text, encoding="utf-8")
+                self._complete(job, {
+                    "id": job.doc_id,
+                    "filename": job.filename,
+                    "upload_date": datetime.now().isoformat(),
+                    "chunks": len(chunks),
+                    "pages": len(pages),
+                    "sentiment": sentiment,
+                    "summary": summary,
+                    "metrics": self.metrics_service.build_record(metric_matches, keyword_counts),
+                    "text_path": str(text_path)
+                }, models)
+            except Exception as e:
+                self._fail(job, e, models)
+
+        for job in jobs:
+            job.total_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _text_path(self, doc_id: str, version: int = 1) -> Path:
+        """On-disk location of a document's extracted text; each version gets its own file"""
+        text_dir = Path(settings.DATA_DIR) / "texts"
+        text_dir.mkdir(parents=True, exist_ok=True)
+        return text_dir / (f"{doc_id}.txt" if version == 1 else f"{doc_id}.v{version}.txt")
+
+    def _ingest_buffered(self, job: IngestionJob, models: ModelDependencies) -> Dict:
+        """Run each stage to completion over the whole document before starting the next"""
+        job.start_stage("extract")
+        pages = self.pdf_service.extract_pages(job.file_path)
+        text = self.pdf_service.join_pages(pages)
+        if not text.strip():
+            raise Exception("Could not extract text from PDF")
+        job.finish_stage("extract")
+
+        job.start_stage("chunk")
+        chunks = self.pdf_service.chunk_pages(pages)
+        texts = [chunk.text for chunk in chunks]
+        job.finish_stage("chunk")
+
+        job.start_stage("embed")
+        embeddings = []
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        for start in range(0, len(chunks), batch_size):
+            embeddings.append(self.embedding_service.generate_embeddings(
+                texts[start:start + batch_size], models
+            ))
+            job.set_progress("embed", min(start + batch_size, len(chunks)) / len(chunks))
+        job.finish_stage("embed")
+
+        job.start_stage("store")
+        job.vectors_written = True
+        job.chunk_ids = self.embedding_service.store_embeddings(
+            job.doc_id, chunks, embeddings, job.filename, models
+        )
+        self.embedding_service.commit_embeddings(job.doc_id, models)
+        job.finish_stage("store")
+
+        job.start_stage("sentiment")
+        sentiment, job.chunk_sentiment = self.sentiment_service.analyze_batch(texts, models)
+        job.finish_stage("sentiment")
+
+        job.start_stage("summary")
+        metric_matches, keyword_counts = self.pdf_service.scan_pages(pages)
+        metrics = self.pdf_service.metrics_from_matches(metric_matches)
+        summary = self.pdf_service.extract_summary(texts, text, metrics=metrics)
+        job.finish_stage("summary")
+
+        text_path = self._text_path(job.doc_id)
+        text_path.write_text(text, encoding="utf-8")
+
+        return {
+            "id": job.doc_id,
+            "filename": job.filename,
+            "upload_date": datetime.now().isoformat(),
+            "chunks": len(chunks),
+            "pages": len(pages),
+            "sentiment": sentiment,
+            "summary": summary,
+            "metrics": self.metrics_service.build_record(metric_matches, keyword_counts),
+            "text_path": str(text_path)
+        }
+
+    def _ingest_streaming(self, job: IngestionJob, models: ModelDependencies) -> Dict:
+        """Overlap extract/chunk, embed and store on bounded queues so memory stays flat with document size"""
+        page_count = self.pdf_service.count_pages(job.file_path)
+        text_path = self._text_path(job.doc_id)
+        depth = settings.INGEST_PREFETCH_DEPTH
+        metric_matches = []
+        keyword_counts = {}
+        sample = []
+        pages_read = [0]
+        sentiment_scores = self.sentiment_service.accumulator(models)
+
+        for name in ("extract", "chunk", "embed", "store", "sentiment"):
+            job.start_stage(name)
+
+        def pages():
+            # Full text goes to disk page by page instead of accumulating in memory
+            with open(text_path, "w", encoding="utf-8") as text_file:
+                for page in self.pdf_service.iter_pages(job.file_path):
+                    text_file.write(page["text"])
+                    text_file.write("\n")
+                    page_matches, page_counts = self.pdf_service.scan_pages([page])
+                    metric_matches.extend(page_matches)
+                    for kind, count in page_counts.items():
+                        keyword_counts[kind] = keyword_counts.get(kind, 0) + count
+                    pages_read[0] += 1
+                    job.set_progress("extract", pages_read[0] / max(page_count, 1))
+                    yield page
+            job.finish_stage("extract")
+
+        def chunk_batches():
+            chunks = self.pdf_service.iter_chunks(pages())
+            for batch in batched(chunks, settings.EMBEDDING_BATCH_SIZE):
+                if len(sample) < SAMPLE_CHUNKS:
+                    sample.extend(chunk.text for chunk in batch[:SAMPLE_CHUNKS - len(sample)])
+                fraction = pages_read[0] / max(page_count, 1)
+                job.set_progress("chunk", fraction)
+                yield batch, fraction
+            job.finish_stage("chunk")
+
+        def embedded_batches():
+            for batch, fraction in prefetch(chunk_batches(), depth):
+                embeddings = self.embedding_service.generate_embeddings([chunk.text for chunk in batch], models)
+                job.set_progress("embed", fraction)
+                yield batch, embeddings, fraction
+            job.finish_stage("embed")
+
+        chunk_count = 0
+        occurrences = Counter()
+        for batch, embeddings, fraction in prefetch(embedded_batches(), depth):
+            job.vectors_written = True
+            job.chunk_ids.extend(self.embedding_service.store_embeddings(
+                job.doc_id, batch, embeddings, job.filename, models, occurrences=occurrences
+            ))
+            chunk_count += len(batch)
+            job.set_progress("store", fraction)
+            # Score while the next batches are still being extracted and embedded
+            sentiment_scores.add([chunk.text for chunk in batch])
+            job.set_progress("sentiment", fraction)
+        self.embedding_service.commit_embeddings(job.doc_id, models)
+        job.finish_stage("store")
+
+        if chunk_count == 0:
+            raise Exception("Could not extract text from PDF")
+
+        sentiment, job.chunk_sentiment = sentiment_scores.result()
+        job.finish_stage("sentiment")
+
+        job.start_stage("summary")
+        metrics = self.pdf_service.metrics_from_matches(metric_matches)
+        summary = self.pdf_service.extract_summary(sample, "", metrics=metrics)
+        job.finish_stage("summary")
+
+        return {
+            "id": job.doc_id,
+            "filename": job.filename,
+            "upload_date": datetime.now().isoformat(),
+            "chunks": chunk_count,
+            "pages": page_count,
+            "sentiment": sentiment,
+            "summary": summary,
+            "metrics": self.metrics_service.build_record(metric_matches, keyword_counts),
+            "text_path": str(text_path)
+        }
+
+    def _ingest_update(self, job: IngestionJob, models: ModelDependencies) -> Dict:
+        """Re-chunk a new version of a document, diff chunk ids (content hashes) against the stored version
+        and embed, write and score only the chunks whose text changed"""
+        previous = job.previous
+        job.start_stage("extract")
+        pages = self.pdf_service.extract_pages(job.file_path)
+        text = self.pdf_service.join_pages(pages)
+        if not text.strip():
+            raise Exception("Could not extract text from PDF")
+        job.finish_stage("extract")
+
+        job.start_stage("chunk")
+        chunks = self.pdf_service.chunk_pages(pages)
+        texts = [chunk.text for chunk in chunks]
+        ids = chunk_ids(job.doc_id, texts)
+        previous_ids = models.document_store.get_chunk_ids(job.doc_id)
+        # Stored before chunk ids were recorded: every old chunk is replaced, and removed only once the new ones are in
+        old_ids = previous_ids or legacy_chunk_ids(job.doc_id, previous.get("chunks") or 0)
+        old, new = set(old_ids), set(ids)
+        added = [i for i, chunk_id in enumerate(ids) if chunk_id not in old]
+        removed = [chunk_id for chunk_id in old_ids if chunk_id not in new]
+        job.finish_stage("chunk")
+
+        job.start_stage("embed")
+        embeddings = []
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        for start in range(0, len(added), batch_size):
+            embeddings.append(self.embedding_service.generate_embeddings(
+                [texts[i] for i in added[start:start + batch_size]], models
+            ))
+            job.set_progress("embed", min(start + batch_size, len(added)) / len(added))
+        job.finish_stage("embed")
+
+        # Score and summarize before the store, so a failure there never leaves a half-written version
+        job.start_stage("sentiment")
+        sentiment, job.chunk_sentiment = self.sentiment_service.analyze_update(
+            texts, self._previous_scores(job.doc_id, ids, models), models
+        )
+        job.finish_stage("sentiment")
+
+        job.start_stage("summary")
+        metric_matches, keyword_counts = self.pdf_service.scan_pages(pages)
+        metrics = self.pdf_service.metrics_from_matches(metric_matches)
+        summary = self.pdf_service.extract_summary(texts, text, metrics=metrics)
+        job.finish_stage("summary")
+
+        version = (previous.get("version") or 1) + 1
+        job.text_path = self._text_path(job.doc_id, version)
+        job.text_path.write_text(text, encoding="utf-8")
+
+        job.start_stage("store")
+        job.embedding_update = self.embedding_service.update_embeddings(
+            job.doc_id, chunks, ids, added, embeddings, removed, previous["filename"], models
+        )
+        job.chunk_ids = ids
+        job.changes = {
+            "added": len(added), "removed": len(removed), "kept": len(ids) - len(added),
+            "moved": len(job.embedding_update.moved)
+        }
+        job.finish_stage("store")
+
+        return {
+            "id": job.doc_id,
+            "filename": previous["filename"],
+            "upload_date": previous["upload_date"],
+            "chunks": len(chunks),
+            "pages": len(pages),
+            "sentiment": sentiment,
+            "summary": summary,
+            "metrics": self.metrics_service.build_record(metric_matches, keyword_counts),
+            "text_path": str(job.text_path),
+            "version": version
+        }
+
+    def _previous_scores(self, doc_id: str, ids: List[str], models: ModelDependencies) -> List[Optional[Tuple[float, int]]]:
+        """(score, weight) of each new chunk that was already scored in the stored version, else None"""
+        known = models.document_store.get_chunk_sentiment(doc_id)
+        return [known.get(chunk_id) for chunk_id in ids]
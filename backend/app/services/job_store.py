@@ -0,0 +1,130 @@
+"""
+Job store - Ingestion job and bulk batch status shared between API worker processes
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+class JobSnapshot:
+    """Read-only job or batch status published by another worker process"""
+
+    def __init__(self, data: Dict):
+        self._data = data
+        self.id = data.get("job_id") or data.get("batch_id")
+        self.doc_id = data.get("document_id")
+        self.status = data.get("status")
+
+    def to_dict(self) -> Dict:
+        return self._data
+
+class JobStore:
+    """Interface for published job status; the default keeps nothing because jobs live in process memory"""
+
+    def save_job(self, job_id: str, content_hash: Optional[str], status: str, snapshot: Dict) -> None:
+        pass
+
+    def get_job(self, job_id: str) -> Optional[JobSnapshot]:
+        return None
+
+    def find_active(self, content_hash: str) -> Optional[JobSnapshot]:
+        return None
+
+    def save_batch(self, batch_id: str, snapshot: Dict) -> None:
+        pass
+
+    def get_batch(self, batch_id: str) -> Optional[JobSnapshot]:
+        return None
+
+class SQLiteJobStore(JobStore):
+    """SQLite-backed job status visible to every worker process (WAL mode)"""
+
+    def __init__(self, path: str, history_limit: int = 200, stale_seconds: float = 3600):
+        self.path = path
+        self.history_limit = history_limit
+        # Queued/running jobs not updated for this long belonged to a worker that died
+        self.stale_seconds = stale_seconds
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    content_hash TEXT,
+                    status TEXT NOT NULL,
+                    snapshot TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_content_hash ON jobs (content_hash, status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (kind, updated_at)")
+
+    def _save(self, kind: str, job_id: str, content_hash: Optional[str], status: str, snapshot: Dict):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, kind, content_hash, status, snapshot, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, content_hash, status, json.dumps(snapshot, default=str), time.time())
+            )
+            if status in ("completed", "failed"):
+                # Keep the newest history_limit entries of this kind
+                conn.execute(
+                    "DELETE FROM jobs WHERE kind = ? AND job_id NOT IN "
+                    "(SELECT job_id FROM jobs WHERE kind = ? ORDER BY updated_at DESC LIMIT ?)",
+                    (kind, kind, self.history_limit)
+                )
+
+    def _get(self, kind: str, job_id: str) -> Optional[JobSnapshot]:
+        row = self._connection().execute(
+            "SELECT snapshot FROM jobs WHERE job_id = ? AND kind = ?", (job_id, kind)
+        ).fetchone()
+        return JobSnapshot(json.loads(row["snapshot"])) if row else None
+
+    def save_job(self, job_id: str, content_hash: Optional[str], status: str, snapshot: Dict) -> None:
+        self._save("job", job_id, content_hash, status, snapshot)
+
+    def get_job(self, job_id: str) -> Optional[JobSnapshot]:
+        return self._get("job", job_id)
+
+    def find_active(self, content_hash: str) -> Optional[JobSnapshot]:
+        row = self._connection().execute(
+            "SELECT snapshot FROM jobs WHERE kind = 'job' AND content_hash = ? "
+            "AND status IN ('queued', 'running') AND updated_at > ? ORDER BY updated_at DESC LIMIT 1",
+            (content_hash, time.time() - self.stale_seconds)
+        ).fetchone()
+        return JobSnapshot(json.loads(row["snapshot"])) if row else None
+
+    def save_batch(self, batch_id: str, snapshot: Dict) -> None:
+        self._save("batch", batch_id, None, snapshot["status"], snapshot)
+
+    def get_batch(self, batch_id: str) -> Optional[JobSnapshot]:
+        return self._get("batch", batch_id)
+
+def create_job_store(backend: str, path: str, history_limit: int = 200) -> JobStore:
+    """Build the configured job store ("memory" or "sqlite")"""
+    if backend == "memory":
+        return JobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore(path, history_limit)
+    raise ValueError(f"Unknown JOB_STORE backend: {backend}")
@@ -0,0 +1,191 @@
+"""
+Lexical index - Persistent BM25 inverted index over stored chunks
+"""
+
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+# Numbers keep their decimal/thousands separators so "1,234.5" and "3.2" stay single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the their this
+to was were what which who will with how did does do than then there these those our we
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word and number tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Merge ranked id lists: score(id) = sum of 1 / (k + rank) over the lists containing it"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class LexicalIndex:
+    """SQLite inverted index (term -> chunk, term frequency) scored with Okapi BM25"""
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    length INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks (doc_id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, chunk_id)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk_id ON postings (chunk_id)")
+            # Corpus statistics kept in step by every write, so a search only reads rows for its own terms
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS terms (
+                    term TEXT PRIMARY KEY,
+                    df INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    chunks INTEGER NOT NULL,
+                    total_length INTEGER NOT NULL
+                )
+            """)
+            # Indexes built before the statistics were kept are counted once, by whichever worker gets here first
+            backfilled = conn.execute(
+                "INSERT OR IGNORE INTO stats (id, chunks, total_length) SELECT 0, COUNT(*), COALESCE(SUM(length), 0) FROM chunks"
+            ).rowcount
+            if backfilled:
+                conn.execute("INSERT OR REPLACE INTO terms (term, df) SELECT term, COUNT(*) FROM postings GROUP BY term")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets queries run alongside the ingest writer"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, doc_id: str, chunk_ids: List[str], texts: List[str]) -> None:
+        """Index (or re-index) chunks of a document"""
+        chunk_rows = []
+        posting_rows = []
+        document_frequency = Counter()
+        for chunk_id, text in zip(chunk_ids, texts):
+            terms = Counter(tokenize(text))
+            chunk_rows.append((chunk_id, doc_id, sum(terms.values())))
+            posting_rows.extend((term, chunk_id, tf) for term, tf in terms.items())
+            document_frequency.update(terms.keys())
+
+        conn = self._connection()
+        with conn:
+            self._delete_chunks(conn, chunk_ids)
+            conn.executemany("INSERT INTO chunks (chunk_id, doc_id, length) VALUES (?, ?, ?)", chunk_rows)
+            conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            conn.executemany(
+                "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+                document_frequency.items()
+            )
+            conn.execute(
+                "UPDATE stats SET chunks = chunks + ?, total_length = total_length + ? WHERE id = 0",
+                (len(chunk_rows), sum(row[2] for row in chunk_rows))
+            )
+
+    def _remove(self, conn: sqlite3.Connection, condition: str, params: List):
+        """Delete the chunks matching a condition on the chunks table and take them out of the statistics"""
+        chunks, length = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE {condition}", params
+        ).fetchone()
+        if not chunks:
+            return
+        selected = f"SELECT chunk_id FROM chunks WHERE {condition}"
+        removed_terms = conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE chunk_id IN ({selected}) GROUP BY term", params
+        ).fetchall()
+        conn.executemany("UPDATE terms SET df = df - ? WHERE term = ?", [(df, term) for term, df in removed_terms])
+        conn.executemany("DELETE FROM terms WHERE term = ? AND df <= 0", [(term,) for term, _ in removed_terms])
+        conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({selected})", params)
+        conn.execute(f"DELETE FROM chunks WHERE {condition}", params)
+        conn.execute(
+            "UPDATE stats SET chunks = chunks - ?, total_length = total_length - ? WHERE id = 0", (chunks, length)
+        )
+
+    def _delete_chunks(self, conn: sqlite3.Connection, chunk_ids: List[str]):
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            self._remove(conn, f"chunk_id IN ({','.join('?' * len(batch))})", batch)
+
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
+        conn = self._connection()
+        with conn:
+            self._delete_chunks(conn, list(chunk_ids))
+
+    def delete_document(self, doc_id: str) -> None:
+        conn = self._connection()
+        with conn:
+            self._remove(conn, "doc_id = ?", [doc_id])
+
+    def count(self) -> int:
+        """Number of indexed chunks"""
+        row = self._connection().execute("SELECT chunks FROM stats WHERE id = 0").fetchone()
+        return row[0] if row else 0
+
+    def search(self, query: str, top_k: int, document_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Top chunk ids by BM25 score, optionally restricted to some documents"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        conn = self._connection()
+        row = conn.execute("SELECT chunks, total_length FROM stats WHERE id = 0").fetchone()
+        if not row or not row[0]:
+            return []
+        total, total_length = row
+        average_length = total_length / total
+
+        term_placeholders = ",".join("?" * len(terms))
+        document_frequency = dict(conn.execute(
+            f"SELECT term, df FROM terms WHERE term IN ({term_placeholders})", terms
+        ))
+        idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+        sql = f"""SELECT p.term, p.chunk_id, p.tf, c.length FROM postings p
+                  JOIN chunks c ON c.chunk_id = p.chunk_id
+                  WHERE p.term IN ({term_placeholders})"""
+        params = list(terms)
+        if document_ids:
+            sql += f" AND c.doc_id IN ({','.join('?' * len(document_ids))})"
+            params.extend(document_ids)
+
+        scores = {}
+        for term, chunk_id, tf, length in conn.execute(sql, params):
+            norm = self.k1 * (1 - self.b + self.b * length / average_length)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf[term] * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
@@ -0,0 +1,260 @@
+"""
+Async LLM client - Concurrency-limited, rate-limited Gemini calls with retries
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from app.services.context_builder import estimate_tokens
+from app.utils import telemetry
+
+class LLMOverloadedError(Exception):
+    """Raised when too many LLM calls are already waiting"""
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call misses its deadline"""
+
+def count_tokens(prompt: Optional[str], response: Any):
+    """Record LLM token usage, from the response's usage metadata when the SDK provides it"""
+    usage = getattr(response, "usage_metadata", None)
+    if prompt is not None:
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        telemetry.LLM_TOKENS.inc(prompt_tokens or estimate_tokens(prompt), kind="prompt")
+    completion_tokens = getattr(usage, "candidates_token_count", None)
+    if completion_tokens is None:
+        try:
+            completion_tokens = estimate_tokens(response.text)
+        except Exception:
+            completion_tokens = 0
+    telemetry.LLM_TOKENS.inc(completion_tokens, kind="completion")
+
+def is_retryable_error(error: Exception) -> bool:
+    """Rate-limit and server-side failures are worth retrying; bad requests are not"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    message = str(error).lower()
+    return any(marker in message for marker in (
+        "429", "quota", "rate limit", "resource exhausted",
+        "500", "502", "503", "504", "unavailable", "deadline"
+    ))
+
+class TokenBucket:
+    """Async token bucket: refills at rate per second up to capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class GeminiClient:
+    """Async wrapper around a Gemini model with a concurrency cap, rate limiting,
+    exponential backoff with jitter, per-call deadlines and coalescing of identical in-flight prompts"""
+
+    def __init__(
+        self,
+        model,
+        max_concurrency: int = 4,
+        requests_per_minute: float = 15,
+        max_retries: int = 3,
+        timeout_seconds: float = 30.0,
+        max_pending: int = 64,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0
+    ):
+        self.model = model
+        self.max_retries = max_retries
+        self.timeout_seconds = timeout_seconds
+        self.max_pending = max_pending
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(
+            rate=requests_per_minute / 60.0,
+            capacity=max(1.0, min(max_concurrency, requests_per_minute / 60.0 * 10))
+        )
+        self._in_flight: Dict[Tuple, asyncio.Future] = {}
+        self._pending = 0
+        self.stats = {"calls": 0, "coalesced": 0, "retries": 0, "failures": 0}
+
+    async def generate(self, prompt: str, generation_config=None, timeout: Optional[float] = None) -> Any:
+        """Generate a response, sharing the result with identical concurrent requests"""
+        key = (prompt, repr(generation_config))
+        shared = self._in_flight.get(key)
+        if shared is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(shared)
+
+        if self._pending >= self.max_pending:
+            raise LLMOverloadedError(f"LLM queue is full ({self._pending} calls pending)")
+
+        task = asyncio.ensure_future(
+            self._generate_with_retries(prompt, generation_config, timeout or self.timeout_seconds)
+        )
+        self._in_flight[key] = task
+        self._pending += 1
+
+        def _done(_):
+            self._in_flight.pop(key, None)
+            self._pending -= 1
+
+        task.add_done_callback(_done)
+        # Shield so one caller disconnecting doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _generate_with_retries(self, prompt: str, generation_config, timeout: float) -> Any:
+        """Retry retryable failures with full-jitter backoff until the deadline"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+            async with self._semaphore:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self.stats["calls"] += 1
+                    return await asyncio.wait_for(self._call(prompt, generation_config), remaining)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable_error(e):
+                        self.stats["failures"] += 1
+                        if isinstance(e, asyncio.TimeoutError):
+                            raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+                        raise
+                    print(f"⚠️  Gemini call failed (attempt {attempt + 1}), retrying: {e!r}")
+
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+            if loop.time() + delay >= deadline:
+                break
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+        self.stats["failures"] += 1
+        raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+
+    async def stream(self, prompt: str, generation_config=None, timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        """Yield response chunks as the model produces them; retries only happen before the first chunk"""
+        if self._pending >= self.max_pending:
+            raise LLMOverloadedError(f"LLM queue is full ({self._pending} calls pending)")
+
+        timeout = timeout or self.timeout_seconds
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        self._pending += 1
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._bucket.acquire()
+                async with self._semaphore:
+                    started = False
+                    try:
+                        self.stats["calls"] += 1
+                        async for chunk in self._stream_call(prompt, generation_config, deadline):
+                            if not started:
+                                telemetry.LLM_TOKENS.inc(estimate_tokens(prompt), kind="prompt")
+                            started = True
+                            count_tokens(None, chunk)
+                            yield chunk
+                        return
+                    except Exception as e:
+                        # Once text has reached the caller a retry would duplicate it
+                        if started or attempt >= self.max_retries or not is_retryable_error(e):
+                            self.stats["failures"] += 1
+                            if isinstance(e, asyncio.TimeoutError):
+                                raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+                            raise
+                        print(f"⚠️  Gemini stream failed (attempt {attempt + 1}), retrying: {e!r}")
+
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                if loop.time() + delay >= deadline:
+                    break
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+            self.stats["failures"] += 1
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+        finally:
+            self._pending -= 1
+
+    @telemetry.traced("llm_stream")
+    async def _stream_call(self, prompt: str, generation_config, deadline: float) -> AsyncIterator[Any]:
+        """Stream from the native async API, or bridge the sync stream from a worker thread"""
+        loop = asyncio.get_running_loop()
+        generate_async = getattr(self.model, "generate_content_async", None)
+
+        if generate_async is not None:
+            response = await asyncio.wait_for(
+                generate_async(prompt, generation_config=generation_config, stream=True),
+                deadline - loop.time()
+            )
+            iterator = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), deadline - loop.time())
+                except StopAsyncIteration:
+                    return
+                yield chunk
+
+        queue = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for chunk in self.model.generate_content(
+                    prompt, generation_config=generation_config, stream=True
+                ):
+                    if cancelled.is_set():
+                        return
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        worker = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), deadline - loop.time())
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            worker.cancel()
+
+    @telemetry.traced("llm_call")
+    async def _call(self, prompt: str, generation_config) -> Any:
+        """Use the model's native async API when available, otherwise a worker thread"""
+        generate_async = getattr(self.model, "generate_content_async", None)
+        if generate_async is not None:
+            response = await generate_async(prompt, generation_config=generation_config)
+        else:
+            response = await asyncio.to_thread(
+                self.model.generate_content, prompt, generation_config=generation_config
+            )
+        count_tokens(prompt, response)
+        return response
@@ -2,9 +2,55 @@
 LLM service - Generate answers using Google Gemini
 """
 
-from typing import List, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import google.generativeai as genai
 from app.api.dependencies import ModelDependencies
+from app.services.context_builder import estimate_tokens, pack_context
+from app.services.llm_client import LLMOverloadedError
+from app.config import settings
+
+# Marker prepended to answers that appear to use general knowledge
+LOW_CONFIDENCE_PREFIX = "[Low confidence - may contain general knowledge]"
+
+# Phrases suggesting the answer drew on general knowledge rather than the context
+HALLUCINATION_INDICATORS = [
+    "typically", "usually", "commonly", "in general", 
+    "most companies", "industry standard", "it is known that",
+    "generally speaking", "as we know"
+]
+
+# Phrases where the model admits the context doesn't answer the question
+NOT_FOUND_PHRASES = ["cannot find", "not in the document", "don't have"]
+
+class AnswerScorer:
+    """Incremental confidence scoring over streamed answer text"""
+    
+    def __init__(self):
+        self._tail = ""
+        self._keep = max(len(p) for p in HALLUCINATION_INDICATORS + NOT_FOUND_PHRASES) - 1
+        self.hallucination = False
+        self.not_found = False
+    
+    def feed(self, text: str):
+        """Scan new text, including phrases split across chunk boundaries"""
+        window = self._tail + text.lower()
+        if not self.hallucination:
+            self.hallucination = any(indicator in window for indicator in HALLUCINATION_INDICATORS)
+        if not self.not_found:
+            self.not_found = any(phrase in window for phrase in NOT_FOUND_PHRASES)
+        self._tail = window[-self._keep:]
+    
+    def result(self) -> Tuple[float, bool]:
+        """(confidence, low_confidence) for everything fed so far"""
+        confidence = 0.85  # Base confidence for Gemini
+        
+        if self.hallucination:
+            confidence = 0.5
+        
+        if self.not_found:
+            confidence = 0.3
+        
+        return confidence, self.hallucination
 
 class LLMService:
     """Handle LLM operations using Gemini"""
@@ -34,20 +80,32 @@ class LLMService:
             # Last resort fallback
             return "Unable to generate response. Please try again."
     
-    def generate_answer(
-        self, 
-        question: str, 
-        chunks: List[str], 
-        models: ModelDependencies,
-        max_length: int = 500
-    ) -> Tuple[str, float]:
-        """Generate answer using Gemini API"""
-        
-        # Combine chunks
-        context = "\n\n---\n\n".join(chunks[:5])
+    def build_prompt(
+        self,
+        question: str,
+        chunks: List[str],
+        metadatas: Optional[List[Dict]] = None
+    ) -> Tuple[str, Dict]:
+        """RAG prompt grounded in the retrieved chunks, packed to the context token budget"""
+        # Overlap search bound in characters, for chunks stored without document offsets
+        packed = pack_context(
+            chunks, metadatas, settings.CONTEXT_TOKEN_BUDGET, settings.CHUNK_OVERLAP_TOKENS * 8
+        )
+        prompt = self._build_answer_prompt(question, packed["context"])
+        metadata = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "context_tokens": packed["context_tokens"],
+            "retrieved_chunks": packed["retrieved_chunks"],
+            "context_chunks": packed["context_chunks"],
+            "tokens_saved": packed["tokens_saved"]
+        }
+        return prompt, metadata
+    
+    def _build_answer_prompt(self, question: str, context: str) -> str:
+        """Prompt template around the packed context"""
         
         # Enhanced prompt to reduce hallucinations
-        prompt = f"""You are a financial analyst assistant. Answer the question based ONLY on the provided context from a financial document.
+        return f"""You are a financial analyst assistant. Answer the question based ONLY on the provided context from a financial document.
 
 IMPORTANT RULES:
 1. Only use information explicitly stated in the context below
@@ -62,10 +120,33 @@ CONTEXT FROM FINANCIAL REPORT:
 QUESTION: {question}
 
 ANSWER (based only on the context above):"""
+    
+    def _score_answer(self, answer: str) -> Tuple[str, float]:
+        """Adjust confidence for hallucination indicators and non-answers"""
+        scorer = AnswerScorer()
+        scorer.feed(answer)
+        confidence, low_confidence = scorer.result()
+        
+        if low_confidence:
+            answer = f"{LOW_CONFIDENCE_PREFIX} {answer}"
+        
+        return answer, confidence
+    
+    async def generate_answer(
+        self, 
+        question: str, 
+        chunks: List[str], 
+        models: ModelDependencies,
+        max_length: int = 500,
+        metadatas: Optional[List[Dict]] = None
+    ) -> Tuple[str, float, Dict]:
+        """Generate answer using Gemini API; also returns prompt size metadata"""
+        
+        prompt, metadata = self.build_prompt(question, chunks, metadatas)
         
         try:
             # Generate response with Gemini
-            response = models.gemini_model.generate_content(
+            response = await models.llm_client.generate(
                 prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=0.3,  # Low temperature for more factual responses
@@ -78,31 +159,43 @@ ANSWER (based only on the context above):"""
             # Safely extract answer
             answer = self._extract_text_from_response(response).strip()
             
-            # Detect hallucination indicators
-            hallucination_indicators = [
-                "typically", "usually", "commonly", "in general", 
-                "most companies", "industry standard", "it is known that",
-                "generally speaking", "as we know"
-            ]
-            
-            confidence = 0.85  # Base confidence for Gemini
-            
-            if any(indicator in answer.lower() for indicator in hallucination_indicators):
-                confidence = 0.5
-                answer = f"[Low confidence - may contain general knowledge] {answer}"
-            
-            # Check if answer admits not finding info
-            if any(phrase in answer.lower() for phrase in ["cannot find", "not in the document", "don't have"]):
-                confidence = 0.3
-            
-            return answer, confidence
+            return (*self._score_answer(answer), metadata)
             
+        except LLMOverloadedError:
+            # Let the route turn this into a 503 so clients back off
+            raise
         except Exception as e:
             print(f"Gemini API error: {str(e)}")
             # Fallback response
-            return f"Error generating answer: {str(e)}", 0.0
+            return f"Error generating answer: {str(e)}", 0.0, metadata
+    
+    async def stream_answer(
+        self,
+        question: str,
+        chunks: List[str],
+        models: ModelDependencies,
+        max_length: int = 500,
+        prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Yield answer text as Gemini produces it (pass a prompt from build_prompt to reuse it)"""
+        
+        if prompt is None:
+            prompt, _ = self.build_prompt(question, chunks)
+        
+        async for chunk in models.llm_client.stream(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.3,
+                top_p=0.8,
+                top_k=40,
+                max_output_tokens=max_length,
+            )
+        ):
+            text = self._extract_text_from_response(chunk)
+            if text:
+                yield text
     
-    def generate_summary(self, text: str, models: ModelDependencies) -> str:
+    async def generate_summary(self, text: str, models: ModelDependencies) -> str:
         """Generate summary using Gemini"""
         
         prompt = f"""Summarize the key financial information from this document in 3-4 sentences.
@@ -113,7 +206,7 @@ Document excerpt:
 Summary:"""
         
         try:
-            response = models.gemini_model.generate_content(
+            response = await models.llm_client.generate(
                 prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=0.3,
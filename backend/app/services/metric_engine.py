@@ -0,0 +1,167 @@
+"""
+Metric engine - Single-pass financial metric and keyword extraction with precompiled patterns
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# (metric, phrase) in priority order: an earlier phrase wins over a later one, like the
+# original one-pattern-at-a-time search
+METRIC_PHRASES = [
+    ("revenue", r"(?:total\s+)?revenues?"),
+    ("revenue", r"net\s+(?:sales|revenues?)"),
+    ("net_income", r"net\s+income"),
+    ("net_income", r"net\s+(?:profit|earnings?)"),
+    ("eps", r"earnings?\s+per\s+share"),
+    ("eps", r"eps"),
+    ("growth_rate", r"(?:revenue\s+)?growth(?:\s+rate)?"),
+    ("debt_to_equity", r"debt[\s-]+to[\s-]+equity(?:\s+ratio)?"),
+]
+# Unit alternatives per metric; growth only counts when stated as a percentage
+METRIC_UNITS = {
+    "revenue": r"million|billion|m|b",
+    "net_income": r"million|billion|m|b",
+    "growth_rate": r"%|percent",
+}
+UNIT_REQUIRED = {"growth_rate"}
+METRIC_NAMES = list(dict.fromkeys(metric for metric, _ in METRIC_PHRASES))
+
+KEYWORDS = {
+    "risk": ["risk", "challenge", "threat", "uncertainty", "volatility"],
+    "opportunity": ["opportunity", "growth", "expansion", "innovation", "strategic"],
+}
+
+# Every phrase starts with one of these words, so a match can only begin where one occurs
+PHRASE_STARTS = ("total", "revenue", "net", "earning", "eps", "growth", "debt")
+
+def _compile_metric_pattern(flags: int = 0) -> re.Pattern:
+    """One alternation of every phrase; the lookahead lets overlapping phrases all match"""
+    alternatives = []
+    for rank, (metric, phrase) in enumerate(METRIC_PHRASES):
+        unit = ""
+        if metric in METRIC_UNITS:
+            optional = "" if metric in UNIT_REQUIRED else "?"
+            # The boundary check sits inside the optional group: "12mn" falls back to the bare number
+            unit = r"\s*(?:(?P<u{0}>{1})(?!\w)){2}".format(rank, METRIC_UNITS[metric], optional)
+        alternatives.append(
+            r"{1}\s+(?:of\s+)?\$?(?P<v{0}>[\d,]+\.?\d*){2}".format(rank, phrase, unit)
+        )
+    return re.compile(r"(?=" + "|".join(alternatives) + ")", flags)
+
+# Matched against lowercased text; IGNORECASE matching is several times slower in CPython
+METRIC_PATTERN = _compile_metric_pattern()
+METRIC_PATTERN_ANY_CASE = _compile_metric_pattern(re.IGNORECASE)
+KEYWORD_PATTERN = re.compile(
+    "|".join(re.escape(keyword) for keywords in KEYWORDS.values() for keyword in keywords)
+)
+KEYWORD_KIND = {keyword: kind for kind, keywords in KEYWORDS.items() for keyword in keywords}
+
+class MetricMatch(NamedTuple):
+    metric: str
+    value: str
+    unit: Optional[str]
+    rank: int
+    offset: int
+    page: Optional[int]
+
+class KeywordMatch(NamedTuple):
+    kind: str
+    keyword: str
+    offset: int
+    page: Optional[int]
+
+def _anchored_matches(lowered: str) -> List[re.Match]:
+    """Try the combined pattern only where a phrase can start, found with C-speed substring search"""
+    matches = {}
+    for word in PHRASE_STARTS:
+        position = lowered.find(word)
+        while position != -1:
+            if position not in matches:
+                match = METRIC_PATTERN.match(lowered, position)
+                if match:
+                    matches[position] = match
+            position = lowered.find(word, position + 1)
+    return [matches[position] for position in sorted(matches)]
+
+def find_metrics(text: str, page: Optional[int] = None) -> List[MetricMatch]:
+    """Every metric mention in text, in order of position"""
+    return _find_metrics(text, text.lower(), page)
+
+def _find_metrics(text: str, lowered: str, page: Optional[int]) -> List[MetricMatch]:
+    if len(lowered) == len(text):
+        candidates = _anchored_matches(lowered)
+    else:
+        # A few characters change length when lowercased, which would shift offsets
+        candidates = METRIC_PATTERN_ANY_CASE.finditer(text)
+
+    matches = []
+    for match in candidates:
+        # The last group to match is the value or unit of the phrase that fired, e.g. "v3"/"u3"
+        rank = int(match.lastgroup[1:])
+        metric = METRIC_PHRASES[rank][0]
+        unit = match.group(f"u{rank}") if metric in METRIC_UNITS else None
+        matches.append(MetricMatch(
+            metric, match.group(f"v{rank}"), unit.lower() if unit else None,
+            rank, match.start(), page
+        ))
+    return matches
+
+def find_keywords(text: str, page: Optional[int] = None) -> List[KeywordMatch]:
+    """Every risk/opportunity keyword in lowercased text, in order of position"""
+    return [
+        KeywordMatch(KEYWORD_KIND[match.group(0)], match.group(0), match.start(), page)
+        for match in KEYWORD_PATTERN.finditer(text)
+    ]
+
+def count_keywords(lowered: str) -> Dict[str, int]:
+    """Risk/opportunity keyword mentions in lowercased text"""
+    counts = {kind: 0 for kind in KEYWORDS}
+    for match in KEYWORD_PATTERN.finditer(lowered):
+        counts[KEYWORD_KIND[match.group(0)]] += 1
+    return counts
+
+def scan_pages(pages: List[Dict]) -> Tuple[List[MetricMatch], Dict[str, int]]:
+    """Metric matches and keyword counts for a group of {"page", "text"} dicts
+    (runs in a worker process); each page is lowercased once for both"""
+    matches = []
+    counts = {kind: 0 for kind in KEYWORDS}
+    for page in pages:
+        lowered = page["text"].lower()
+        matches.extend(_find_metrics(page["text"], lowered, page.get("page")))
+        for kind, count in count_keywords(lowered).items():
+            counts[kind] += count
+    return matches, counts
+
+def best_metrics(matches: Iterable[MetricMatch]) -> Dict[str, MetricMatch]:
+    """Pick each metric's best candidate: highest-priority phrase, then earliest page and offset"""
+    best = {}
+    for match in matches:
+        key = (match.rank, match.page or 0, match.offset)
+        current = best.get(match.metric)
+        if current is None or key < (current.rank, current.page or 0, current.offset):
+            best[match.metric] = match
+    return best
+
+def keyword_sentences(chunks: Iterable[str], limit: int = 5, min_length: int = 20) -> Dict[str, List[str]]:
+    """First sentences (split on '.') mentioning each keyword kind, scanning each chunk once"""
+    found = {kind: [] for kind in KEYWORDS}
+    for chunk in chunks:
+        lowered = chunk.lower()
+        if len(lowered) != len(chunk):
+            chunk = lowered  # keep offsets aligned with the text being sliced
+        seen = set()
+        for match in find_keywords(lowered):
+            sentences = found[match.kind]
+            if len(sentences) >= limit:
+                continue
+            start = chunk.rfind('.', 0, match.offset) + 1
+            if (match.kind, start) in seen:
+                continue
+            seen.add((match.kind, start))
+            end = chunk.find('.', match.offset)
+            sentence = chunk[start:end if end != -1 else len(chunk)].strip()
+            if len(sentence) > min_length:
+                sentences.append(sentence[:150])
+        if all(len(sentences) >= limit for sentences in found.values()):
+            break
+    return found
@@ -0,0 +1,150 @@
+"""
+Metrics service - Normalized per-document metric records and vectorized comparison
+"""
+
+import warnings
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services import metric_engine
+from app.services.metric_engine import MetricMatch
+
+UNIT_MULTIPLIERS = {
+    "million": 1e6, "m": 1e6,
+    "billion": 1e9, "b": 1e9,
+    "%": 0.01, "percent": 0.01,
+}
+
+# Numeric fields of a metric record, in comparison-vector order
+METRIC_FIELDS = ["revenue", "net_income", "profit_margin", "eps", "growth_rate", "debt_to_equity", "risk_score"]
+MONEY_FIELDS = {"revenue", "net_income"}
+PERCENT_FIELDS = {"profit_margin", "growth_rate"}
+
+def parse_number(raw: str, unit: Optional[str] = None) -> Optional[float]:
+    """'1,234.5' with unit 'million' -> 1234500000.0; percentages become fractions"""
+    try:
+        value = float(raw.replace(",", "").rstrip("."))
+    except (AttributeError, ValueError):
+        return None
+    return value * UNIT_MULTIPLIERS.get(unit, 1.0)
+
+def format_metric(name: str, value: Optional[float]) -> str:
+    """Human-readable metric value"""
+    if value is None or np.isnan(value):
+        return "Not found"
+    if name in MONEY_FIELDS:
+        for threshold, suffix in ((1e9, "B"), (1e6, "M")):
+            if abs(value) >= threshold:
+                return f"${value / threshold:,.2f}{suffix}"
+        return f"${value:,.2f}"
+    if name in PERCENT_FIELDS:
+        return f"{value * 100:.1f}%"
+    if name == "eps":
+        return f"${value:.2f}"
+    return f"{value:.2f}"
+
+class MetricsService:
+    """Build metric records at ingest and compare them across documents"""
+
+    def build_record(self, matches: Iterable[MetricMatch], keyword_counts: Dict[str, int]) -> Dict:
+        """Normalized metric record for one document, from all of its engine matches"""
+        best = metric_engine.best_metrics(matches)
+        record = {}
+        for name in metric_engine.METRIC_NAMES:
+            match = best.get(name)
+            value = parse_number(match.value, match.unit) if match else None
+            record[name] = None if value is None else {
+                "value": value, "raw": match.value, "unit": match.unit, "page": match.page
+            }
+
+        revenue = (record.get("revenue") or {}).get("value")
+        income = (record.get("net_income") or {}).get("value")
+        record["profit_margin"] = {"value": income / revenue} if revenue and income is not None else None
+
+        risk = keyword_counts.get("risk", 0)
+        opportunity = keyword_counts.get("opportunity", 0)
+        record["risk_score"] = round(risk / (risk + opportunity), 4) if risk + opportunity else 0.5
+        record["keyword_mentions"] = {"risk": risk, "opportunity": opportunity}
+        return record
+
+    def value(self, record: Optional[Dict], name: str) -> float:
+        """A record's numeric value for one field (NaN when missing)"""
+        if not record:
+            return np.nan
+        entry = record.get(name)
+        if isinstance(entry, dict):
+            entry = entry.get("value")
+        return np.nan if entry is None else float(entry)
+
+    def describe(self, record: Dict, name: str) -> Dict:
+        """One field of a record with its display string"""
+        value = self.value(record, name)
+        entry = record.get(name) if isinstance(record.get(name), dict) else {}
+        return {
+            **entry,
+            "value": None if np.isnan(value) else value,
+            "display": format_metric(name, value)
+        }
+
+    def matrix(self, records: List[Optional[Dict]], fields: List[str]) -> np.ndarray:
+        """Documents x fields array of metric values"""
+        return np.array(
+            [[self.value(record, name) for name in fields] for record in records],
+            dtype=float
+        ).reshape(len(records), len(fields))
+
+    def compare(self, docs: List[Dict], fields: List[str]) -> Tuple[Dict, Dict, List[str]]:
+        """Per-document values with ranks and distance from the peer median, plus column statistics and insights"""
+        values = self.matrix([doc.get("metrics") for doc in docs], fields)
+        present = ~np.isnan(values)
+        counts = present.sum(axis=0)
+
+        with warnings.catch_warnings():
+            # All-missing columns produce NaN statistics, which is what we report
+            warnings.simplefilter("ignore", RuntimeWarning)
+            medians = np.nanmedian(values, axis=0)
+            means = np.nanmean(values, axis=0)
+            minimums = np.nanmin(values, axis=0)
+            maximums = np.nanmax(values, axis=0)
+            relative = np.where(present & (medians != 0), values / medians - 1, np.nan)
+
+        # Rank 1 = largest value; missing values sort last and get no rank
+        order = np.argsort(np.where(present, -values, np.inf), axis=0, kind="stable")
+        ranks = np.argsort(order, axis=0) + 1
+
+        comparison = {}
+        for i, doc in enumerate(docs):
+            entries = {}
+            for j, name in enumerate(fields):
+                missing = not present[i, j]
+                entries[name] = {
+                    "value": None if missing else float(values[i, j]),
+                    "display": format_metric(name, values[i, j]),
+                    "rank": None if missing else int(ranks[i, j]),
+                    "vs_median": None if np.isnan(relative[i, j]) else round(float(relative[i, j]), 4),
+                }
+            comparison[doc["id"]] = {"filename": doc["filename"], "metrics": entries}
+
+        statistics = {}
+        insights = []
+        for j, name in enumerate(fields):
+            if not counts[j]:
+                statistics[name] = {"documents": 0}
+                insights.append(f"No document reports {name.replace('_', ' ')}")
+                continue
+            statistics[name] = {
+                "documents": int(counts[j]),
+                "median": float(medians[j]),
+                "mean": float(means[j]),
+                "min": float(minimums[j]),
+                "max": float(maximums[j]),
+            }
+            if counts[j] > 1:
+                top = docs[int(order[0, j])]
+                insights.append(
+                    f"Highest {name.replace('_', ' ')}: {top['filename']} ({format_metric(name, maximums[j])}), "
+                    f"median {format_metric(name, medians[j])} across {int(counts[j])} documents"
+                )
+
+        return comparison, statistics, insights
@@ -3,85 +3,178 @@ PDF processing service - Extract text and metadata
 """
 
 import PyPDF2
-import re
-from typing import List, Dict
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from app.config import settings
+from app.services.chunker import Chunk, StructuredChunker
+from app.services import metric_engine
+from app.services.metric_engine import MetricMatch
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def _iter_page_range(pdf_path: str, start: int, end: int) -> Iterator[Dict]:
+    """Yield pages [start, end) one at a time"""
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for i in range(start, min(end, len(pdf_reader.pages))):
+            yield {"page": i + 1, "text": pdf_reader.pages[i].extract_text() or ""}
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Dict]:
+    """Extract pages [start, end) in a worker process"""
+    return list(_iter_page_range(pdf_path, start, end))
+
+def _extraction_workers() -> int:
+    """Configured extraction pool size, defaulting to one per CPU core"""
+    return settings.PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared process pool for CPU-bound PDF work (created on first use)"""
+    global _process_pool
+    
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: the parent holds torch threads and model weights
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_extraction_workers(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _process_pool
+
+def shutdown_process_pool():
+    """Stop the extraction worker processes"""
+    global _process_pool
+    
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
 
 class PDFService:
     """Handle PDF operations"""
     
-    def extract_text(self, pdf_path: str) -> str:
-        """Extract text from PDF file"""
-        text = ""
+    def count_pages(self, pdf_path: str) -> int:
+        """Number of pages in a PDF file"""
         try:
             with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-            return text
+                return len(PyPDF2.PdfReader(file).pages)
+        except Exception as e:
+            raise Exception(f"Failed to extract text from PDF: {str(e)}")
+    
+    def iter_pages(self, pdf_path: str, parallel: bool = None) -> Iterator[Dict]:
+        """Yield {"page": n, "text": ...} in page order, extracting page ranges across processes for long PDFs"""
+        page_count = self.count_pages(pdf_path)
+        workers = _extraction_workers()
+        if parallel is None:
+            parallel = workers > 1 and page_count >= settings.PDF_PARALLEL_MIN_PAGES
+        
+        try:
+            if not parallel or page_count == 0:
+                yield from _iter_page_range(pdf_path, 0, page_count)
+                return
+            
+            # A few ranges per worker keeps the pool busy when some pages are much denser than others
+            ranges = min(page_count, workers * 4)
+            step = -(-page_count // ranges)
+            starts = iter(range(0, page_count, step))
+            pool = get_process_pool()
+            
+            # Bound the ranges in flight so a streaming consumer never buffers the whole document
+            in_flight = deque()
+            for start in starts:
+                in_flight.append(pool.submit(_extract_page_range, pdf_path, start, start + step))
+                if len(in_flight) >= workers * 2:
+                    break
+            while in_flight:
+                pages = in_flight.popleft().result()
+                next_start = next(starts, None)
+                if next_start is not None:
+                    in_flight.append(pool.submit(_extract_page_range, pdf_path, next_start, next_start + step))
+                yield from pages
         except Exception as e:
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
+    def extract_pages(self, pdf_path: str, parallel: bool = None) -> List[Dict]:
+        """Extract text per page as [{"page": n, "text": ...}]"""
+        return list(self.iter_pages(pdf_path, parallel))
+    
+    def extract_many(self, pdf_paths: List[str]) -> List[Tuple[Optional[List[Dict]], Optional[Exception]]]:
+        """Extract several PDFs concurrently, one whole file per worker process; (pages, error) per path"""
+        if _extraction_workers() > 1 and len(pdf_paths) > 1:
+            pool = get_process_pool()
+            futures = [pool.submit(_extract_page_range, path, 0, sys.maxsize) for path in pdf_paths]
+            extract = lambda i: futures[i].result()
+        else:
+            extract = lambda i: _extract_page_range(pdf_paths[i], 0, sys.maxsize)
+        
+        results = []
+        for i in range(len(pdf_paths)):
+            try:
+                results.append((extract(i), None))
+            except Exception as e:
+                results.append((None, Exception(f"Failed to extract text from PDF: {str(e)}")))
+        return results
+    
+    def join_pages(self, pages: List[Dict]) -> str:
+        """Join per-page text into a single document string in one pass"""
+        return "\n".join(page["text"] for page in pages)
+    
+    def extract_text(self, pdf_path: str) -> str:
+        """Extract text from PDF file"""
+        return self.join_pages(self.extract_pages(pdf_path))
+    
+    def _chunker(self) -> StructuredChunker:
+        """Chunker configured from settings"""
+        return StructuredChunker(settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+    
+    def chunk_pages(self, pages: List[Dict]) -> List[Chunk]:
+        """Split pages into chunks that keep their page numbers and page offsets"""
+        return self._chunker().split_pages(pages)
+    
     def chunk_text(self, text: str) -> List[str]:
         """Split text into chunks"""
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        chunks = text_splitter.split_text(text)
-        return chunks
+        return [chunk.text for chunk in self._chunker().split_pages([{"page": 1, "text": text}])]
     
-    def extract_financial_metrics(self, text: str) -> Dict[str, str]:
-        """Extract financial metrics using regex"""
-        metrics = {
-            "revenue": None,
-            "net_income": None,
-            "profit_margin": None,
-            "eps": None
-        }
-        
-        text_lower = text.lower()
-        
-        # Revenue patterns
-        revenue_patterns = [
-            r"(?:total\s+)?revenue[s]?\s+(?:of\s+)?\$?([\d,]+\.?\d*)\s*(?:million|billion|M|B)?",
-            r"net\s+(?:sales|revenues?)\s+(?:of\s+)?\$?([\d,]+\.?\d*)\s*(?:million|billion|M|B)?"
-        ]
-        
-        for pattern in revenue_patterns:
-            match = re.search(pattern, text_lower, re.IGNORECASE)
-            if match:
-                metrics["revenue"] = match.group(1)
-                break
-        
-        # Net income patterns
-        income_patterns = [
-            r"net\s+income\s+(?:of\s+)?\$?([\d,]+\.?\d*)\s*(?:million|billion|M|B)?",
-            r"net\s+(?:profit|earnings?)\s+(?:of\s+)?\$?([\d,]+\.?\d*)\s*(?:million|billion|M|B)?"
-        ]
-        
-        for pattern in income_patterns:
-            match = re.search(pattern, text_lower, re.IGNORECASE)
-            if match:
-                metrics["net_income"] = match.group(1)
-                break
-        
-        # EPS patterns
-        eps_patterns = [
-            r"earnings?\s+per\s+share\s+(?:of\s+)?\$?([\d,]+\.?\d*)",
-            r"EPS\s+(?:of\s+)?\$?([\d,]+\.?\d*)"
-        ]
-        
-        for pattern in eps_patterns:
-            match = re.search(pattern, text_lower, re.IGNORECASE)
-            if match:
-                metrics["eps"] = match.group(1)
-                break
+    def iter_chunks(self, pages: Iterable[Dict]) -> Iterator[Chunk]:
+        """Chunk pages as they arrive, holding back only a run of short pages"""
+        return self._chunker().iter_chunks(pages)
+    
+    def scan_pages(self, pages: List[Dict]) -> Tuple[List[MetricMatch], Dict[str, int]]:
+        """Metric matches and keyword counts across pages, scanning page groups in worker processes for large documents"""
+        total_chars = sum(len(page["text"]) for page in pages)
+        workers = _extraction_workers()
+        if workers <= 1 or len(pages) < 2 or total_chars < settings.METRIC_PARALLEL_MIN_CHARS:
+            return metric_engine.scan_pages(pages)
         
-        # Calculate profit margin
+        group_size = -(-len(pages) // workers)
+        groups = [pages[i:i + group_size] for i in range(0, len(pages), group_size)]
+        matches = []
+        counts = {kind: 0 for kind in metric_engine.KEYWORDS}
+        for group_matches, group_counts in get_process_pool().map(metric_engine.scan_pages, groups):
+            matches.extend(group_matches)
+            for kind, count in group_counts.items():
+                counts[kind] += count
+        return matches, counts
+    
+    def metrics_from_matches(self, matches: Iterable[MetricMatch]) -> Dict[str, str]:
+        """Best value per metric, plus profit margin when revenue and net income were both found"""
+        best = metric_engine.best_metrics(matches)
+        metrics = {name: best[name].value if name in best else None for name in metric_engine.METRIC_NAMES}
+        metrics["profit_margin"] = None
+        self._calculate_profit_margin(metrics)
+        return metrics
+    
+    def extract_financial_metrics(self, text: str) -> Dict[str, str]:
+        """Extract financial metrics in a single pass over the text"""
+        return self.metrics_from_matches(metric_engine.find_metrics(text))
+    
+    def _calculate_profit_margin(self, metrics: Dict[str, str]):
+        """Fill in profit margin from revenue and net income"""
         if metrics["revenue"] and metrics["net_income"]:
             try:
                 rev = float(metrics["revenue"].replace(",", ""))
@@ -89,44 +182,16 @@ class PDFService:
                 metrics["profit_margin"] = f"{(inc/rev)*100:.2f}%"
             except:
                 pass
-        
-        return metrics
     
-    def extract_summary(self, chunks: List[str], full_text: str) -> Dict:
+    def extract_summary(self, chunks: List[str], full_text: str, metrics: Optional[Dict[str, str]] = None) -> Dict:
         """Extract comprehensive financial summary"""
-        metrics = self.extract_financial_metrics(full_text)
-        
-        # Extract risks
-        risk_keywords = ["risk", "challenge", "threat", "uncertainty", "volatility"]
-        risks = []
-        
-        for chunk in chunks[:20]:
-            chunk_lower = chunk.lower()
-            if any(keyword in chunk_lower for keyword in risk_keywords):
-                sentences = chunk.split('.')
-                for sentence in sentences:
-                    if any(kw in sentence.lower() for kw in risk_keywords) and len(sentence.strip()) > 20:
-                        risks.append(sentence.strip()[:150])
-                        if len(risks) >= 5:
-                            break
-            if len(risks) >= 5:
-                break
-        
-        # Extract opportunities
-        opp_keywords = ["opportunity", "growth", "expansion", "innovation", "strategic"]
-        opportunities = []
+        if metrics is None:
+            metrics = self.extract_financial_metrics(full_text)
         
-        for chunk in chunks[:20]:
-            chunk_lower = chunk.lower()
-            if any(keyword in chunk_lower for keyword in opp_keywords):
-                sentences = chunk.split('.')
-                for sentence in sentences:
-                    if any(kw in sentence.lower() for kw in opp_keywords) and len(sentence.strip()) > 20:
-                        opportunities.append(sentence.strip()[:150])
-                        if len(opportunities) >= 5:
-                            break
-            if len(opportunities) >= 5:
-                break
+        # Risk and opportunity sentences from one keyword scan per chunk
+        sentences = metric_engine.keyword_sentences(chunks[:20])
+        risks = sentences["risk"]
+        opportunities = sentences["opportunity"]
         
         return {
             "revenue": metrics.get("revenue", "Not found"),
@@ -0,0 +1,126 @@
+"""
+Query caches - Question embedding LRU and retrieval-keyed answer cache
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r'\s+', ' ', question).strip().lower().rstrip('?.! ')
+
+class LRUCache:
+    """Thread-safe least-recently-used cache"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+class AnswerCache:
+    """Answers keyed by normalized question, requested documents and retrieved chunks, with TTL and size eviction"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._by_document = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(
+        self,
+        question: str,
+        document_ids: Optional[List[str]],
+        chunk_ids: Iterable[str]
+    ) -> Tuple:
+        """Cache key; retrieved chunk ids make new or changed documents miss naturally"""
+        return (
+            normalize_question(question),
+            tuple(sorted(document_ids)) if document_ids else None,
+            tuple(sorted(chunk_ids))
+        )
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: Any, document_ids: Iterable[str]):
+        """Store a value and index it under every document it depends on"""
+        if self.max_size <= 0:
+            return
+        doc_ids = frozenset(document_ids)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds, doc_ids)
+            for doc_id in doc_ids:
+                self._by_document.setdefault(doc_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_document(self, doc_id: str) -> int:
+        """Drop every entry that used a document; returns the number removed"""
+        with self._lock:
+            keys = self._by_document.pop(doc_id, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_document.clear()
+
+    def _remove(self, key: Tuple):
+        """Remove an entry and its document index references (lock held)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for doc_id in entry[2]:
+            keys = self._by_document.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_document[doc_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
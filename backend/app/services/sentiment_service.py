@@ -2,50 +2,211 @@
 Sentiment analysis service
 """
 
-from typing import List, Dict
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 from app.api.dependencies import ModelDependencies
+from app.config import settings
+from app.utils import telemetry
+
+def summarize_sentiment(chunk_scores: List[Optional[float]], chunk_weights: List[int]) -> Dict:
+    """Length-weighted document sentiment from per-chunk positive scores and token weights"""
+    scored = [(s, w) for s, w in zip(chunk_scores, chunk_weights) if s is not None and w]
+    total_weight = sum(w for _, w in scored)
+
+    if total_weight:
+        positive_pct = sum(w for s, w in scored if s >= 0.5) / total_weight * 100
+        negative_pct = 100 - positive_pct
+        avg_score = sum(s * w for s, w in scored) / total_weight
+    else:
+        positive_pct = negative_pct = 0.0
+        avg_score = 0.5
+    neutral_pct = 100 - positive_pct - negative_pct
+
+    # Determine overall sentiment
+    if positive_pct > 50:
+        overall = "positive"
+    elif negative_pct > 30:
+        overall = "negative"
+    else:
+        overall = "neutral"
+
+    return {
+        "overall": overall,
+        "score": avg_score,
+        "breakdown": {
+            "positive": round(positive_pct, 1),
+            "neutral": round(neutral_pct, 1),
+            "negative": round(negative_pct, 1)
+        },
+        "coverage": round(len(scored) / len(chunk_scores), 4) if chunk_scores else 0.0
+    }
+
+def chunk_sentiment(chunk_scores: List[Optional[float]], chunk_weights: List[int]) -> List[Tuple[Optional[float], int]]:
+    """(score, weight) per chunk, stored next to the chunk ids so an update can reuse them"""
+    return [(round(s, 3) if s is not None else None, w) for s, w in zip(chunk_scores, chunk_weights)]
+
+class SentimentAccumulator:
+    """Scores a document's chunks as they arrive: tokenize once, split long chunks into
+    model-sized windows, sort windows into length buckets and run fixed-size micro-batches"""
+
+    def __init__(
+        self,
+        analyzer,
+        batch_size: int = 32,
+        max_tokens: int = 512,
+        time_budget: float = 0.0,
+        window_batches: int = 8
+    ):
+        self.analyzer = analyzer
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.flush_size = batch_size * window_batches
+        self.tokenizer = getattr(analyzer, "tokenizer", None)
+        self.model = getattr(analyzer, "model", None)
+        if self.tokenizer is not None:
+            model_max = getattr(self.tokenizer, "model_max_length", max_tokens) or max_tokens
+            self.max_tokens = min(max_tokens, model_max)
+        else:
+            self.max_tokens = max_tokens
+
+        self.chunk_scores: List[Optional[float]] = []
+        self.chunk_weights: List[int] = []
+        self._pending: List[str] = []
+        self.seconds_spent = 0.0
+        self.out_of_budget = False
+
+    def add(self, chunks: Iterable[str]):
+        """Queue chunks in document order, scoring whenever a full window is buffered"""
+        for chunk in chunks:
+            self._pending.append(chunk)
+            if len(self._pending) >= self.flush_size:
+                self._flush()
+
+    @telemetry.traced("sentiment")
+    def _flush(self):
+        chunks, self._pending = self._pending, []
+        if not chunks:
+            return
+        if self.time_budget and self.seconds_spent >= self.time_budget:
+            self.out_of_budget = True
+
+        if self.out_of_budget:
+            # Past the budget: keep positions aligned with chunk ids but leave them unscored
+            self.chunk_scores.extend([None] * len(chunks))
+            self.chunk_weights.extend([0] * len(chunks))
+            return
+
+        started = time.perf_counter()
+        scores, weights = self.score(chunks)
+        self.seconds_spent += time.perf_counter() - started
+        self.chunk_scores.extend(scores)
+        self.chunk_weights.extend(weights)
+
+    def score(self, chunks: List[str]):
+        """Positive score and weight per chunk, with the best path the analyzer supports"""
+        score_chunks = getattr(self.analyzer, "score_chunks", None)
+        if score_chunks is not None:
+            # Models live in the inference sidecar, which windows the chunks the same way
+            return score_chunks(chunks, self.batch_size, self.max_tokens)
+        if self.tokenizer is None or self.model is None:
+            return self._score_with_pipeline(chunks)
+        return self._score_with_model(chunks)
+
+    def _score_with_model(self, chunks: List[str]):
+        """Positive-class probability per chunk, averaged over its windows by token count"""
+        import torch
+
+        encoded = self.tokenizer(chunks, add_special_tokens=False, truncation=False)["input_ids"]
+        body = self.max_tokens - self.tokenizer.num_special_tokens_to_add()
+        windows = []  # (chunk position, token ids)
+        for position, ids in enumerate(encoded):
+            for start in range(0, max(len(ids), 1), body):
+                windows.append((position, self.tokenizer.build_inputs_with_special_tokens(ids[start:start + body])))
+
+        # Shortest to longest so each micro-batch pads to a similar length
+        windows.sort(key=lambda w: len(w[1]))
+        positive_index = self._positive_label_index()
+        totals = [0.0] * len(chunks)
+        weights = [0] * len(chunks)
+
+        with torch.no_grad():
+            for start in range(0, len(windows), self.batch_size):
+                batch = windows[start:start + self.batch_size]
+                inputs = self.tokenizer.pad(
+                    {"input_ids": [ids for _, ids in batch]}, return_tensors="pt"
+                )
+                inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
+                logits = self.model(**inputs).logits
+                positive = torch.softmax(logits.float(), dim=-1)[:, positive_index].tolist()
+                for (position, ids), probability in zip(batch, positive):
+                    tokens = len(ids)
+                    totals[position] += probability * tokens
+                    weights[position] += tokens
+
+        scores = [total / weight if weight else 0.5 for total, weight in zip(totals, weights)]
+        return scores, weights
+
+    def _positive_label_index(self) -> int:
+        id2label = getattr(self.model.config, "id2label", None) or {}
+        for index, label in id2label.items():
+            if str(label).upper().startswith("POS"):
+                return int(index)
+        return len(id2label) - 1 if id2label else 1
+
+    def _score_with_pipeline(self, chunks: List[str]):
+        """For analyzers that only expose the pipeline call: length-sorted, truncated micro-batches"""
+        order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]))
+        results = self.analyzer(
+            [chunks[i] for i in order], batch_size=self.batch_size, truncation=True
+        )
+        scores = [0.5] * len(chunks)
+        for i, r in zip(order, results):
+            scores[i] = r['score'] if r['label'] == 'POSITIVE' else 1 - r['score']
+        return scores, [max(len(chunk.split()), 1) for chunk in chunks]
+
+    def scores(self) -> Tuple[List[Optional[float]], List[int]]:
+        """Per-chunk positive scores and weights of every chunk added so far"""
+        self._flush()
+        return self.chunk_scores, self.chunk_weights
+
+    def result(self) -> Tuple[Dict, List[Tuple[Optional[float], int]]]:
+        """Length-weighted document sentiment and the (score, weight) of each chunk"""
+        scores, weights = self.scores()
+        return summarize_sentiment(scores, weights), chunk_sentiment(scores, weights)
 
 class SentimentService:
     """Handle sentiment analysis"""
-    
-    def analyze_batch(self, texts: List[str], models: ModelDependencies) -> Dict:
-        """Analyze sentiment of multiple text chunks"""
-        
-        # Truncate texts for model
-        truncated_texts = [text[:512] for text in texts]
-        
-        # Run sentiment analysis
-        results = models.sentiment_analyzer(truncated_texts)
-        
-        # Aggregate results
-        positive_count = sum(1 for r in results if r['label'] == 'POSITIVE')
-        negative_count = sum(1 for r in results if r['label'] == 'NEGATIVE')
-        total = len(results)
-        
-        positive_pct = (positive_count / total) * 100
-        negative_pct = (negative_count / total) * 100
-        neutral_pct = 100 - positive_pct - negative_pct
-        
-        # Calculate average score
-        avg_score = sum(
-            r['score'] if r['label'] == 'POSITIVE' else (1 - r['score']) 
-            for r in results
-        ) / total
-        
-        # Determine overall sentiment
-        if positive_pct > 50:
-            overall = "positive"
-        elif negative_pct > 30:
-            overall = "negative"
-        else:
-            overall = "neutral"
-        
-        return {
-            "overall": overall,
-            "score": avg_score,
-            "breakdown": {
-                "positive": round(positive_pct, 1),
-                "neutral": round(neutral_pct, 1),
-                "negative": round(negative_pct, 1)
-            }
-        }
\ No newline at end of file
+
+    def accumulator(self, models: ModelDependencies) -> SentimentAccumulator:
+        """Incremental scorer for a document whose chunks arrive in batches"""
+        return SentimentAccumulator(
+            models.sentiment_analyzer,
+            batch_size=settings.SENTIMENT_BATCH_SIZE,
+            max_tokens=settings.SENTIMENT_MAX_TOKENS,
+            time_budget=settings.SENTIMENT_TIME_BUDGET_SECONDS
+        )
+
+    def analyze_batch(self, texts: List[str], models: ModelDependencies) -> Tuple[Dict, List[Tuple[Optional[float], int]]]:
+        """Analyze sentiment of all text chunks, weighted by length; also returns each chunk's (score, weight)"""
+        accumulator = self.accumulator(models)
+        accumulator.add(texts)
+        return accumulator.result()
+
+    def analyze_update(
+        self,
+        texts: List[str],
+        previous: List[Optional[Tuple[float, int]]],
+        models: ModelDependencies
+    ) -> Tuple[Dict, List[Tuple[Optional[float], int]]]:
+        """Sentiment of an updated document, scoring only the chunks without a previous (score, weight)"""
+        missing = [i for i, known in enumerate(previous) if known is None]
+        accumulator = self.accumulator(models)
+        accumulator.add([texts[i] for i in missing])
+        new_scores, new_weights = accumulator.scores()
+
+        scores = [known[0] if known else None for known in previous]
+        weights = [known[1] if known else 0 for known in previous]
+        for i, score, weight in zip(missing, new_scores, new_weights):
+            scores[i] = score
+            weights[i] = weight
+        return summarize_sentiment(scores, weights), chunk_sentiment(scores, weights)
@@ -0,0 +1,520 @@
+"""
+Vector store - Chunk vectors, text and metadata behind one interface (Chroma or memory-mapped NumPy arrays)
+"""
+
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+# Chroma rejects single writes above its max batch size (about 5k records with the SQLite backend)
+VECTOR_WRITE_BATCH = 4096
+
+# NumPy store: rows widened to float32 at a time while scoring
+SCORE_BLOCK_ROWS = 4096
+# Compact a document into one segment past this many segments, or once tombstoned rows and metadata
+# overrides exceed 1/COMPACT_DEAD_RATIO of its rows
+COMPACT_SEGMENTS = 8
+COMPACT_DEAD_RATIO = 4
+# Files of a committed or staged segment, named {doc_id}.{token}{suffix}; anything else (such as another
+# writer's {doc_id}.{token}.json.tmp manifest) is never removed as a segment file
+SEGMENT_SUFFIXES = (".vectors.npy", ".scales.npy", ".text", ".meta.json")
+
+class VectorStore:
+    """Interface for chunk storage; query/get results use Chroma's shape (one list per query embedding)"""
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def delete(self, doc_id: str, ids: List[str]) -> None:
+        """Remove a document's chunks by id (visible once committed)"""
+        raise NotImplementedError
+
+    def update_metadatas(self, doc_id: str, ids: List[str], metadatas: List[Dict]) -> None:
+        """Replace the metadata of stored chunks without touching their vectors (visible once committed)"""
+        raise NotImplementedError
+
+    def commit(self, doc_id: str) -> None:
+        """Make every chunk added, deleted or updated for a document visible to queries"""
+
+    def rollback(self, doc_id: str) -> None:
+        """Drop a document's writes that are not committed yet"""
+
+    def query(self, query_embeddings, n_results: int, document_ids: Optional[List[str]] = None) -> Dict:
+        raise NotImplementedError
+
+    def get(
+        self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0,
+        include_embeddings: bool = False
+    ) -> Dict:
+        """Chunks by id, or a page of every chunk; include_embeddings adds each chunk's (unit) vector"""
+        raise NotImplementedError
+
+    def delete_document(self, doc_id: str, ids: Optional[List[str]] = None) -> None:
+        """Remove every chunk of a document; ids, when known, avoid a metadata-filtered scan"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+class ChromaVectorStore(VectorStore):
+    """Chroma collection (embedded or server); chunks are visible as soon as they are added"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        self.collection.add(
+            ids=ids,
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def delete(self, doc_id: str, ids: List[str]) -> None:
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def update_metadatas(self, doc_id: str, ids: List[str], metadatas: List[Dict]) -> None:
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+
+    def query(self, query_embeddings, n_results: int, document_ids: Optional[List[str]] = None) -> Dict:
+        where_filter = {"doc_id": {"$in": document_ids}} if document_ids else None
+        return self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32).tolist(),
+            n_results=n_results,
+            where=where_filter
+        )
+
+    def get(
+        self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0,
+        include_embeddings: bool = False
+    ) -> Dict:
+        include = ["documents", "metadatas", "embeddings"] if include_embeddings else ["documents", "metadatas"]
+        if ids is not None:
+            return self.collection.get(ids=ids, include=include)
+        return self.collection.get(include=include, limit=limit, offset=offset)
+
+    def delete_document(self, doc_id: str, ids: Optional[List[str]] = None) -> None:
+        if ids is None:
+            # Documents stored before chunk ids were recorded
+            self.collection.delete(where={"doc_id": doc_id})
+            return
+        for start in range(0, len(ids), VECTOR_WRITE_BATCH):
+            self.collection.delete(ids=ids[start:start + VECTOR_WRITE_BATCH])
+
+    def count(self) -> int:
+        return self.collection.count()
+
+class _Segment:
+    """Rows written by one add: vectors and text memory-mapped, ids and metadata in memory. Never modified"""
+
+    def __init__(self, directory: Path, doc_id: str, token: str):
+        prefix = directory / f"{doc_id}.{token}"
+        meta = json.loads(Path(f"{prefix}.meta.json").read_text(encoding="utf-8"))
+        self.token = token
+        self.ids: List[str] = meta["ids"]
+        self.metadatas: List[Dict] = meta["metadatas"]
+        self.offsets = np.asarray(meta["offsets"], dtype=np.int64)
+        self.vectors = np.load(f"{prefix}.vectors.npy", mmap_mode="r")
+        self.scales = np.load(f"{prefix}.scales.npy", mmap_mode="r") if meta["dtype"] == "int8" else None
+        text_path = Path(f"{prefix}.text")
+        self.text = np.memmap(text_path, dtype=np.uint8, mode="r") if text_path.stat().st_size else np.empty(0, np.uint8)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every row against each (unit) query: (queries, rows).
+        Rows are widened to float32 one block at a time; int8 scales apply to the products"""
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            end = start + SCORE_BLOCK_ROWS
+            scores[:, start:end] = queries @ np.asarray(self.vectors[start:end], dtype=np.float32).T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def text_at(self, row: int) -> str:
+        return self.text[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def text_bytes(self, row: int) -> bytes:
+        return self.text[self.offsets[row]:self.offsets[row + 1]].tobytes()
+
+class _Document:
+    """One committed document: its segments minus tombstoned rows, with metadata overrides applied"""
+
+    def __init__(self, manifest: Dict, segments: List[_Segment], signature):
+        self.manifest = manifest
+        self.segments = segments
+        self.signature = signature
+        self.overrides: Dict[str, Dict] = manifest.get("metadatas", {})
+        deleted = manifest.get("deleted", {})
+        self.alive: List[np.ndarray] = []
+        self.rows: Dict[str, tuple] = {}  # live chunk id -> (segment index, row)
+        for index, segment in enumerate(segments):
+            dead = set(deleted.get(segment.token, ()))
+            alive = np.fromiter((chunk_id not in dead for chunk_id in segment.ids), dtype=bool, count=len(segment.ids))
+            self.alive.append(alive)
+            for row in np.flatnonzero(alive):
+                self.rows[segment.ids[row]] = (index, int(row))
+        self.size = len(self.rows)
+
+    def metadata(self, index: int, row: int) -> Dict:
+        segment = self.segments[index]
+        return self.overrides.get(segment.ids[row], segment.metadatas[row])
+
+    def live(self) -> Iterable[tuple]:
+        """(segment index, row) of every live row in write order"""
+        for index, alive in enumerate(self.alive):
+            for row in np.flatnonzero(alive):
+                yield index, int(row)
+
+class NumpyVectorStore(VectorStore):
+    """Per-document float16 or int8 vector segments, memory-mapped and searched with one matrix product per segment.
+
+    Each add writes a segment to disk right away; commit publishes staged segments, deletions (tombstones)
+    and metadata changes by swapping a small manifest, and compacts a document only once it has many
+    segments or dead rows. Other processes' writes are noticed through one directory-level marker file."""
+
+    def __init__(self, directory: str, dtype: str = "float16"):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unknown VECTOR_DTYPE: {dtype}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self._docs: Dict[str, _Document] = {}
+        self._segments: Dict[tuple, _Segment] = {}  # (doc_id, token) -> segment
+        self._doc_ids: Set[str] = set()
+        self._marker = self.directory / ".generation"
+        self._generation = None
+        # Staged until commit: doc_id -> [(segment token, ids)], deleted ids, replaced metadatas
+        self._pending: Dict[str, List] = {}
+        self._deleted: Dict[str, Set[str]] = {}
+        self._updated: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.RLock()
+
+    def _manifest_path(self, doc_id: str) -> Path:
+        return self.directory / f"{doc_id}.json"
+
+    @staticmethod
+    def _signature(path: Path):
+        stat = path.stat()
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _sync(self):
+        """Pick up writes from other processes; costs one stat unless the marker changed"""
+        try:
+            generation = self._signature(self._marker)
+        except FileNotFoundError:
+            generation = None
+        if generation == self._generation:
+            return
+        with self._lock:
+            self._generation = generation
+            # Manifests are {doc_id}.json; segment metadata files have a token in the name
+            self._doc_ids = {path.stem for path in self.directory.glob("*.json") if "." not in path.stem}
+            for doc_id, doc in list(self._docs.items()):
+                try:
+                    changed = self._signature(self._manifest_path(doc_id)) != doc.signature
+                except FileNotFoundError:
+                    changed = True
+                if changed:
+                    # Segments never change; _load prunes the ones the new manifest no longer lists
+                    self._docs.pop(doc_id, None)
+
+    def _touch_marker(self):
+        tmp_path = self.directory / f".generation.{uuid.uuid4().hex[:8]}.tmp"
+        tmp_path.write_text(uuid.uuid4().hex, encoding="utf-8")
+        os.replace(tmp_path, self._marker)
+
+    def _forget(self, doc_id: str, keep: Iterable[str] = ()):
+        """Drop a cached document and its cached segments except those still listed in keep"""
+        self._docs.pop(doc_id, None)
+        keep = set(keep)
+        for key in [key for key in self._segments if key[0] == doc_id and key[1] not in keep]:
+            del self._segments[key]
+
+    def _segment(self, doc_id: str, token: str) -> _Segment:
+        segment = self._segments.get((doc_id, token))
+        if segment is None:
+            segment = self._segments[(doc_id, token)] = _Segment(self.directory, doc_id, token)
+        return segment
+
+    def _load(self, doc_id: str) -> Optional[_Document]:
+        """Committed document (call _sync first); unchanged segments are reused across reloads"""
+        doc = self._docs.get(doc_id)
+        if doc is not None:
+            return doc
+        if doc_id not in self._doc_ids:
+            return None
+        with self._lock:
+            path = self._manifest_path(doc_id)
+            try:
+                signature = self._signature(path)
+                manifest = json.loads(path.read_text(encoding="utf-8"))
+                self._forget(doc_id, keep=manifest["segments"])
+                segments = [self._segment(doc_id, token) for token in manifest["segments"]]
+            except FileNotFoundError:
+                # Replaced or deleted while loading
+                self._doc_ids.discard(doc_id)
+                return None
+            doc = self._docs[doc_id] = _Document(manifest, segments, signature)
+        return doc
+
+    def _quantize(self, vectors: np.ndarray, dtype: str):
+        """Unit-normalize rows, then store as float16 or as int8 with a float32 scale per row"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        if dtype == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def _write_segment(self, doc_id: str, ids: List[str], vectors: np.ndarray, scales, texts: List[bytes], metadatas: List[Dict], dtype: str) -> str:
+        """Write a segment's files (invisible until a manifest lists it)"""
+        token = uuid.uuid4().hex[:8]
+        prefix = self.directory / f"{doc_id}.{token}"
+        offsets = np.concatenate([[0], np.cumsum([len(data) for data in texts])]).tolist()
+        np.save(f"{prefix}.vectors.npy", vectors)
+        if scales is not None:
+            np.save(f"{prefix}.scales.npy", scales)
+        Path(f"{prefix}.text").write_bytes(b"".join(texts))
+        Path(f"{prefix}.meta.json").write_text(json.dumps({
+            "dtype": dtype,
+            "dim": int(vectors.shape[1]),
+            "ids": ids,
+            "metadatas": metadatas,
+            "offsets": offsets,
+        }), encoding="utf-8")
+        return token
+
+    def _dtype_of(self, doc_id: str) -> str:
+        """Segments of a document share one dtype so compaction can copy rows as stored"""
+        doc = self._load(doc_id)
+        return doc.manifest["dtype"] if doc is not None else self.dtype
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        by_doc: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            by_doc.setdefault(metadata["doc_id"], []).append(row)
+        self._sync()
+        for doc_id, rows in by_doc.items():
+            dtype = self._dtype_of(doc_id)
+            vectors, scales = self._quantize(embeddings[rows], dtype)
+            doc_ids = [ids[row] for row in rows]
+            token = self._write_segment(
+                doc_id, doc_ids, vectors, scales,
+                [documents[row].encode("utf-8") for row in rows],
+                [metadatas[row] for row in rows], dtype
+            )
+            with self._lock:
+                self._pending.setdefault(doc_id, []).append((token, doc_ids))
+
+    def delete(self, doc_id: str, ids: List[str]) -> None:
+        with self._lock:
+            self._deleted.setdefault(doc_id, set()).update(ids)
+
+    def update_metadatas(self, doc_id: str, ids: List[str], metadatas: List[Dict]) -> None:
+        with self._lock:
+            self._updated.setdefault(doc_id, {}).update(zip(ids, metadatas))
+
+    def commit(self, doc_id: str) -> None:
+        with self._lock:
+            staged = self._pending.pop(doc_id, [])
+            deleted = self._deleted.pop(doc_id, set())
+            updated = self._updated.pop(doc_id, {})
+            if not (staged or deleted or updated):
+                return
+
+            self._sync()
+            existing = self._load(doc_id)
+            if existing is not None:
+                manifest = json.loads(json.dumps(existing.manifest))
+            else:
+                manifest = {"doc_id": doc_id, "dtype": self.dtype, "segments": [], "deleted": {}, "metadatas": {}}
+            tombstones = manifest.setdefault("deleted", {})
+            overrides = manifest.setdefault("metadatas", {})
+
+            # Deleted ids and ids written again are tombstoned where they currently live
+            added_ids = {chunk_id for _, staged_ids in staged for chunk_id in staged_ids}
+            for chunk_id in deleted | added_ids:
+                overrides.pop(chunk_id, None)
+                location = existing.rows.get(chunk_id) if existing is not None else None
+                if location is not None:
+                    tombstones.setdefault(existing.segments[location[0]].token, []).append(chunk_id)
+            for chunk_id, metadata in updated.items():
+                if chunk_id not in deleted and (chunk_id in added_ids or (existing and chunk_id in existing.rows)):
+                    overrides[chunk_id] = metadata
+            manifest["segments"].extend(token for token, _ in staged)
+
+            rows = sum(len(self._segment(doc_id, token).ids) for token in manifest["segments"])
+            dead = sum(len(chunk_ids) for chunk_ids in tombstones.values())
+            if rows == dead:
+                self.delete_document(doc_id)
+                return
+            if len(manifest["segments"]) > COMPACT_SEGMENTS or (dead + len(overrides)) * COMPACT_DEAD_RATIO > rows:
+                manifest = self._compact(doc_id, manifest)
+            self._publish(doc_id, manifest)
+
+    def _compact(self, doc_id: str, manifest: Dict) -> Dict:
+        """Merge a document's live rows into one segment, copying int8/float16 rows and scales as stored"""
+        doc = _Document(manifest, [self._segment(doc_id, token) for token in manifest["segments"]], None)
+        vectors, scales, texts, ids, metadatas = [], [], [], [], []
+        for index, (segment, alive) in enumerate(zip(doc.segments, doc.alive)):
+            rows = np.flatnonzero(alive)
+            if not len(rows):
+                continue
+            vectors.append(np.asarray(segment.vectors[rows]))
+            if segment.scales is not None:
+                scales.append(np.asarray(segment.scales[rows]))
+            for row in rows:
+                ids.append(segment.ids[row])
+                texts.append(segment.text_bytes(row))
+                metadatas.append(doc.metadata(index, int(row)))
+        token = self._write_segment(
+            doc_id, ids, np.concatenate(vectors), np.concatenate(scales) if scales else None,
+            texts, metadatas, manifest["dtype"]
+        )
+        return {"doc_id": doc_id, "dtype": manifest["dtype"], "segments": [token], "deleted": {}, "metadatas": {}}
+
+    def _publish(self, doc_id: str, manifest: Dict):
+        """Swap the manifest so readers see the old or the new version, never a mix"""
+        tmp_path = self.directory / f"{doc_id}.{uuid.uuid4().hex[:8]}.json.tmp"
+        tmp_path.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp_path, self._manifest_path(doc_id))
+        self._remove_files(doc_id, keep=set(manifest["segments"]))
+        self._forget(doc_id, keep=manifest["segments"])
+        self._doc_ids.add(doc_id)
+        self._touch_marker()
+
+    def rollback(self, doc_id: str) -> None:
+        with self._lock:
+            staged = self._pending.pop(doc_id, [])
+            self._deleted.pop(doc_id, None)
+            self._updated.pop(doc_id, None)
+            for token, _ in staged:
+                for suffix in SEGMENT_SUFFIXES:
+                    (self.directory / f"{doc_id}.{token}{suffix}").unlink(missing_ok=True)
+
+    def _remove_files(self, doc_id: str, keep: Set[str] = frozenset()):
+        """Delete a document's segment files except the listed and staged ones (open maps stay valid)"""
+        keep = set(keep) | {token for token, _ in self._pending.get(doc_id, [])}
+        for path in self.directory.glob(f"{doc_id}.*.*"):
+            token, _, suffix = path.name[len(doc_id) + 1:].partition(".")
+            if f".{suffix}" not in SEGMENT_SUFFIXES or token in keep:
+                continue
+            path.unlink(missing_ok=True)
+
+    def query(self, query_embeddings, n_results: int, document_ids: Optional[List[str]] = None) -> Dict:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        self._sync()
+        doc_ids = document_ids if document_ids else sorted(self._doc_ids)
+        docs = [doc for doc in (self._load(doc_id) for doc_id in doc_ids) if doc is not None]
+        parts = [(doc, index) for doc in docs for index in range(len(doc.segments))]
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        live = sum(doc.size for doc in docs)
+        if not live or n_results <= 0:
+            for _ in queries:
+                for key in results:
+                    results[key].append([])
+            return results
+
+        blocks = []
+        for doc, index in parts:
+            block = doc.segments[index].scores(queries)
+            if not doc.alive[index].all():
+                block[:, ~doc.alive[index]] = -np.inf
+            blocks.append(block)
+        scores = blocks[0] if len(blocks) == 1 else np.hstack(blocks)
+        # Column c of the combined matrix belongs to parts[owner[c]] at row c - starts[owner[c]]
+        starts = np.cumsum([0] + [len(doc.segments[index].ids) for doc, index in parts])
+        k = min(n_results, live)
+        for query_scores in scores:
+            top = np.argpartition(-query_scores, k - 1)[:k] if k < len(query_scores) else np.arange(len(query_scores))
+            top = top[np.argsort(-query_scores[top])]
+            owners = np.searchsorted(starts, top, side="right") - 1
+            ids, documents, metadatas = [], [], []
+            for position, owner in zip(top, owners):
+                doc, index = parts[owner]
+                row = int(position - starts[owner])
+                ids.append(doc.segments[index].ids[row])
+                documents.append(doc.segments[index].text_at(row))
+                metadatas.append(doc.metadata(index, row))
+            results["ids"].append(ids)
+            results["documents"].append(documents)
+            results["metadatas"].append(metadatas)
+            results["distances"].append((1 - query_scores[top]).tolist())
+        return results
+
+    def get(
+        self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0,
+        include_embeddings: bool = False
+    ) -> Dict:
+        found = {"ids": [], "documents": [], "metadatas": []}
+        if include_embeddings:
+            found["embeddings"] = []
+        self._sync()
+        if ids is None:
+            rows = ((doc, index, row) for doc in self._iter_docs() for index, row in doc.live())
+            end = offset + limit if limit is not None else None
+            for position, (doc, index, row) in enumerate(rows):
+                if end is not None and position >= end:
+                    break
+                if position >= offset:
+                    self._append(found, doc, index, row)
+            return found
+
+        wanted = set(ids)
+        for doc in self._iter_docs(loaded_first=True):
+            for chunk_id in [chunk_id for chunk_id in wanted if chunk_id in doc.rows]:
+                self._append(found, doc, *doc.rows[chunk_id])
+                wanted.discard(chunk_id)
+            if not wanted:
+                break
+        return found
+
+    def _iter_docs(self, loaded_first: bool = False) -> Iterable[_Document]:
+        doc_ids = sorted(self._doc_ids)
+        if loaded_first:
+            # Ids asked for usually belong to documents a query just touched
+            doc_ids.sort(key=lambda doc_id: doc_id not in self._docs)
+        for doc_id in doc_ids:
+            doc = self._load(doc_id)
+            if doc is not None:
+                yield doc
+
+    def _append(self, found: Dict, doc: _Document, index: int, row: int):
+        found["ids"].append(doc.segments[index].ids[row])
+        found["documents"].append(doc.segments[index].text_at(row))
+        found["metadatas"].append(doc.metadata(index, row))
+        if "embeddings" in found:
+            segment = doc.segments[index]
+            vector = np.asarray(segment.vectors[row], dtype=np.float32)
+            found["embeddings"].append(vector * segment.scales[row] if segment.scales is not None else vector)
+
+    def delete_document(self, doc_id: str, ids: Optional[List[str]] = None) -> None:
+        with self._lock:
+            self.rollback(doc_id)
+            self._manifest_path(doc_id).unlink(missing_ok=True)
+            self._remove_files(doc_id)
+            self._forget(doc_id)
+            self._doc_ids.discard(doc_id)
+            self._touch_marker()
+
+    def count(self) -> int:
+        self._sync()
+        return sum(doc.size for doc in self._iter_docs())
+
+def create_vector_store(backend: str, directory: str, dtype: str = "float16", collection_factory=None) -> VectorStore:
+    """Build the configured vector store ("chroma" or "numpy")"""
+    if backend == "chroma":
+        return ChromaVectorStore(collection_factory())
+    if backend == "numpy":
+        return NumpyVectorStore(directory, dtype)
+    raise ValueError(f"Unknown VECTOR_STORE backend: {backend}")
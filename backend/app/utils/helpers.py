@@ -2,8 +2,12 @@
 Helper utility functions
 """
 
-from typing import List
+from datetime import datetime
+from typing import Iterable, Iterator, List
+import queue
 import re
+import threading
+import uuid
 
 def clean_text(text: str) -> str:
     """Clean and normalize text"""
@@ -32,3 +36,67 @@ def truncate_text(text: str, max_length: int = 150) -> str:
         return text
     return text[:max_length].rsplit(' ', 1)[0] + '...'
 
+def new_document_id() -> str:
+    """Timestamped document id with a random suffix, so uploads in the same second never collide"""
+    return f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class _PrefetchError:
+    """Carries a producer exception across the prefetch queue"""
+    def __init__(self, error: BaseException):
+        self.error = error
+
+_PREFETCH_END = object()
+
+def prefetch(items: Iterable, depth: int = 2) -> Iterator:
+    """Consume an iterable in a background thread, buffering at most depth items ahead"""
+    buffer = queue.Queue(maxsize=max(depth, 1))
+    stopped = threading.Event()
+    
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_PREFETCH_END)
+        except BaseException as e:
+            put(_PrefetchError(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+    
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    
+    try:
+        while True:
+            item = buffer.get()
+            if item is _PREFETCH_END:
+                return
+            if isinstance(item, _PrefetchError):
+                raise item.error
+            yield item
+    finally:
+        # Unblock the producer if the consumer stops early
+        stopped.set()
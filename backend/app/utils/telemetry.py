@@ -0,0 +1,295 @@
+"""
+Telemetry - In-process Prometheus-style metrics and per-request span traces
+"""
+
+import contextvars
+import functools
+import inspect
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond cache lookups up to multi-minute ingests
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A named metric family with fixed label names; values can also come from a callback at scrape time"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+        self._function: Optional[Callable] = None
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def set_function(self, function: Callable):
+        """Read values from function() when scraped: a number, or {label values tuple: number}"""
+        self._function = function
+
+    def _current(self) -> Dict[Tuple, float]:
+        if self._function is None:
+            with self._lock:
+                return dict(self._values)
+        try:
+            value = self._function()
+        except Exception:
+            return {}
+        return value if isinstance(value, dict) else {(): value}
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._current().items())
+        ]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple, List] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = []
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+class Registry:
+    """Collection of metric families rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "finsight_stage_duration_seconds", "Time spent in an instrumented stage", ["stage"]
+))
+INGEST_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "finsight_ingest_stage_duration_seconds", "Wall time of an ingestion job stage", ["stage", "status"]
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "finsight_http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "finsight_llm_tokens_total", "Tokens sent to and received from the LLM", ["kind"]
+))
+ERRORS = REGISTRY.register(Counter(
+    "finsight_errors_total", "Errors by stage", ["stage"]
+))
+CACHE_HITS = REGISTRY.register(Counter(
+    "finsight_cache_hits_total", "Cache lookups that found an entry", ["cache"]
+))
+CACHE_MISSES = REGISTRY.register(Counter(
+    "finsight_cache_misses_total", "Cache lookups that found nothing", ["cache"]
+))
+DOCUMENTS = REGISTRY.register(Gauge(
+    "finsight_documents", "Documents in the document store"
+))
+MEMORY_STORE_ENTRIES = REGISTRY.register(Gauge(
+    "finsight_memory_store_entries", "Entries held in in-memory stores and caches", ["store"]
+))
+EMBEDDING_BATCH_TEXTS = REGISTRY.register(Histogram(
+    "finsight_embedding_batch_texts", "Texts per embedding model call made by the batcher",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+))
+
+class Trace:
+    """Spans recorded while handling one request"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []  # (name, offset ms, duration ms)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, started: float, seconds: float):
+        with self._lock:
+            self.spans.append((name, (started - self.started) * 1000, seconds * 1000))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: total time and count per span name, plus the whole request"""
+        totals = {}
+        with self._lock:
+            for name, _, duration in self.spans:
+                total, count = totals.get(name, (0.0, 0))
+                totals[name] = (total + duration, count + 1)
+        entries = [f'{name};dur={total:.2f};desc="x{count}"' for name, (total, count) in totals.items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(entries)
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+
+def start_trace() -> Tuple[Trace, contextvars.Token]:
+    """Begin a trace for the current request; spans in this context (and threads started with
+    asyncio.to_thread) are attached to it"""
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+def end_trace(token: contextvars.Token):
+    _current_trace.reset(token)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def record(stage: str, started: float, seconds: float):
+    """Observe a finished span in the stage histogram and the current trace"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, started, seconds)
+
+@contextmanager
+def span(stage: str):
+    """Time a block as one span of a stage, counting exceptions as errors of that stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage=stage)
+        raise
+    finally:
+        record(stage, started, time.perf_counter() - started)
+
+def traced(stage: str) -> Callable:
+    """Decorator timing each call as a span; generators are timed while producing items only"""
+    def decorate(function: Callable) -> Callable:
+        if inspect.isasyncgenfunction(function):
+            @functools.wraps(function)
+            async def async_generator_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    async for item in function(*args, **kwargs):
+                        yield item
+                except Exception:
+                    ERRORS.inc(stage=stage)
+                    raise
+                finally:
+                    record(stage, started, time.perf_counter() - started)
+            return async_generator_wrapper
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def coroutine_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await function(*args, **kwargs)
+            return coroutine_wrapper
+
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                busy = 0.0
+                iterator = function(*args, **kwargs)
+                try:
+                    while True:
+                        step = time.perf_counter()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                        finally:
+                            busy += time.perf_counter() - step
+                        yield item
+                except Exception:
+                    ERRORS.inc(stage=stage)
+                    raise
+                finally:
+                    iterator.close()
+                    record(stage, started, busy)
+            return generator_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+def instrument(target, **stages: str):
+    """Wrap the named methods of an instance or class as spans of the given stages, e.g.
+    instrument(PDFService(), chunk_text="chunk"); returns target"""
+    for attribute, stage in stages.items():
+        original = inspect.getattr_static(target, attribute)
+        if getattr(original, "__traced__", False):
+            continue
+        wrapped = traced(stage)(getattr(target, attribute) if not inspect.isclass(target) else original)
+        wrapped.__traced__ = True
+        setattr(target, attribute, wrapped)
+    return target
@@ -0,0 +1,118 @@
+"""
+Inference backend benchmark - Throughput and output agreement against the PyTorch models
+Run from backend/: python -m benchmarks.inference_benchmark --backends onnx int8
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import settings
+from app.services.inference_backends import (
+    INFERENCE_BACKENDS, load_embedding_model, load_sentiment_pipeline
+)
+
+SAMPLE_SENTENCES = [
+    "Total revenue increased {pct}% year over year to ${amount} million.",
+    "Operating expenses rose to ${amount} million, driven by higher headcount.",
+    "Net income declined {pct}% due to restructuring charges and impairments.",
+    "Gross margin improved to {pct}% on favorable product mix.",
+    "The company repurchased ${amount} million of common stock during the quarter.",
+    "Cash and cash equivalents were ${amount} million at the end of the period.",
+    "We expect continued headwinds from foreign exchange and supply constraints.",
+    "Management remains confident in the long-term growth outlook.",
+]
+
+def sample_texts(count: int, sentences_per_text: int = 8, seed: int = 0) -> List[str]:
+    """Synthetic report-like chunks of roughly CHUNK_TOKENS tokens"""
+    rng = random.Random(seed)
+    return [
+        " ".join(
+            rng.choice(SAMPLE_SENTENCES).format(pct=rng.randint(1, 40), amount=rng.randint(10, 9000))
+            for _ in range(sentences_per_text)
+        )
+        for _ in range(count)
+    ]
+
+def _timed(fn, repeats: int):
+    """Best wall time over repeats, after one warm-up call"""
+    result = fn()
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+def benchmark_embeddings(texts: List[str], backends: List[str], repeats: int, cache_dir: str) -> Dict:
+    results = {}
+    baseline = None
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        model = load_embedding_model(settings.EMBEDDING_MODEL, backend, cache_dir)
+        vectors, seconds = _timed(
+            lambda: np.asarray(model.encode(texts, batch_size=settings.EMBEDDING_BATCH_SIZE)), repeats
+        )
+        entry = {"texts_per_second": round(len(texts) / seconds, 1), "seconds": round(seconds, 3)}
+        if baseline is None:
+            baseline = vectors
+        else:
+            a = baseline / np.linalg.norm(baseline, axis=1, keepdims=True)
+            b = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            cosine = (a * b).sum(axis=1)
+            entry["cosine_mean"] = round(float(cosine.mean()), 5)
+            entry["cosine_min"] = round(float(cosine.min()), 5)
+            entry["speedup"] = round(results["torch"]["seconds"] / seconds, 2)
+        results[backend] = entry
+    return results
+
+def benchmark_sentiment(texts: List[str], backends: List[str], repeats: int, cache_dir: str) -> Dict:
+    truncated = [text[:512] for text in texts]
+    results = {}
+    baseline = None
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        analyzer = load_sentiment_pipeline(settings.SENTIMENT_MODEL, backend, cache_dir)
+        outputs, seconds = _timed(lambda: analyzer(truncated), repeats)
+        entry = {"texts_per_second": round(len(texts) / seconds, 1), "seconds": round(seconds, 3)}
+        if baseline is None:
+            baseline = outputs
+        else:
+            agree = sum(a["label"] == b["label"] for a, b in zip(baseline, outputs))
+            score_diff = max(abs(a["score"] - b["score"]) for a, b in zip(baseline, outputs))
+            entry["label_agreement"] = round(agree / len(outputs), 4)
+            entry["max_score_diff"] = round(score_diff, 4)
+            entry["speedup"] = round(results["torch"]["seconds"] / seconds, 2)
+        results[backend] = entry
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["onnx", "int8"], choices=INFERENCE_BACKENDS)
+    parser.add_argument("--texts", type=int, default=256, help="number of synthetic chunks")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--cache-dir", default=f"{settings.CACHE_DIR}/onnx")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts)
+    results = {
+        "texts": len(texts),
+        "embedding": benchmark_embeddings(texts, args.backends, args.repeats, args.cache_dir),
+        "sentiment": benchmark_sentiment(texts, args.backends, args.repeats, args.cache_dir),
+    }
+
+    for model in ("embedding", "sentiment"):
+        print(f"\n{model}")
+        for backend, entry in results[model].items():
+            extras = ", ".join(f"{k}={v}" for k, v in entry.items() if k not in ("texts_per_second", "seconds"))
+            print(f"  {backend:6s} {entry['texts_per_second']:8.1f} texts/s  {extras}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
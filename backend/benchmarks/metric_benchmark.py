@@ -0,0 +1,176 @@
+"""
+Metric engine benchmark - Single-pass extraction against the original per-pattern search
+Run from backend/: python -m benchmarks.metric_benchmark --megabytes 4
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Dict, List
+
+from app.config import settings
+from app.services import metric_engine
+from app.services.pdf_service import PDFService, shutdown_process_pool
+
+FILLER = [
+    "The Company operates in a highly competitive environment across several segments.",
+    "Management reviewed the allocation of capital to each business unit during the year.",
+    "Refer to Note 7 for additional information regarding leases and commitments.",
+    "Foreign currency volatility remains a risk to reported results.",
+    "We continue to invest in innovation and strategic expansion into new markets.",
+    "Total revenue of ${amount} million increased compared with the prior year.",
+    "Net income of ${amount} million reflects lower tax expense.",
+    "Diluted earnings per share of ${eps} were reported for the fiscal year.",
+]
+
+# Unit spellings the patterns don't know must still yield the bare number, as the original did
+EDGE_CASES = [
+    "Total revenue of $12mn for the quarter.",
+    "Revenue of $100k from services.",
+    "Net income 5.2bn was reported.",
+    "Net income of $450 million and EPS of $1.25.",
+    "Revenue growth of 12% year over year.",
+]
+
+def legacy_extract_financial_metrics(text: str) -> Dict[str, str]:
+    """The original implementation: lowercase, then one uncompiled search per pattern"""
+    metrics = {"revenue": None, "net_income": None, "profit_margin": None, "eps": None}
+    text_lower = text.lower()
+    groups = {
+        "revenue": [
+            r"(?:total\s+)?revenue[s]?\s+(?:of\s+)?\$?([\d,]+\.?\d*)\s*(?:million|billion|M|B)?",
+            r"net\s+(?:sales|revenues?)\s+(?:of\s+)?\$?([\d,]+\.?\d*)\s*(?:million|billion|M|B)?"
+        ],
+        "net_income": [
+            r"net\s+income\s+(?:of\s+)?\$?([\d,]+\.?\d*)\s*(?:million|billion|M|B)?",
+            r"net\s+(?:profit|earnings?)\s+(?:of\s+)?\$?([\d,]+\.?\d*)\s*(?:million|billion|M|B)?"
+        ],
+        "eps": [
+            r"earnings?\s+per\s+share\s+(?:of\s+)?\$?([\d,]+\.?\d*)",
+            r"EPS\s+(?:of\s+)?\$?([\d,]+\.?\d*)"
+        ],
+    }
+    for metric, patterns in groups.items():
+        for pattern in patterns:
+            match = re.search(pattern, text_lower, re.IGNORECASE)
+            if match:
+                metrics[metric] = match.group(1)
+                break
+    return metrics
+
+def legacy_keyword_sentences(chunks: List[str]) -> Dict[str, List[str]]:
+    """The original risk/opportunity scan: split each chunk on '.' once per keyword list"""
+    found = {}
+    for kind, keywords in metric_engine.KEYWORDS.items():
+        sentences_found = []
+        for chunk in chunks:
+            if any(keyword in chunk.lower() for keyword in keywords):
+                for sentence in chunk.split('.'):
+                    if any(kw in sentence.lower() for kw in keywords) and len(sentence.strip()) > 20:
+                        sentences_found.append(sentence.strip()[:150])
+                        if len(sentences_found) >= 5:
+                            break
+            if len(sentences_found) >= 5:
+                break
+        found[kind] = sentences_found
+    return found
+
+def synthetic_pages(megabytes: float, page_chars: int = 4000, seed: int = 0, metric_rate: float = 0.005) -> List[Dict]:
+    """Report-like pages with metric sentences at metric_rate (0 = none, so every search spans the text)"""
+    rng = random.Random(seed)
+    pages, page, size = [], [], 0
+    target = int(megabytes * 1_000_000)
+    while size < target:
+        # Mostly boilerplate, with an occasional metric sentence
+        sentence = rng.choice(FILLER[5:] if rng.random() < metric_rate else FILLER[:5])
+        sentence = sentence.format(amount=f"{rng.randint(10, 9000):,}", eps=f"{rng.uniform(0.1, 9):.2f}")
+        page.append(sentence)
+        size += len(sentence) + 1
+        if sum(len(s) for s in page) >= page_chars:
+            pages.append({"page": len(pages) + 1, "text": " ".join(page)})
+            page = []
+    if page:
+        pages.append({"page": len(pages) + 1, "text": " ".join(page)})
+    return pages
+
+def _timed(fn, repeats: int):
+    result = fn()
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, round(best * 1000, 2)
+
+def _parallel_scan(pdf_service: PDFService, pages: List[Dict]):
+    """PDFService.scan_pages matches with the size threshold lifted"""
+    threshold = settings.METRIC_PARALLEL_MIN_CHARS
+    settings.METRIC_PARALLEL_MIN_CHARS = 0
+    try:
+        return pdf_service.scan_pages(pages)[0]
+    finally:
+        settings.METRIC_PARALLEL_MIN_CHARS = threshold
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megabytes", type=float, default=4.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    pdf_service = PDFService()
+    results = {}
+    for scenario, metric_rate in (("sparse_metrics", 0.005), ("no_metrics", 0.0)):
+        pages = synthetic_pages(args.megabytes, metric_rate=metric_rate)
+        text = "\n".join(page["text"] for page in pages)
+
+        legacy, legacy_ms = _timed(lambda: legacy_extract_financial_metrics(text), args.repeats)
+        single, single_ms = _timed(lambda: pdf_service.extract_financial_metrics(text), args.repeats)
+        serial, serial_pages_ms = _timed(
+            lambda: pdf_service.metrics_from_matches(metric_engine.scan_pages(pages)[0]), args.repeats
+        )
+        parallel, parallel_pages_ms = _timed(
+            lambda: pdf_service.metrics_from_matches(
+                metric_engine.scan_pages(pages)[0] if len(pages) < 2 else _parallel_scan(pdf_service, pages)
+            ),
+            args.repeats
+        )
+        results[scenario] = {
+            "text_chars": len(text),
+            "pages": len(pages),
+            "legacy_ms": legacy_ms,
+            "single_pass_ms": single_ms,
+            "per_page_serial_ms": serial_pages_ms,
+            "per_page_parallel_ms": parallel_pages_ms,
+            "all_matches": len(metric_engine.find_metrics(text)),
+            "agrees_with_legacy": all(
+                legacy[k] == single[k] == serial[k] == parallel[k] for k in ("revenue", "net_income", "eps")
+            ),
+        }
+
+    results["edge_cases"] = {
+        "agrees_with_legacy": all(
+            legacy_extract_financial_metrics(case)[k] == pdf_service.extract_financial_metrics(case)[k]
+            for case in EDGE_CASES for k in ("revenue", "net_income", "eps")
+        ),
+    }
+
+    chunks = pdf_service.chunk_text("\n".join(p["text"] for p in synthetic_pages(0.2)))[:20]
+    legacy_kw, legacy_kw_ms = _timed(lambda: legacy_keyword_sentences(chunks), args.repeats)
+    engine_kw, engine_kw_ms = _timed(lambda: metric_engine.keyword_sentences(chunks), args.repeats)
+    shutdown_process_pool()
+    results["keywords"] = {
+        "legacy_ms": legacy_kw_ms,
+        "single_pass_ms": engine_kw_ms,
+        "agrees_with_legacy": legacy_kw == engine_kw,
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
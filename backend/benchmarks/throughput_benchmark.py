@@ -0,0 +1,289 @@
+"""
+Ingestion and query throughput benchmark - Drives the FastAPI app in-process with the fake Gemini model
+Run from backend/: python -m benchmarks.throughput_benchmark --documents 4 --pages 50 --queries 200 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PARAGRAPHS = [
+    "Total revenue of ${amount} million increased {pct}% compared with the prior fiscal year.",
+    "Net income of ${amount} million reflects lower tax expense and improved operating leverage.",
+    "Diluted earnings per share of ${eps} were reported for the fiscal year.",
+    "Revenue growth of {pct}% was driven by the {segment} segment and new customer wins.",
+    "The debt to equity ratio of {ratio} remained within our stated target range.",
+    "Foreign currency volatility and supply chain uncertainty remain a risk to reported results.",
+    "We continue to invest in innovation and strategic expansion into {segment} markets.",
+    "Operating expenses rose to ${amount} million, driven by higher headcount in {segment}.",
+    "Management reviewed the allocation of capital to each business unit during the year.",
+    "Refer to Note {note} for additional information regarding leases and commitments.",
+]
+SEGMENTS = ["cloud", "consumer", "enterprise", "healthcare", "industrial", "payments", "retail", "energy"]
+QUESTIONS = [
+    "What was total revenue in the {segment} segment?",
+    "How did net income change this year?",
+    "What are the main risks mentioned for {segment}?",
+    "What was diluted earnings per share?",
+    "What drove revenue growth in {segment}?",
+    "What is the debt to equity ratio?",
+    "How much were operating expenses in {segment}?",
+    "What opportunities does management describe in {segment} markets?",
+]
+
+def synthetic_report(path: str, pages: int, lines_per_page: int = 40, seed: int = 0):
+    """Write a text-based PDF of report-like sentences with figures, risks and opportunities"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(seed)
+    pdf = canvas.Canvas(path, pagesize=letter)
+    for page in range(pages):
+        text = pdf.beginText(40, 750)
+        text.setFont("Helvetica", 9)
+        text.textLine(f"Annual Report {2000 + seed % 25} - Page {page + 1}")
+        for _ in range(lines_per_page):
+            text.textLine(rng.choice(PARAGRAPHS).format(
+                amount=f"{rng.randint(10, 9000):,}", pct=rng.randint(1, 40), eps=f"{rng.uniform(0.1, 9):.2f}",
+                ratio=f"{rng.uniform(0.1, 2.5):.2f}", segment=rng.choice(SEGMENTS), note=rng.randint(1, 20)
+            ))
+        pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+def sample_questions(count: int, distinct: bool, seed: int = 0) -> List[str]:
+    """Questions for the load phase; without distinct, a small set repeats and the answer cache is exercised"""
+    rng = random.Random(seed)
+    pool = [q.format(segment=s) for q in QUESTIONS for s in SEGMENTS]
+    if distinct:
+        return [f"{rng.choice(pool)} (variant {i})" for i in range(count)]
+    return [rng.choice(pool[:8]) for _ in range(count)]
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def percentiles(samples_ms: List[float]) -> Dict:
+    if not samples_ms:
+        return {}
+    values = np.asarray(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "mean_ms": round(float(values.mean()), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+async def ingest(client, pdf_paths: List[str], concurrency: int) -> Dict:
+    """Upload every PDF (at most concurrency in flight) and wait for all jobs to finish"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(path: str) -> Dict:
+        async with semaphore:
+            with open(path, "rb") as f:
+                response = await client.post("/upload", files={"file": (Path(path).name, f.read(), "application/pdf")})
+            response.raise_for_status()
+            job_id = response.json()["job_id"]
+            while True:
+                job = (await client.get(f"/jobs/{job_id}")).json()
+                if job["status"] in ("completed", "failed"):
+                    return job
+                await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    jobs = await asyncio.gather(*(upload(path) for path in pdf_paths))
+    seconds = time.perf_counter() - started
+
+    completed = [job for job in jobs if job["status"] == "completed"]
+    stages = {}
+    for job in completed:
+        for stage in job["stages"]:
+            stages.setdefault(stage["name"], []).append(stage["duration_ms"] or 0.0)
+    return {"jobs": jobs, "completed": completed, "seconds": seconds, "stage_ms": stages}
+
+async def query_load(client, questions: List[str], concurrency: int, top_k: int) -> Dict:
+    """Send every question with at most concurrency requests in flight, recording each latency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, cached = [], 0, 0
+
+    async def ask(question: str):
+        nonlocal errors, cached
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/query", json={"question": question, "top_k": top_k})
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+            elif response.json().get("metadata", {}).get("cached"):
+                cached += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(ask(q) for q in questions))
+    seconds = time.perf_counter() - started
+    return {
+        "queries": len(questions),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "queries_per_second": round(len(questions) / seconds, 2),
+        "errors": errors,
+        "cached": cached,
+        **percentiles(latencies),
+    }
+
+async def run(args, pdf_paths: List[str]) -> Dict:
+    import httpx
+    from app.main import app
+    from app.api.dependencies import get_models
+    from app.services.pdf_service import shutdown_process_pool
+
+    # ASGITransport doesn't run lifespan events, so start the app by hand
+    await app.router.startup()
+    get_models().warm_up(wait_for_all=True)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            ingested = await ingest(client, pdf_paths, args.upload_concurrency)
+            completed = ingested["completed"]
+            pages = args.pages * len(completed)
+            chunks = sum(job["result"]["chunks"] for job in completed)
+            embed_seconds = sum(ingested["stage_ms"].get("embed", [])) / 1000
+            extract_seconds = sum(ingested["stage_ms"].get("extract", [])) / 1000
+
+            questions = sample_questions(args.queries, args.distinct_questions, seed=args.seed)
+            load = await query_load(client, questions, args.concurrency, args.top_k)
+    finally:
+        await app.router.shutdown()
+        shutdown_process_pool()
+
+    return {
+        "ingest": {
+            "documents": len(pdf_paths),
+            "completed": len(completed),
+            "failed": len(pdf_paths) - len(completed),
+            "pages": pages,
+            "chunks": chunks,
+            "seconds": round(ingested["seconds"], 3),
+            "pages_per_second": round(pages / ingested["seconds"], 2),
+            "chunks_per_second": round(chunks / ingested["seconds"], 2),
+            # Per-stage rates sum job stage time, so they are per worker rather than wall-clock
+            "extract_pages_per_second": round(pages / extract_seconds, 2) if extract_seconds else None,
+            "embed_chunks_per_second": round(chunks / embed_seconds, 2) if embed_seconds else None,
+            "stage_ms": {name: percentiles(values) for name, values in ingested["stage_ms"].items()},
+        },
+        "query": load,
+    }
+
+def compare(results: Dict, baseline: Dict) -> List[str]:
+    """Relative change of the headline numbers against an earlier results file"""
+    lines = []
+    for section, key in (
+        ("ingest", "pages_per_second"), ("ingest", "chunks_per_second"), ("ingest", "embed_chunks_per_second"),
+        ("query", "queries_per_second"), ("query", "p50_ms"), ("query", "p95_ms"), ("query", "p99_ms"),
+        (None, "peak_rss_mb"),
+    ):
+        current = results.get(section, {}).get(key) if section else results.get(key)
+        previous = baseline.get(section, {}).get(key) if section else baseline.get(key)
+        if current is None or not previous:
+            continue
+        lines.append(f"  {key:26s} {previous:>10} -> {current:>10}  ({(current / previous - 1) * 100:+.1f}%)")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=4, help="synthetic PDFs to ingest")
+    parser.add_argument("--pages", type=int, default=50, help="pages per synthetic PDF")
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="queries in flight")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--distinct-questions", action="store_true", help="never repeat a question (no answer cache hits)")
+    parser.add_argument("--llm-latency-ms", type=int, default=50, help="fake Gemini response time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="where to put PDFs and stores (default: a fresh temporary directory)")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/throughput_<time>.json)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="finsight_bench_"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    # Settings are read at import, so configure the app before importing it
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_REQUESTS_PER_MINUTE": "0",
+        "LLM_MAX_PENDING": str(max(args.concurrency * 2, 64)),
+        "MODEL_LOADING": "lazy",
+        "UPLOAD_DIR": str(work_dir / "uploads"),
+        "EXPORT_DIR": str(work_dir / "exports"),
+        "CHROMA_DIR": str(work_dir / "chroma_db"),
+        "DATA_DIR": str(work_dir / "data"),
+        "CACHE_DIR": str(work_dir / "cache"),
+    })
+
+    pdf_dir = work_dir / "pdfs"
+    pdf_dir.mkdir(exist_ok=True)
+    pdf_paths = []
+    for i in range(args.documents):
+        path = pdf_dir / f"report_{i}.pdf"
+        synthetic_report(str(path), args.pages, args.lines_per_page, seed=args.seed + i)
+        pdf_paths.append(str(path))
+
+    results = {
+        "benchmark": "throughput",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "work_dir")},
+        **asyncio.run(run(args, pdf_paths)),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    ingest_results, query = results["ingest"], results["query"]
+    print(f"\ningest  {ingest_results['completed']}/{ingest_results['documents']} documents, "
+          f"{ingest_results['pages_per_second']} pages/s, {ingest_results['chunks_per_second']} chunks/s "
+          f"(embedding {ingest_results['embed_chunks_per_second']} chunks/s)")
+    print(f"query   {query['queries_per_second']} q/s at concurrency {query['concurrency']}, "
+          f"p50 {query.get('p50_ms')} ms, p95 {query.get('p95_ms')} ms, p99 {query.get('p99_ms')} ms, "
+          f"{query['errors']} errors")
+    print(f"memory  peak RSS {results['peak_rss_mb']} MB")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(f"\nvs {args.baseline}")
+            print("\n".join(compare(results, json.load(f))))
+
+    output = Path(args.output or Path(__file__).parent / "results" / f"throughput_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
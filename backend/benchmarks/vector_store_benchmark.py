@@ -0,0 +1,102 @@
+"""
+Vector store benchmark - Scoped query latency, recall and storage size of the vector store backends
+Run from backend/: python -m benchmarks.vector_store_benchmark --documents 50 --chunks 1000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.vector_store import ChromaVectorStore, NumpyVectorStore
+
+BACKENDS = ["chroma", "float16", "int8"]
+
+def build_store(backend: str, directory: str):
+    if backend == "chroma":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=directory)
+        return ChromaVectorStore(client.get_or_create_collection("benchmark", metadata={"hnsw:space": "cosine"}))
+    return NumpyVectorStore(directory, backend)
+
+def directory_bytes(directory: str) -> int:
+    return sum(path.stat().st_size for path in Path(directory).rglob("*") if path.is_file())
+
+def benchmark_backend(backend: str, vectors: Dict[str, np.ndarray], queries: np.ndarray, scope: List[str], top_k: int) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        store = build_store(backend, directory)
+        text = "x" * 200
+        started = time.perf_counter()
+        for doc_id, doc_vectors in vectors.items():
+            ids = [f"{doc_id}_chunk_{i}" for i in range(len(doc_vectors))]
+            store.add(ids, doc_vectors, [text] * len(ids), [{"doc_id": doc_id, "chunk_id": i} for i in range(len(ids))])
+            store.commit(doc_id)
+        write_seconds = time.perf_counter() - started
+
+        # Exact float32 ranking over the scoped documents
+        scoped = np.vstack([vectors[doc_id] for doc_id in scope])
+        scoped = scoped / np.linalg.norm(scoped, axis=1, keepdims=True)
+        scoped_ids = [f"{doc_id}_chunk_{i}" for doc_id in scope for i in range(len(vectors[doc_id]))]
+
+        latencies, recall = [], []
+        for query in queries:
+            started = time.perf_counter()
+            result = store.query(query[None, :], top_k, scope)
+            latencies.append(time.perf_counter() - started)
+            exact = {scoped_ids[i] for i in np.argsort(-(scoped @ (query / np.linalg.norm(query))))[:top_k]}
+            recall.append(len(exact & set(result["ids"][0])) / top_k)
+
+        chunks = sum(len(v) for v in vectors.values())
+        latencies_ms = np.array(latencies) * 1000
+        return {
+            "write_seconds": round(write_seconds, 3),
+            "bytes_per_chunk": round(directory_bytes(directory) / chunks, 1),
+            "query_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+            "query_p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+            f"recall_at_{top_k}": round(float(np.mean(recall)), 4),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=1000, help="chunks per document")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--scope", type=int, default=2, help="documents per scoped query")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = {
+        f"doc_{i:04d}": rng.standard_normal((args.chunks, args.dim)).astype(np.float32)
+        for i in range(args.documents)
+    }
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    scope = list(vectors)[:args.scope]
+
+    results = {
+        "documents": args.documents,
+        "chunks_per_document": args.chunks,
+        "dim": args.dim,
+        "scope": args.scope,
+        "backends": {},
+    }
+    for backend in args.backends:
+        entry = benchmark_backend(backend, vectors, queries, scope, args.top_k)
+        results["backends"][backend] = entry
+        extras = ", ".join(f"{k}={v}" for k, v in entry.items())
+        print(f"  {backend:8s} {extras}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
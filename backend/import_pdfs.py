@@ -0,0 +1,60 @@
+"""
+Bulk import PDFs (and zip archives of PDFs) from a local directory
+Run with: python import_pdfs.py <directory> [--recursive]
+
+Writes to the same document store and vector database as the server, so run it while the server is stopped
+(or use POST /upload/bulk against a running server).
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import BinaryIO, Iterator, Tuple
+
+from app.api.dependencies import get_models
+from app.services.pdf_service import PDFService, shutdown_process_pool
+from app.services.embedding_service import EmbeddingService
+from app.services.sentiment_service import SentimentService
+from app.services.metrics_service import MetricsService
+from app.services.ingestion_service import IngestionService, iter_pdf_sources
+
+def directory_files(directory: str, recursive: bool) -> Iterator[Tuple[str, BinaryIO]]:
+    """Open each PDF or zip file in a directory in turn"""
+    pattern = "**/*" if recursive else "*"
+    for path in sorted(Path(directory).glob(pattern)):
+        if path.is_file() and path.suffix.lower() in (".pdf", ".zip"):
+            with open(path, "rb") as file:
+                yield path.name, file
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import PDFs from a directory")
+    parser.add_argument("directory", help="Directory containing PDF or zip files")
+    parser.add_argument("--recursive", action="store_true", help="Include subdirectories")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    args = parser.parse_args()
+
+    if not Path(args.directory).is_dir():
+        parser.error(f"{args.directory} is not a directory")
+
+    models = get_models()
+    ingestion_service = IngestionService(PDFService(), EmbeddingService(), SentimentService(), MetricsService())
+
+    try:
+        bulk = ingestion_service.submit_bulk(
+            iter_pdf_sources(directory_files(args.directory, args.recursive)), models, background=False
+        )
+    finally:
+        shutdown_process_pool()
+
+    result = bulk.to_dict()
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    for file in result["files"]:
+        detail = file.get("error") or (f"{file['chunks']} chunks" if file.get("chunks") is not None else "")
+        print(f"{file['status']:>10}  {file.get('document_id') or '-':<34} {file['filename']}" + (f"  ({detail})" if detail else ""))
+    print(f"\n📦 {json.dumps(result['throughput'])}")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,72 @@
 """
 Entry point for the Financial Report Analyzer Backend
-Run with: python run.py
+Run with: python run.py [--workers N]
+
+With --workers N > 1, one inference sidecar (and, unless CHROMA_HOST is set, one Chroma server)
+is started next to N API worker processes that share SQLite documents and job status.
 """
 
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+
 import uvicorn
-from app.main import app
 from app.config import settings
 
+def start_shared_services(workers: int) -> list:
+    """Configure the workers for shared state and start the per-host sidecar processes"""
+    os.environ.setdefault("INFERENCE_SIDECAR_AUTHKEY", settings.INFERENCE_SIDECAR_AUTHKEY or secrets.token_hex(16))
+    os.environ["INFERENCE_MODE"] = "sidecar"
+    os.environ["DOCUMENT_STORE"] = "sqlite"
+    os.environ["JOB_STORE"] = "sqlite"
+    if not settings.PDF_EXTRACT_WORKERS:
+        # Share the cores between the workers' extraction pools
+        os.environ["PDF_EXTRACT_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+
+    processes = [subprocess.Popen([sys.executable, "-m", "app.services.inference_sidecar"], env=os.environ.copy())]
+
+    if settings.VECTOR_STORE == "chroma" and not settings.CHROMA_HOST:
+        processes.append(subprocess.Popen([
+            "chroma", "run",
+            "--path", settings.CHROMA_DIR,
+            "--host", "127.0.0.1",
+            "--port", str(settings.CHROMA_PORT)
+        ]))
+        os.environ["CHROMA_HOST"] = "127.0.0.1"
+
+    return processes
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the FinSight API")
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes (default: 1)")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=settings.DEBUG,
+            log_level="info"
+        )
+        return
+
+    processes = start_shared_services(args.workers)
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=args.workers,
+            log_level="info"
+        )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=settings.DEBUG,
-        log_level="info"
-    )
\ No newline at end of file
+    main()
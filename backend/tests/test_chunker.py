@@ -0,0 +1,73 @@
+"""
+Structured chunker - page and offset provenance, token budgets and table rows
+"""
+
+from app.services.chunker import StructuredChunker
+from app.services.context_builder import estimate_tokens
+
+def span(pages, chunk):
+    """The text a chunk's page-relative offsets point at"""
+    texts = {page["page"]: page["text"] for page in pages}
+    if chunk.page == chunk.page_end:
+        return texts[chunk.page][chunk.start:chunk.end]
+    middle = [texts[number] for number in range(chunk.page + 1, chunk.page_end)]
+    return "\n".join([texts[chunk.page][chunk.start:], *middle, texts[chunk.page_end][:chunk.end]])
+
+def long_page(number, sentences=120):
+    return {"page": number, "text": " ".join(f"Page {number} sentence {n} about results." for n in range(sentences))}
+
+def test_offsets_point_at_the_chunk_text():
+    pages = [long_page(1), {"page": 2, "text": "  Short cover note.  "}, {"page": 3, "text": "Appendix."}, long_page(4)]
+    chunks = StructuredChunker(80, 10).split_pages(pages)
+
+    assert chunks
+    for chunk in chunks:
+        assert span(pages, chunk) == chunk.text
+        assert estimate_tokens(chunk.text) <= 80
+
+def test_long_pages_do_not_cross_page_boundaries():
+    pages = [long_page(1), long_page(2)]
+    chunks = StructuredChunker(60).split_pages(pages)
+
+    assert all(chunk.page == chunk.page_end for chunk in chunks)
+    assert [chunk.page for chunk in chunks] == sorted(chunk.page for chunk in chunks)
+    assert {chunk.page for chunk in chunks} == {1, 2}
+
+def test_short_pages_share_a_chunk():
+    pages = [{"page": 1, "text": "Annual Report 2024"}, {"page": 2, "text": "Table of contents"}, {"page": 3, "text": ""}]
+    chunks = StructuredChunker(60).split_pages(pages)
+
+    assert len(chunks) == 1
+    assert (chunks[0].page, chunks[0].page_end) == (1, 2)
+    assert chunks[0].text == "Annual Report 2024\nTable of contents"
+
+def test_editing_one_page_keeps_other_chunks_identical():
+    pages = [long_page(n) for n in range(1, 5)]
+    edited = [dict(page) for page in pages]
+    edited[1]["text"] = "An inserted opening sentence. " + edited[1]["text"]
+    chunker = StructuredChunker(60, 10)
+
+    before = [chunk for chunk in chunker.split_pages(pages) if chunk.page != 2]
+    after = [chunk for chunk in chunker.split_pages(edited) if chunk.page != 2]
+    assert before == after
+
+def test_table_rows_stay_together():
+    prose = " ".join(f"Management discussion sentence {n}." for n in range(40))
+    intro = "Segment results for the year, in millions of dollars, were as follows."
+    table = "\n".join(f"Segment {n}  ${n},100  ${n},050  {n}%" for n in range(1, 7))
+    # Line by line, the intro and the first rows would fill a chunk and cut the table in two
+    pages = [{"page": 1, "text": f"{prose}\n{intro}\n{table}\n{prose}"}]
+    chunks = StructuredChunker(80).split_pages(pages)
+
+    assert any(table in chunk.text for chunk in chunks)
+    for chunk in chunks:
+        assert span(pages, chunk) == chunk.text
+
+def test_oversized_table_splits_between_rows():
+    rows = [f"Line item {n}  ${n},100  ${n},050  {n}%" for n in range(1, 61)]
+    pages = [{"page": 1, "text": "\n".join(rows)}]
+    chunks = StructuredChunker(80).split_pages(pages)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert all(line in rows for line in chunk.text.split("\n"))
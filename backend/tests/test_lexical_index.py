@@ -0,0 +1,68 @@
+"""
+Lexical index - BM25 search and the corpus statistics kept by every write
+"""
+
+import sqlite3
+
+import pytest
+
+from app.services.lexical_index import LexicalIndex
+
+def recounted(index: LexicalIndex):
+    """Statistics computed from scratch, to compare with the ones the index maintains"""
+    conn = index._connection()
+    totals = conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+    document_frequency = dict(conn.execute("SELECT term, COUNT(*) FROM postings GROUP BY term"))
+    return totals, document_frequency
+
+def maintained(index: LexicalIndex):
+    conn = index._connection()
+    totals = conn.execute("SELECT chunks, total_length FROM stats WHERE id = 0").fetchone()
+    return totals, dict(conn.execute("SELECT term, df FROM terms"))
+
+@pytest.fixture
+def index(tmp_path):
+    return LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+
+def test_statistics_follow_adds_and_deletes(index):
+    index.add("a", ["a_1", "a_2"], ["Revenue grew to $4.1 billion", "Operating margin was 21%"])
+    index.add("b", ["b_1"], ["Revenue fell; litigation risk rose"])
+    assert maintained(index) == recounted(index)
+
+    # Re-indexing a chunk replaces it rather than counting it twice
+    index.add("a", ["a_1"], ["Revenue grew to $4.3 billion after restatement"])
+    assert maintained(index) == recounted(index)
+    assert index.count() == 3
+
+    index.delete_chunks(["a_2", "missing"])
+    assert maintained(index) == recounted(index)
+
+    index.delete_document("b")
+    assert maintained(index) == recounted(index)
+    assert "litigation" not in maintained(index)[1]
+    assert index.count() == 1
+
+def test_search_ranks_and_scopes_by_document(index):
+    index.add("a", ["a_1", "a_2"], ["revenue revenue growth", "cash flow from operations"])
+    index.add("b", ["b_1"], ["revenue guidance"])
+
+    assert [chunk_id for chunk_id, _ in index.search("revenue", 5)] == ["a_1", "b_1"]
+    assert [chunk_id for chunk_id, _ in index.search("revenue", 5, ["b"])] == ["b_1"]
+    assert index.search("dividend", 5) == []
+
+def test_existing_index_is_backfilled(tmp_path):
+    path = tmp_path / "lexical.sqlite3"
+    index = LexicalIndex(str(path))
+    index.add("a", ["a_1", "a_2"], ["revenue growth", "revenue guidance"])
+    expected = maintained(index)
+
+    # An index written before the statistics tables existed
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DROP TABLE stats")
+        conn.execute("DROP TABLE terms")
+    conn.close()
+
+    reopened = LexicalIndex(str(path))
+    assert maintained(reopened) == expected
+    assert [chunk_id for chunk_id, _ in reopened.search("growth", 5)] == ["a_1"]
@@ -0,0 +1,218 @@
+"""
+Versioned document updates - only changed chunks are written, and a failed update leaves the previous version intact
+"""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.document_store import MemoryDocumentStore
+from app.services.embedding_cache import content_hash
+from app.services.embedding_service import EmbeddingService, chunk_ids, chunk_metadata, legacy_chunk_ids
+from app.services.ingestion_service import IngestionJob, IngestionService
+from app.services.lexical_index import LexicalIndex
+from app.services.metrics_service import MetricsService
+from app.services.pdf_service import PDFService
+from app.services.query_cache import AnswerCache
+from app.services.vector_store import NumpyVectorStore
+
+DOC = "doc"
+DIM = 16
+
+def report_page(number, topic):
+    return {"page": number, "text": " ".join(f"Page {number} {topic} sentence {n} about results." for n in range(120))}
+
+VERSION_1 = [report_page(1, "revenue"), report_page(2, "margin"), report_page(3, "litigation")]
+# Page 2 rewritten
+VERSION_2 = [VERSION_1[0], report_page(2, "restated margin"), VERSION_1[2]]
+# A cover page renumbers every later page, and the last one is rewritten
+VERSION_3 = [
+    {"page": 1, "text": "Annual report cover."},
+    *({**page, "page": page["page"] + 1} for page in VERSION_2[:2]),
+    report_page(4, "settled litigation")
+]
+
+class Pages(PDFService):
+    """Reads each version's pages from memory instead of a PDF"""
+
+    def extract_pages(self, pdf_path, parallel=None):
+        return {"v1.pdf": VERSION_1, "v2.pdf": VERSION_2, "v3.pdf": VERSION_3}[pdf_path]
+
+class Embedder:
+    """Deterministic unit vector per text"""
+
+    def encode(self, texts):
+        vectors = np.stack([np.random.default_rng(int(content_hash(text)[:8], 16)).standard_normal(DIM) for text in texts])
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+class Sentiment:
+    """Scores every chunk the same, or fails like an unavailable model"""
+
+    fail = False
+
+    def analyze_update(self, texts, previous, models):
+        if self.fail:
+            raise RuntimeError("sentiment model unavailable")
+        return {"overall": "neutral", "score": 0.5}, [(0.5, len(text)) for text in texts]
+
+class FlakyLexicalIndex(LexicalIndex):
+    """Fails the next chunk delete while fail is set, like a transient I/O error halfway through an update"""
+
+    fail = False
+
+    def delete_chunks(self, chunk_ids):
+        if chunk_ids and self.fail:
+            self.fail = False
+            raise RuntimeError("disk full")
+        super().delete_chunks(chunk_ids)
+
+class FlakyDocumentStore(MemoryDocumentStore):
+    """Fails every record write while fail is set, like SQLite giving up on a held lock"""
+
+    fail = False
+
+    def put(self, doc, chunk_ids=None, chunk_sentiment=None):
+        if self.fail:
+            raise RuntimeError("database is locked")
+        super().put(doc, chunk_ids, chunk_sentiment)
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+    return SimpleNamespace(
+        vector_store=NumpyVectorStore(str(tmp_path / "vectors")),
+        lexical_index=FlakyLexicalIndex(str(tmp_path / "lexical.db")),
+        document_store=FlakyDocumentStore(),
+        answer_cache=AnswerCache(100, 60),
+        embedding_model=Embedder(),
+        embedding_batcher=None,
+        embedding_cache=None
+    )
+
+@pytest.fixture
+def service(models):
+    return IngestionService(Pages(), EmbeddingService(), Sentiment(), MetricsService())
+
+def texts_of(pages):
+    return [chunk.text for chunk in PDFService().chunk_pages(pages)]
+
+def publish_first_version(service, models, legacy=False):
+    """Store VERSION_1 as a first ingestion does (legacy: positional chunk ids, none recorded)"""
+    chunks = PDFService().chunk_pages(VERSION_1)
+    texts = [chunk.text for chunk in chunks]
+    ids = legacy_chunk_ids(DOC, len(texts)) if legacy else chunk_ids(DOC, texts)
+    models.vector_store.add(
+        ids=ids, embeddings=Embedder().encode(texts), documents=texts,
+        metadatas=[chunk_metadata(DOC, "report.pdf", chunk) for chunk in chunks]
+    )
+    models.vector_store.commit(DOC)
+    models.lexical_index.add(DOC, ids, texts)
+    text_path = service._text_path(DOC)
+    text_path.write_text(PDFService().join_pages(VERSION_1), encoding="utf-8")
+    record = {
+        "id": DOC, "filename": "report.pdf", "upload_date": "2024-03-01T00:00:00", "chunks": len(texts),
+        "pages": len(VERSION_1), "sentiment": {"overall": "neutral", "score": 0.5}, "summary": {},
+        "text_path": str(text_path)
+    }
+    models.document_store.put(record, None if legacy else ids, None if legacy else [(0.5, len(text)) for text in texts])
+
+def run_update(service, models, file_path):
+    job = IngestionJob(DOC, "report.pdf", file_path, content_hash=file_path, previous=models.document_store.get(DOC))
+    service._run(job, models)
+    return job
+
+def state(models):
+    """Everything a query or the API can see of the document"""
+    stored = models.vector_store.get(include_embeddings=True)
+    vectors = {
+        chunk_id: (text, sorted(metadata.items()), np.round(vector, 3).tolist())
+        for chunk_id, text, metadata, vector in zip(stored["ids"], stored["documents"], stored["metadatas"], stored["embeddings"])
+    }
+    lexical = [tuple(row) for row in models.lexical_index._connection().execute(
+        "SELECT chunk_id, doc_id, length FROM chunks ORDER BY chunk_id"
+    )]
+    documents = models.document_store
+    return (
+        vectors, lexical, documents.get(DOC), documents.get_chunk_ids(DOC),
+        documents.get_chunk_sentiment(DOC), documents.load_text(DOC)
+    )
+
+def text_files():
+    return sorted(path.name for path in (Path(settings.DATA_DIR) / "texts").iterdir())
+
+def test_update_writes_only_changed_chunks(service, models):
+    publish_first_version(service, models)
+    old_ids, new_ids = chunk_ids(DOC, texts_of(VERSION_1)), chunk_ids(DOC, texts_of(VERSION_2))
+    added = [chunk_id for chunk_id in new_ids if chunk_id not in old_ids]
+    removed = [chunk_id for chunk_id in old_ids if chunk_id not in new_ids]
+
+    job = run_update(service, models, "v2.pdf")
+
+    assert job.status == "completed"
+    assert job.changes == {"added": len(added), "removed": len(removed), "kept": len(new_ids) - len(added), "moved": 0}
+    assert sorted(models.vector_store.get()["ids"]) == sorted(new_ids)
+    assert models.document_store.get_chunk_ids(DOC) == new_ids
+    assert {chunk_id for chunk_id, _ in models.lexical_index.search("restated", 50)} == set(added)
+    assert models.document_store.get(DOC)["version"] == 2
+    assert models.document_store.load_text(DOC) == PDFService().join_pages(VERSION_2)
+    assert text_files() == ["doc.v2.txt"]
+
+def test_moved_chunks_get_new_metadata(service, models):
+    publish_first_version(service, models)
+    run_update(service, models, "v2.pdf")
+
+    job = run_update(service, models, "v3.pdf")
+
+    assert job.status == "completed"
+    assert job.changes["moved"] > 0
+    first = chunk_ids(DOC, texts_of(VERSION_2))[0]
+    assert models.vector_store.get(ids=[first])["metadatas"][0]["page"] == 2
+
+@pytest.mark.parametrize("failure", ["sentiment", "store", "publish"])
+def test_failed_update_keeps_the_previous_version(service, models, failure):
+    publish_first_version(service, models)
+    run_update(service, models, "v2.pdf")
+    before = state(models)
+
+    if failure == "sentiment":
+        service.sentiment_service.fail = True
+    elif failure == "store":
+        models.lexical_index.fail = True
+    else:
+        # Vectors of version 3 are committed, then its record cannot be written
+        models.document_store.fail = True
+    job = run_update(service, models, "v3.pdf")
+
+    assert job.status == "failed"
+    assert state(models) == before
+    assert text_files() == ["doc.v2.txt"]
+
+def test_legacy_document_is_replaced_on_success(service, models):
+    publish_first_version(service, models, legacy=True)
+
+    job = run_update(service, models, "v2.pdf")
+
+    assert job.status == "completed"
+    new_ids = chunk_ids(DOC, texts_of(VERSION_2))
+    assert (job.changes["added"], job.changes["removed"]) == (len(new_ids), len(texts_of(VERSION_1)))
+    assert sorted(models.vector_store.get()["ids"]) == sorted(new_ids)
+    assert models.lexical_index.count() == len(new_ids)
+
+@pytest.mark.parametrize("failure", ["store", "publish"])
+def test_failed_legacy_update_keeps_the_old_chunks(service, models, failure):
+    publish_first_version(service, models, legacy=True)
+    before = state(models)
+
+    if failure == "store":
+        models.lexical_index.fail = True
+    else:
+        # Every old chunk was already deleted when the record write fails
+        models.document_store.fail = True
+    job = run_update(service, models, "v2.pdf")
+
+    assert job.status == "failed"
+    assert state(models) == before
+    assert text_files() == ["doc.txt"]
@@ -0,0 +1,160 @@
+"""
+NumPy vector store - segment writes, commit/rollback, tombstones, compaction and quantized scoring
+"""
+
+import numpy as np
+import pytest
+
+from app.services import vector_store
+from app.services.vector_store import NumpyVectorStore
+
+DIM = 64
+
+def unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def add_chunks(store: NumpyVectorStore, doc_id: str, ids, vectors: np.ndarray):
+    store.add(
+        ids=list(ids),
+        embeddings=vectors,
+        documents=[f"text of {chunk_id}" for chunk_id in ids],
+        metadatas=[{"doc_id": doc_id, "page": n + 1} for n in range(len(ids))]
+    )
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path / "vectors"))
+
+def test_add_is_invisible_until_commit(store):
+    add_chunks(store, "doc", ["doc_a", "doc_b"], unit_vectors(2))
+    assert store.count() == 0
+
+    store.commit("doc")
+    found = store.get(ids=["doc_a", "doc_b"])
+    assert sorted(found["ids"]) == ["doc_a", "doc_b"]
+    assert dict(zip(found["ids"], found["documents"]))["doc_b"] == "text of doc_b"
+    assert store.count() == 2
+
+def test_delete_and_metadata_update_apply_on_commit(store):
+    vectors = unit_vectors(3)
+    add_chunks(store, "doc", ["doc_a", "doc_b", "doc_c"], vectors)
+    store.commit("doc")
+
+    store.delete("doc", ["doc_b"])
+    store.update_metadatas("doc", ["doc_c"], [{"doc_id": "doc", "page": 9}])
+    assert store.count() == 3
+    store.commit("doc")
+
+    assert store.count() == 2
+    assert store.get(ids=["doc_b"])["ids"] == []
+    assert store.get(ids=["doc_c"])["metadatas"] == [{"doc_id": "doc", "page": 9}]
+    result = store.query(vectors[1:2], n_results=5)
+    assert "doc_b" not in result["ids"][0]
+    assert len(result["ids"][0]) == 2
+
+def test_rollback_discards_staged_writes(store, tmp_path):
+    add_chunks(store, "doc", ["doc_a"], unit_vectors(1))
+    store.commit("doc")
+    files = sorted(path.name for path in (tmp_path / "vectors").iterdir())
+
+    add_chunks(store, "doc", ["doc_b"], unit_vectors(1, seed=1))
+    store.delete("doc", ["doc_a"])
+    store.update_metadatas("doc", ["doc_a"], [{"doc_id": "doc", "page": 5}])
+    store.rollback("doc")
+    store.commit("doc")
+
+    assert store.get()["ids"] == ["doc_a"]
+    assert store.get(ids=["doc_a"])["metadatas"] == [{"doc_id": "doc", "page": 1}]
+    assert sorted(path.name for path in (tmp_path / "vectors").iterdir()) == files
+
+def test_readded_id_replaces_the_old_row(store):
+    vectors = unit_vectors(2)
+    add_chunks(store, "doc", ["doc_a"], vectors[:1])
+    store.commit("doc")
+    add_chunks(store, "doc", ["doc_a"], vectors[1:])
+    store.commit("doc")
+
+    assert store.count() == 1
+    assert store.query(vectors[1:], n_results=1)["distances"][0][0] == pytest.approx(0.0, abs=1e-3)
+
+def test_delete_document_and_empty_commit_remove_files(store, tmp_path):
+    add_chunks(store, "doc", ["doc_a", "doc_b"], unit_vectors(2))
+    add_chunks(store, "other", ["other_a"], unit_vectors(1, seed=1))
+    store.commit("doc")
+    store.commit("other")
+
+    store.delete("doc", ["doc_a", "doc_b"])
+    store.commit("doc")
+    store.delete_document("other")
+
+    assert store.count() == 0
+    assert [path for path in (tmp_path / "vectors").iterdir() if not path.name.startswith(".")] == []
+
+def test_removing_segments_spares_other_writers_temp_manifests(store, tmp_path):
+    add_chunks(store, "doc", ["doc_a"], unit_vectors(1))
+    store.commit("doc")
+    # Another worker halfway through publishing a manifest for the same document
+    temp_manifest = tmp_path / "vectors" / "doc.0123abcd.json.tmp"
+    temp_manifest.write_text("{}", encoding="utf-8")
+
+    store.delete_document("doc")
+
+    assert temp_manifest.exists()
+    assert list((tmp_path / "vectors").glob("doc.*.meta.json")) == []
+
+def test_compaction_keeps_live_rows(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "COMPACT_SEGMENTS", 3)
+    vectors = unit_vectors(10)
+    for n in range(5):
+        add_chunks(store, "doc", [f"doc_{2 * n}", f"doc_{2 * n + 1}"], vectors[2 * n:2 * n + 2])
+        store.commit("doc")
+    store.delete("doc", ["doc_0", "doc_5"])
+    store.commit("doc")
+
+    segments = list((tmp_path / "vectors").glob("doc.*.meta.json"))
+    assert len(segments) < 3
+    assert store.count() == 8
+    for n in (1, 4, 9):
+        assert store.query(vectors[n:n + 1], n_results=1)["ids"][0] == [f"doc_{n}"]
+
+def test_other_process_writes_are_picked_up(store, tmp_path):
+    add_chunks(store, "doc", ["doc_a"], unit_vectors(1))
+    store.commit("doc")
+    other = NumpyVectorStore(str(tmp_path / "vectors"))
+    assert other.count() == 1
+
+    add_chunks(other, "second", ["second_a"], unit_vectors(1, seed=1))
+    other.commit("second")
+    other.delete_document("doc")
+    assert store.get()["ids"] == ["second_a"]
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 2e-3), ("int8", 2e-2)])
+def test_quantized_scores_match_float32(tmp_path, dtype, tolerance):
+    store = NumpyVectorStore(str(tmp_path / dtype), dtype=dtype)
+    vectors = unit_vectors(500)
+    add_chunks(store, "doc", [f"doc_{n}" for n in range(500)], vectors)
+    store.commit("doc")
+
+    queries = unit_vectors(20, seed=1)
+    exact = queries @ vectors.T
+    result = store.query(queries, n_results=10)
+    for q, (ids, distances) in enumerate(zip(result["ids"], result["distances"])):
+        rows = [int(chunk_id.split("_")[1]) for chunk_id in ids]
+        np.testing.assert_allclose(1 - np.asarray(distances), exact[q, rows], atol=tolerance)
+        # The true best match is still ranked first unless another row is within the quantization error
+        best = int(np.argmax(exact[q]))
+        assert rows[0] == best or exact[q, best] - exact[q, rows[0]] < 2 * tolerance
+
+def test_scoring_in_blocks_matches_one_product(tmp_path, monkeypatch):
+    vectors = unit_vectors(300)
+    queries = unit_vectors(5, seed=1)
+    results = []
+    for rows in (4096, 64):
+        monkeypatch.setattr(vector_store, "SCORE_BLOCK_ROWS", rows)
+        store = NumpyVectorStore(str(tmp_path / str(rows)), dtype="int8")
+        add_chunks(store, "doc", [f"doc_{n}" for n in range(300)], vectors)
+        store.commit("doc")
+        results.append(store.query(queries, n_results=5))
+    assert results[0]["ids"] == results[1]["ids"]
+    np.testing.assert_allclose(results[0]["distances"], results[1]["distances"], atol=1e-6)
@@ -22,6 +22,26 @@ export default function App() {
   const [activeTab, setActiveTab] = useState('upload');
   const [currentDocId, setCurrentDocId] = useState(null);
 
+  // Poll an ingestion job until the backend finishes processing
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const response = await fetch(`http://localhost:8000/jobs/${jobId}`);
+      if (!response.ok) {
+        throw new Error('Job status failed');
+      }
+
+      const job = await response.json();
+      if (job.status === 'completed') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Processing failed');
+      }
+
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+  };
+
   // REAL API CALL - Upload File
   const handleFileUpload = async (e) => {
     const uploadedFile = e.target.files[0];
@@ -46,7 +66,8 @@ export default function App() {
         throw new Error('Upload failed');
       }
 
-      const data = await response.json();
+      const job = await response.json();
+      const data = await waitForJob(job.job_id);
       
       setCurrentDocId(data.document_id);
       setSummary(data.summary);
@@ -78,7 +99,7 @@ export default function App() {
     setChatHistory(prev => [...prev, { type: 'user', text: query }]);
 
     try {
-      const response = await fetch('http://localhost:8000/query', {
+      const response = await fetch('http://localhost:8000/query/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -94,14 +115,42 @@ export default function App() {
         throw new Error('Query failed');
       }
 
-      const data = await response.json();
-      
-      setChatHistory(prev => [...prev, {
-        type: 'ai',
-        text: data.answer
-      }]);
-
-      console.log('Query successful:', data);
+      // Append tokens to a single AI message as they stream in
+      setChatHistory(prev => [...prev, { type: 'ai', text: '' }]);
+      const appendToAnswer = (text) => {
+        setChatHistory(prev => {
+          const updated = [...prev];
+          const last = updated[updated.length - 1];
+          updated[updated.length - 1] = { ...last, text: last.text + text };
+          return updated;
+        });
+      };
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+
+          if (event === 'token') {
+            appendToAnswer(data.text);
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          } else if (event === 'done') {
+            console.log('Query successful:', data);
+          }
+        }
+      }
     } catch (error) {
       console.error('Query error:', error);
       setChatHistory(prev => [...prev, {
@@ -19,6 +19,17 @@ export const uploadPDF = async (file) => {
   return await response.json();
 };
 
+// Get ingestion job status
+export const getJobStatus = async (jobId) => {
+  const response = await fetch(`${API_BASE}/jobs/${jobId}`);
+
+  if (!response.ok) {
+    throw new Error('Failed to fetch job status');
+  }
+
+  return await response.json();
+};
+
 // Query document
 export const queryDocument = async (question, documentIds = null, topK = 5) => {
   const response = await fetch(`${API_BASE}/query`, {